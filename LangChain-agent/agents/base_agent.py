@@ -2,31 +2,93 @@
 智能体基类
 """
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
 from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
 from langchain.prompts import ChatPromptTemplate
 from loguru import logger
+from config import settings
+from llm import LLMCache, get_llm_cache, make_cache_key, llm_signature
+from llm import SingleFlight, get_single_flight
+from llm import LLMAdmissionController, get_admission_controller, prompt_usage
+from models import AgentExecutionMode
+from metrics import (
+    LLM_CALL_DURATION, LLM_USAGE_CACHED_TOKENS, LLM_USAGE_PROMPT_TOKENS, PROMPT_PREFIX_TOKENS, current_intent
+)
+from .prompt_budget import PromptBudget, record_prompt, static_prefix_tokens
 
 
 class BaseAgent(ABC):
     """智能体基类"""
     
-    def __init__(self, llm: BaseChatModel, agent_name: str):
+    # 响应缓存存活秒数，None 使用全局默认值，0 表示不缓存
+    cache_ttl: Optional[float] = None
+    
+    # 提示词数据部分的 token 预算，None 使用全局默认值
+    prompt_token_budget: Optional[int] = None
+    
+    # 提示词按“系统提示词 → 少样本示例 → 用户消息”排列：前两部分不含模板变量，
+    # 各次调用逐字节相同，可命中模型服务端的前缀缓存；请求相关的数据只出现在最后的用户消息中
+    system_prompt: str = ""
+    few_shot_examples: Sequence[Tuple[str, str]] = ()  # (用户输入, 期望回答)
+    user_prompt: str = ""
+    
+    def __init__(self, llm: BaseChatModel, agent_name: str,
+                 cache: Optional[LLMCache] = None,
+                 single_flight: Optional[SingleFlight] = None,
+                 admission: Optional[LLMAdmissionController] = None):
         """
         初始化智能体
         
         Args:
             llm: 语言模型
             agent_name: 智能体名称
+            cache: 响应缓存，默认使用全局缓存
+            single_flight: 并发请求合并器，默认使用全局合并器
+            admission: 出站准入控制器，默认按模型名称取全局实例
         """
         self.llm = llm
         self.agent_name = agent_name
         self.prompt_template = self._create_prompt_template()
+        self.static_prefix_tokens = static_prefix_tokens(self.prompt_template)
+        PROMPT_PREFIX_TOKENS.set(self.static_prefix_tokens, agent=type(self).__name__)
+        
+        if cache is None and settings.LLM_CACHE_ENABLED:
+            cache = get_llm_cache()
+        self.cache = cache
+        default_ttl = self.cache_ttl if self.cache_ttl is not None else settings.LLM_CACHE_DEFAULT_TTL
+        self.cache_ttl = settings.LLM_CACHE_TTL_OVERRIDES.get(type(self).__name__, default_ttl)
+        
+        default_budget = self.prompt_token_budget or settings.PROMPT_TOKEN_BUDGET_DEFAULT
+        self.prompt_token_budget = settings.PROMPT_TOKEN_BUDGET_OVERRIDES.get(type(self).__name__, default_budget)
+        
+        if single_flight is None and settings.LLM_COALESCE_ENABLED:
+            single_flight = get_single_flight()
+        self.single_flight = single_flight
+        
+        if admission is None and settings.LLM_ADMISSION_ENABLED:
+            admission = get_admission_controller(llm_signature(llm)[0])
+        self.admission = admission
         
-    @abstractmethod
     def _create_prompt_template(self) -> ChatPromptTemplate:
-        """创建提示词模板"""
-        pass
+        """
+        创建提示词模板
+        
+        Returns:
+            系统提示词、少样本示例和用户消息组成的模板
+            
+        Raises:
+            ValueError: 系统提示词或示例中含有模板变量（会破坏前缀的一致性）
+        """
+        prefix = [("system", self.system_prompt)]
+        for question, answer in self.few_shot_examples:
+            prefix.extend([("user", question), ("assistant", answer)])
+        
+        variables = ChatPromptTemplate.from_messages(prefix).input_variables
+        if variables:
+            raise ValueError(f"{type(self).__name__} 的系统提示词和示例不能包含模板变量: {variables}")
+        return ChatPromptTemplate.from_messages(prefix + [("user", self.user_prompt)])
     
     @abstractmethod
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -41,6 +103,14 @@ class BaseAgent(ABC):
         """
         pass
     
+    def get_execution_mode(self, input_data: Dict[str, Any]) -> AgentExecutionMode:
+        """读取输入中的执行模式，默认完整执行"""
+        return AgentExecutionMode(input_data.get("mode") or AgentExecutionMode.FULL)
+    
+    def new_prompt_budget(self) -> PromptBudget:
+        """为一次调用创建提示词 token 预算"""
+        return PromptBudget(type(self).__name__, self.prompt_token_budget)
+    
     def log_info(self, message: str):
         """记录信息日志"""
         logger.info(f"[{self.agent_name}] {message}")
@@ -52,21 +122,104 @@ class BaseAgent(ABC):
         else:
             logger.error(f"[{self.agent_name}] {message}")
     
-    async def invoke_llm(self, **kwargs) -> str:
+    async def invoke_llm(self, validate: Optional[Callable[[str], bool]] = None, **kwargs) -> str:
         """
         调用LLM
         
         Args:
+            validate: 响应校验函数，返回 False 时不写入缓存（如无法解析的 JSON），默认全部缓存
             **kwargs: 提示词模板参数
             
         Returns:
             LLM响应
         """
-        try:
-            prompt = self.prompt_template.format_messages(**kwargs)
+        with LLM_CALL_DURATION.time(agent=type(self).__name__, intent=current_intent.get(), status="success"):
+            try:
+                prompt = self.prompt_template.format_messages(**kwargs)
+                record_prompt(type(self).__name__, prompt)
+                prompt_key = make_cache_key(prompt, *llm_signature(self.llm))
+                use_cache = self.cache is not None and self.cache_ttl > 0
+            
+                # 命中缓存时直接返回，跳过模型调用
+                if use_cache:
+                    cached = self.cache.get(prompt_key)
+                    if cached is not None:
+                        return cached
+            
+                # 相同提示词的并发调用合并为一次请求
+                if self.single_flight is not None:
+                    content = await self.single_flight.do(prompt_key, lambda: self._call_llm(prompt))
+                else:
+                    content = await self._call_llm(prompt)
+            
+                # 只缓存调用方认可的响应，避免错误结果在 TTL 内被反复返回
+                if use_cache and (validate is None or validate(content)):
+                    self.cache.set(prompt_key, content, self.cache_ttl)
+                return content
+            except Exception as e:
+                self.log_error(f"LLM调用失败", e)
+                raise
+    
+    async def _call_llm(self, prompt: List[BaseMessage]) -> str:
+        """向模型发出一次实际请求（经过准入控制）"""
+        if self.admission is not None:
+            response = await self.admission.run(lambda: self.llm.ainvoke(prompt))
+        else:
             response = await self.llm.ainvoke(prompt)
-            return response.content
-        except Exception as e:
-            self.log_error(f"LLM调用失败", e)
-            raise
-
+        self._record_usage(response)
+        return response.content
+    
+    async def astream_llm(self, validate: Optional[Callable[[str], bool]] = None, **kwargs) -> AsyncIterator[str]:
+        """
+        流式调用LLM
+        
+        Args:
+            validate: 完整响应的校验函数，同 invoke_llm()
+            **kwargs: 提示词模板参数
+            
+        Yields:
+            LLM响应片段
+        """
+        with LLM_CALL_DURATION.time(agent=type(self).__name__, intent=current_intent.get(), status="success"):
+            try:
+                prompt = self.prompt_template.format_messages(**kwargs)
+                record_prompt(type(self).__name__, prompt)
+            
+                cache_key = None
+                if self.cache is not None and self.cache_ttl > 0:
+                    cache_key = make_cache_key(prompt, *llm_signature(self.llm))
+                    cached = self.cache.get(cache_key)
+                    if cached is not None:
+                        yield cached
+                        return
+            
+                parts = []
+                usage_chunk = None
+                slot = self.admission.slot() if self.admission is not None else nullcontext()
+                async with slot:
+                    async for chunk in self.llm.astream(prompt):
+                        # 用量通常只在最后一个分片中返回
+                        if prompt_usage(chunk) is not None:
+                            usage_chunk = chunk
+                        if chunk.content:
+                            parts.append(chunk.content)
+                            yield chunk.content
+                if usage_chunk is not None:
+                    self._record_usage(usage_chunk)
+            
+                content = "".join(parts)
+                if cache_key is not None and (validate is None or validate(content)):
+                    self.cache.set(cache_key, content, self.cache_ttl)
+            except Exception as e:
+                self.log_error(f"LLM流式调用失败", e)
+                raise
+    
+    def _record_usage(self, message: BaseMessage):
+        """记录模型服务返回的输入 token 数和前缀缓存命中数"""
+        usage = prompt_usage(message)
+        if usage is None:
+            return
+        prompt_tokens, cached_tokens = usage
+        agent = type(self).__name__
+        LLM_USAGE_PROMPT_TOKENS.inc(prompt_tokens, agent=agent)
+        LLM_USAGE_CACHED_TOKENS.inc(cached_tokens, agent=agent)
@@ -2,25 +2,25 @@
 预订执行智能体
 职责：处理订单创建、确认、取消
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime
-from langchain.prompts import ChatPromptTemplate
 from langchain_core.language_models import BaseChatModel
 from .base_agent import BaseAgent
-from models import Order, OrderStatus
-import random
+from models import InventoryHold, Order, OrderStatus
+from inventory import (
+    FlightInventory, HotelInventory, ReservationManager,
+    get_flight_inventory, get_hotel_inventory, get_reservation_manager
+)
+from order_store import OrderStore, get_order_store
+import uuid
 
 
 class BookingAgent(BaseAgent):
     """预订执行智能体"""
     
-    def __init__(self, llm: BaseChatModel):
-        super().__init__(llm, "预订执行智能体")
+    cache_ttl = 0  # 订单确认信息不缓存
     
-    def _create_prompt_template(self) -> ChatPromptTemplate:
-        """创建提示词模板"""
-        return ChatPromptTemplate.from_messages([
-            ("system", """你是一个专业的预订助手。根据用户的预订信息，生成确认信息和注意事项。
+    system_prompt = """你是一个专业的预订助手。根据用户的预订信息，生成确认信息和注意事项。
 
 请提供：
 1. 订单确认信息
@@ -28,8 +28,9 @@ class BookingAgent(BaseAgent):
 3. 取消政策
 4. 联系方式
 
-语气友好专业。"""),
-            ("user", """预订信息：
+语气友好专业。"""
+    
+    user_prompt = """预订信息：
 订单号: {order_id}
 产品: {product_name}
 类型: {product_type}
@@ -37,8 +38,16 @@ class BookingAgent(BaseAgent):
 总价: ¥{total_price}
 状态: {status}
 
-请生成确认信息和注意事项。""")
-        ])
+请生成确认信息和注意事项。"""
+    
+    def __init__(self, llm: BaseChatModel, reservations: ReservationManager = None,
+                 orders: OrderStore = None, flights: FlightInventory = None,
+                 hotels: HotelInventory = None):
+        super().__init__(llm, "预订执行智能体")
+        self.reservations = reservations or get_reservation_manager()
+        self.orders = orders or get_order_store()
+        self.flights = flights or get_flight_inventory()
+        self.hotels = hotels or get_hotel_inventory()
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -70,16 +79,30 @@ class BookingAgent(BaseAgent):
         product_type = input_data.get("product_type", "")
         product_id = input_data.get("product_id", "")
         product_name = input_data.get("product_name", "")
-        quantity = input_data.get("quantity", 1)
+        quantity = input_data.get("quantity") or 1
         total_price = input_data.get("total_price", 0.0)
         contact_info = input_data.get("contact_info", {})
         
         self.log_info(f"创建订单: {product_name}")
         
         try:
+            # 预占库存，余量不足时直接失败，不生成订单
+            try:
+                hold = await self._hold(product_id, product_type, quantity)
+            except LookupError:
+                # 库存中查不到的产品（如模拟产品）不做库存控制
+                hold = None
+            else:
+                if hold is None:
+                    self.log_info(f"库存不足: {product_id} x{quantity}")
+                    return {
+                        "success": False,
+                        "error": f"库存不足: {product_name} 剩余数量少于 {quantity}"
+                    }
+            
             # 生成订单
             order = Order(
-                order_id=f"ORD{datetime.now().strftime('%Y%m%d%H%M%S')}{random.randint(1000, 9999)}",
+                order_id=f"ORD{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:8].upper()}",
                 user_id=user_id,
                 product_type=product_type,
                 product_id=product_id,
@@ -87,9 +110,19 @@ class BookingAgent(BaseAgent):
                 quantity=quantity,
                 total_price=total_price,
                 status=OrderStatus.PENDING,
-                contact_info=contact_info
+                contact_info=contact_info,
+                hold_id=hold.hold_id if hold else None,
+                hold_expires_at=hold.expires_at if hold else None
             )
             
+            # 持久化订单，失败时归还预占的库存
+            try:
+                await self.orders.create(order)
+            except Exception:
+                if hold is not None:
+                    await self.reservations.release(hold.hold_id)
+                raise
+            
             # 调用LLM生成确认信息
             confirmation = await self.invoke_llm(
                 order_id=order.order_id,
@@ -116,6 +149,36 @@ class BookingAgent(BaseAgent):
                 "error": f"订单创建失败: {str(e)}"
             }
     
+    async def _hold(self, product_id: str, product_type: str, quantity: int) -> Optional[InventoryHold]:
+        """
+        预占库存，产品首次预订时按航班/酒店库存中的余量登记
+        
+        Returns:
+            预占记录；余量不足时返回 None
+            
+        Raises:
+            LookupError: 航班、酒店库存中都查不到该产品
+        """
+        try:
+            return await self.reservations.hold(product_id, quantity)
+        except LookupError:
+            capacity = self._inventory_capacity(product_id, product_type)
+            if capacity is None:
+                raise
+        # 已登记时不覆盖当前余量，并发的首次预订只有一个生效
+        await self.reservations.register_product(product_id, product_type, capacity)
+        return await self.reservations.hold(product_id, quantity)
+    
+    def _inventory_capacity(self, product_id: str, product_type: str) -> Optional[int]:
+        """从航班、酒店库存查询产品的可售数量（不信任客户端传入的数量）"""
+        if product_type != "hotel" and self.flights is not None:
+            seats = self.flights.seats(product_id)
+            if seats is not None:
+                return seats
+        if product_type != "flight":
+            return self.hotels.rooms(product_id)
+        return None
+    
     async def _confirm_order(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """确认订单"""
         order_id = input_data.get("order_id", "")
@@ -123,13 +186,28 @@ class BookingAgent(BaseAgent):
         self.log_info(f"确认订单: {order_id}")
         
         try:
-            # 模拟订单确认（实际应从数据库查询）
+            order = await self.orders.get(order_id)
+            if order is None:
+                return {"success": False, "error": f"订单不存在: {order_id}"}
+            if order.status != OrderStatus.PENDING:
+                return {"success": False, "error": f"订单当前状态为 {order.status.value}，无法确认"}
+            
+            # 预占已过期或已释放时库存可能已被他人占用，不能确认
+            if order.hold_id and not await self.reservations.commit(order.hold_id):
+                return {
+                    "success": False,
+                    "error": "订单确认失败: 库存预占已过期或已释放，请重新下单"
+                }
+            if not await self.orders.update_status(order_id, OrderStatus.CONFIRMED,
+                                                   expected=[OrderStatus.PENDING]):
+                return {"success": False, "error": "订单确认失败: 订单状态已变更"}
+            
             confirmation = await self.invoke_llm(
                 order_id=order_id,
-                product_name="已确认的产品",
-                product_type="travel",
-                quantity=1,
-                total_price=1000,
+                product_name=order.product_name,
+                product_type=order.product_type,
+                quantity=order.quantity,
+                total_price=order.total_price,
                 status="已确认"
             )
             
@@ -158,7 +236,18 @@ class BookingAgent(BaseAgent):
         self.log_info(f"取消订单: {order_id}, 原因: {reason}")
         
         try:
-            # 模拟订单取消
+            order = await self.orders.get(order_id)
+            if order is None:
+                return {"success": False, "error": f"订单不存在: {order_id}"}
+            
+            if not await self.orders.update_status(order_id, OrderStatus.CANCELLED,
+                                                   expected=[OrderStatus.PENDING, OrderStatus.CONFIRMED]):
+                return {"success": False, "error": f"订单当前状态为 {order.status.value}，无法取消"}
+            
+            # 归还预占的库存
+            if order.hold_id:
+                await self.reservations.release(order.hold_id)
+            
             self.log_info(f"订单取消成功: {order_id}")
             
             return {
@@ -174,4 +263,3 @@ class BookingAgent(BaseAgent):
                 "success": False,
                 "error": f"订单取消失败: {str(e)}"
             }
-
@@ -3,21 +3,17 @@
 职责：解答售后问题、特殊需求处理
 """
 from typing import Dict, Any
-from langchain.prompts import ChatPromptTemplate
 from langchain_core.language_models import BaseChatModel
 from .base_agent import BaseAgent
+from models import AgentExecutionMode
 
 
 class CustomerServiceAgent(BaseAgent):
     """客服咨询智能体"""
     
-    def __init__(self, llm: BaseChatModel):
-        super().__init__(llm, "客服咨询智能体")
+    cache_ttl = 1800
     
-    def _create_prompt_template(self) -> ChatPromptTemplate:
-        """创建提示词模板"""
-        return ChatPromptTemplate.from_messages([
-            ("system", """你是一个专业、友好的旅行客服助手。你的任务是解答用户的问题和处理特殊需求。
+    system_prompt = """你是一个专业、友好的旅行客服助手。你的任务是解答用户的问题和处理特殊需求。
 
 服务范围：
 1. 订单相关问题（查询、修改、退改）
@@ -33,15 +29,18 @@ class CustomerServiceAgent(BaseAgent):
 - 提供解决方案
 - 维护用户权益
 
-请根据用户问题，提供专业的回答和解决方案。"""),
-            ("user", """用户问题：{question}
+请根据用户问题，提供专业的回答和解决方案。"""
+    
+    user_prompt = """用户问题：{question}
 
 用户信息：
 - 用户ID: {user_id}
 - 相关订单: {order_id}
 
-请提供专业的回答和解决方案。""")
-        ])
+请提供专业的回答和解决方案。"""
+    
+    def __init__(self, llm: BaseChatModel):
+        super().__init__(llm, "客服咨询智能体")
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -56,24 +55,32 @@ class CustomerServiceAgent(BaseAgent):
         question = input_data.get("question", "")
         user_id = input_data.get("user_id", "guest")
         order_id = input_data.get("order_id", "无")
+        mode = self.get_execution_mode(input_data)
         
         self.log_info(f"处理客服咨询: {question[:50]}...")
         
         try:
+            advice_inputs = {
+                "question": question,
+                "user_id": user_id,
+                "order_id": order_id
+            }
+            
             # 调用LLM生成回答
-            answer = await self.invoke_llm(
-                question=question,
-                user_id=user_id,
-                order_id=order_id
-            )
+            answer = ""
+            if mode == AgentExecutionMode.FULL:
+                answer = await self.invoke_llm(**advice_inputs)
             
             self.log_info("客服咨询处理完成")
             
-            return {
+            response = {
                 "success": True,
                 "answer": answer,
                 "message": "问题已处理"
             }
+            if mode == AgentExecutionMode.DEFERRED:
+                response["advice_inputs"] = advice_inputs
+            return response
             
         except Exception as e:
             self.log_error("客服咨询处理失败", e)
@@ -3,24 +3,22 @@
 职责：航班查询、比价、余票校验
 """
 from typing import Dict, Any, List
-from datetime import datetime, timedelta
-from langchain.prompts import ChatPromptTemplate
+from datetime import date, datetime, time, timedelta
 from langchain_core.language_models import BaseChatModel
 from .base_agent import BaseAgent
-from models import Flight, FlightSearchResult, CabinClass
+from .prompt_budget import PromptBudget
+from models import FlightSearchResult, CabinClass, AgentExecutionMode
+from inventory import FlightRow, get_flight_inventory, to_dicts
+from config import settings
 import random
 
 
 class FlightQueryAgent(BaseAgent):
     """机票查询智能体"""
     
-    def __init__(self, llm: BaseChatModel):
-        super().__init__(llm, "机票查询智能体")
+    cache_ttl = 300  # 航班价格与余票变化较快
     
-    def _create_prompt_template(self) -> ChatPromptTemplate:
-        """创建提示词模板"""
-        return ChatPromptTemplate.from_messages([
-            ("system", """你是一个专业的机票查询助手。根据用户的航班搜索结果，提供专业的选择建议。
+    system_prompt = """你是一个专业的机票查询助手。根据用户的航班搜索结果，提供专业的选择建议。
 
 请分析航班列表，考虑：
 1. 价格因素
@@ -29,8 +27,9 @@ class FlightQueryAgent(BaseAgent):
 4. 是否直飞
 5. 余票情况
 
-给出简洁专业的建议。"""),
-            ("user", """航班搜索参数：
+给出简洁专业的建议。"""
+    
+    user_prompt = """航班搜索参数：
 出发地: {departure}
 目的地: {destination}
 出发日期: {departure_date}
@@ -39,8 +38,11 @@ class FlightQueryAgent(BaseAgent):
 找到以下航班：
 {flights_info}
 
-请给出选择建议。""")
-        ])
+请给出选择建议。"""
+    
+    def __init__(self, llm: BaseChatModel):
+        super().__init__(llm, "机票查询智能体")
+        self.inventory = get_flight_inventory()
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -55,45 +57,54 @@ class FlightQueryAgent(BaseAgent):
         departure = input_data.get("departure", "")
         destination = input_data.get("destination", "")
         departure_date = input_data.get("departure_date", "")
-        passengers = input_data.get("passengers", 1)
+        passengers = input_data.get("passengers") or 1
+        filters = self._parse_filters(input_data)
+        mode = self.get_execution_mode(input_data)
         
         self.log_info(f"查询航班: {departure} -> {destination}, {departure_date}")
         
         try:
-            # 模拟查询航班数据
-            flights = self._search_flights(departure, destination, departure_date, passengers)
+            flights = self._search_flights(departure, destination, departure_date, passengers, **filters)
             
             # 生成航班信息摘要
-            flights_info = self._format_flights_info(flights)
+            flights_info = self._format_flights_info(flights, self.new_prompt_budget())
+            
+            advice_inputs = {
+                "departure": departure,
+                "destination": destination,
+                "departure_date": departure_date,
+                "passengers": passengers,
+                "flights_info": flights_info
+            }
             
             # 调用LLM生成建议
-            suggestion = await self.invoke_llm(
-                departure=departure,
-                destination=destination,
-                departure_date=departure_date,
-                passengers=passengers,
-                flights_info=flights_info
-            )
+            suggestion = ""
+            if mode == AgentExecutionMode.FULL:
+                suggestion = await self.invoke_llm(**advice_inputs)
             
+            # 数据来自库存，无需逐行校验：结果行直接导出为字典（与 model_dump() 相同），不构造模型
             result = FlightSearchResult(
-                flights=flights,
                 total_count=len(flights),
                 search_params={
                     "departure": departure,
                     "destination": destination,
                     "departure_date": departure_date,
-                    "passengers": passengers
+                    "passengers": passengers,
+                    **filters
                 }
             )
             
             self.log_info(f"找到 {len(flights)} 个航班")
             
-            return {
+            response = {
                 "success": True,
-                "data": result.model_dump(),
+                "data": {**result.model_dump(), "flights": to_dicts(flights)},
                 "suggestion": suggestion,
                 "message": f"找到 {len(flights)} 个航班"
             }
+            if mode == AgentExecutionMode.DEFERRED:
+                response["advice_inputs"] = advice_inputs
+            return response
             
         except Exception as e:
             self.log_error("航班查询失败", e)
@@ -102,8 +113,50 @@ class FlightQueryAgent(BaseAgent):
                 "error": f"航班查询失败: {str(e)}"
             }
     
-    def _search_flights(self, departure: str, destination: str, 
-                       departure_date: str, passengers: int) -> List[Flight]:
+    def _parse_filters(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """提取舱位、起飞时间段、经停和价格过滤条件"""
+        filters = {}
+        if input_data.get("cabin_class"):
+            filters["cabin_class"] = CabinClass(input_data["cabin_class"])
+        if input_data.get("earliest_departure"):
+            filters["earliest"] = time.fromisoformat(input_data["earliest_departure"])
+        if input_data.get("latest_departure"):
+            filters["latest"] = time.fromisoformat(input_data["latest_departure"])
+        if input_data.get("max_stops") is not None:
+            filters["max_stops"] = int(input_data["max_stops"])
+        elif "直飞" in (input_data.get("preferences") or []):
+            filters["max_stops"] = 0
+        if input_data.get("max_price"):
+            filters["max_price"] = float(input_data["max_price"])
+        return filters
+    
+    def _search_flights(self, departure: str, destination: str, departure_date,
+                        passengers: int, **filters) -> List[FlightRow]:
+        """
+        查询航班，已加载航班库存时从库存检索，否则生成模拟数据
+        
+        Args:
+            departure: 出发城市
+            destination: 到达城市
+            departure_date: 出发日期（date 或 YYYY-MM-DD）
+            passengers: 乘客数量
+            **filters: 过滤条件，见 FlightInventory.search
+            
+        Returns:
+            航班结果行列表
+        """
+        if self.inventory is None:
+            return self._mock_flights(departure, destination, departure_date, passengers)
+        
+        if not isinstance(departure_date, date):
+            departure_date = date.fromisoformat(str(departure_date))
+        return self.inventory.search(
+            departure, destination, departure_date, passengers,
+            limit=settings.FLIGHT_SEARCH_LIMIT, **filters
+        )
+    
+    def _mock_flights(self, departure: str, destination: str,
+                      departure_date: str, passengers: int) -> List[FlightRow]:
         """模拟查询航班数据"""
         flights = []
         airlines = ["中国国际航空", "东方航空", "南方航空", "海南航空", "吉祥航空"]
@@ -114,7 +167,7 @@ class FlightQueryAgent(BaseAgent):
             flight_number = f"{airline[:2]}{random.randint(1000, 9999)}"
             
             # 解析日期
-            dep_date = datetime.strptime(departure_date, "%Y-%m-%d")
+            dep_date = datetime.strptime(str(departure_date), "%Y-%m-%d")
             # 随机起飞时间
             dep_hour = random.randint(6, 22)
             dep_time = dep_date.replace(hour=dep_hour, minute=random.randint(0, 59))
@@ -133,7 +186,7 @@ class FlightQueryAgent(BaseAgent):
             elif cabin_class == CabinClass.FIRST:
                 base_price *= 4
             
-            flight = Flight(
+            flight = FlightRow(
                 flight_id=f"FL{random.randint(10000, 99999)}",
                 airline=airline,
                 flight_number=flight_number,
@@ -145,7 +198,7 @@ class FlightQueryAgent(BaseAgent):
                 arrival_time=arr_time,
                 duration=f"{duration_hours}小时{random.randint(0, 59)}分钟",
                 cabin_class=cabin_class,
-                price=round(base_price, 2),
+                price=float(round(base_price, 2)),
                 available_seats=random.randint(5, 200),
                 stops=0 if random.random() > 0.3 else 1
             )
@@ -155,16 +208,16 @@ class FlightQueryAgent(BaseAgent):
         flights.sort(key=lambda x: x.price)
         return flights
     
-    def _format_flights_info(self, flights: List[Flight]) -> str:
-        """格式化航班信息"""
-        info_lines = []
-        for i, flight in enumerate(flights, 1):
-            stops_text = "直飞" if flight.stops == 0 else f"{flight.stops}次经停"
-            info_lines.append(
-                f"{i}. {flight.airline} {flight.flight_number} - "
-                f"¥{flight.price} - {flight.departure_time.strftime('%H:%M')}-"
-                f"{flight.arrival_time.strftime('%H:%M')} - {flight.duration} - "
-                f"{stops_text} - {flight.cabin_class.value} - 余票{flight.available_seats}"
-            )
-        return "\n".join(info_lines)
+    def _format_flights_info(self, flights: List[FlightRow], budget: PromptBudget) -> str:
+        """格式化航班信息（紧凑表格，超出 token 预算的航班按排序从末尾截断）"""
+        return budget.table(
+            "flights_info",
+            ("航司", "航班", "价格", "起飞", "到达", "时长", "经停", "舱位", "余票"),
+            [
+                (flight.airline, flight.flight_number, flight.price,
+                 flight.departure_time.strftime('%H:%M'), flight.arrival_time.strftime('%H:%M'),
+                 flight.duration, flight.stops, flight.cabin_class, flight.available_seats)
+                for flight in flights
+            ]
+        )
 
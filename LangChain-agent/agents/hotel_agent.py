@@ -3,23 +3,20 @@
 职责：酒店搜索、筛选、价格对比
 """
 from typing import Dict, Any, List
-from langchain.prompts import ChatPromptTemplate
 from langchain_core.language_models import BaseChatModel
 from .base_agent import BaseAgent
-from models import Hotel, HotelSearchResult, HotelStarRating
-import random
+from .prompt_budget import PromptBudget
+from models import HotelSearchResult, AgentExecutionMode
+from inventory import HotelRow, get_hotel_inventory, to_dicts
+from config import settings
 
 
 class HotelQueryAgent(BaseAgent):
     """酒店查询智能体"""
     
-    def __init__(self, llm: BaseChatModel):
-        super().__init__(llm, "酒店查询智能体")
+    cache_ttl = 600
     
-    def _create_prompt_template(self) -> ChatPromptTemplate:
-        """创建提示词模板"""
-        return ChatPromptTemplate.from_messages([
-            ("system", """你是一个专业的酒店推荐助手。根据用户的酒店搜索结果，提供专业的选择建议。
+    system_prompt = """你是一个专业的酒店推荐助手。根据用户的酒店搜索结果，提供专业的选择建议。
 
 请分析酒店列表，考虑：
 1. 价格性价比
@@ -28,8 +25,9 @@ class HotelQueryAgent(BaseAgent):
 4. 设施配备
 5. 用户评价
 
-给出简洁专业的建议。"""),
-            ("user", """酒店搜索参数：
+给出简洁专业的建议。"""
+    
+    user_prompt = """酒店搜索参数：
 城市: {city}
 预算: {budget}
 偏好: {preferences}
@@ -37,8 +35,11 @@ class HotelQueryAgent(BaseAgent):
 找到以下酒店：
 {hotels_info}
 
-请给出选择建议。""")
-        ])
+请给出选择建议。"""
+    
+    def __init__(self, llm: BaseChatModel):
+        super().__init__(llm, "酒店查询智能体")
+        self.inventory = get_hotel_inventory()
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -51,28 +52,35 @@ class HotelQueryAgent(BaseAgent):
             酒店搜索结果
         """
         city = input_data.get("destination", "")
-        budget = input_data.get("budget", 0)
-        preferences = input_data.get("preferences", [])
+        budget = input_data.get("budget") or 0
+        preferences = input_data.get("preferences") or []
+        profile = input_data.get("user_profile") or {}
+        mode = self.get_execution_mode(input_data)
         
         self.log_info(f"查询酒店: {city}, 预算: {budget}")
         
         try:
-            # 模拟查询酒店数据
             hotels = self._search_hotels(city, budget, preferences)
+            if profile:
+                hotels = self._personalize(city, budget, preferences, profile, hotels)
             
             # 生成酒店信息摘要
-            hotels_info = self._format_hotels_info(hotels)
+            hotels_info = self._format_hotels_info(hotels, self.new_prompt_budget())
+            
+            advice_inputs = {
+                "city": city,
+                "budget": f"¥{budget}" if budget else "不限",
+                "preferences": ", ".join(preferences) if preferences else "无特殊要求",
+                "hotels_info": hotels_info
+            }
             
             # 调用LLM生成建议
-            suggestion = await self.invoke_llm(
-                city=city,
-                budget=f"¥{budget}" if budget else "不限",
-                preferences=", ".join(preferences) if preferences else "无特殊要求",
-                hotels_info=hotels_info
-            )
+            suggestion = ""
+            if mode == AgentExecutionMode.FULL:
+                suggestion = await self.invoke_llm(**advice_inputs)
             
+            # 数据来自库存，无需逐行校验：结果行直接导出为字典（与 model_dump() 相同），不构造模型
             result = HotelSearchResult(
-                hotels=hotels,
                 total_count=len(hotels),
                 search_params={
                     "city": city,
@@ -83,12 +91,15 @@ class HotelQueryAgent(BaseAgent):
             
             self.log_info(f"找到 {len(hotels)} 家酒店")
             
-            return {
+            response = {
                 "success": True,
-                "data": result.model_dump(),
+                "data": {**result.model_dump(), "hotels": to_dicts(hotels)},
                 "suggestion": suggestion,
                 "message": f"找到 {len(hotels)} 家酒店"
             }
+            if mode == AgentExecutionMode.DEFERRED:
+                response["advice_inputs"] = advice_inputs
+            return response
             
         except Exception as e:
             self.log_error("酒店查询失败", e)
@@ -98,65 +109,54 @@ class HotelQueryAgent(BaseAgent):
             }
     
     def _search_hotels(self, city: str, budget: float, 
-                      preferences: List[str]) -> List[Hotel]:
-        """模拟查询酒店数据"""
-        hotels = []
-        hotel_chains = ["希尔顿", "万豪", "香格里拉", "洲际", "喜来登", "凯悦", "如家", "汉庭"]
-        facilities_pool = ["WiFi", "游泳池", "健身房", "餐厅", "停车场", "会议室", "SPA", "酒吧"]
-        room_types = ["标准间", "豪华间", "商务套房", "行政套房", "总统套房"]
+                      preferences: List[str]) -> List[HotelRow]:
+        """
+        查询酒店
         
-        # 生成4-6家模拟酒店
-        for i in range(random.randint(4, 6)):
-            hotel_name = f"{city}{random.choice(hotel_chains)}酒店"
-            star_rating = random.choice(list(HotelStarRating))
-            
-            # 根据星级设定价格范围
-            if star_rating == HotelStarRating.THREE_STAR:
-                price = random.randint(200, 400)
-            elif star_rating == HotelStarRating.FOUR_STAR:
-                price = random.randint(400, 800)
-            elif star_rating == HotelStarRating.FIVE_STAR:
-                price = random.randint(800, 1500)
-            else:  # LUXURY
-                price = random.randint(1500, 3000)
-            
-            # 如果有预算限制，调整价格
-            if budget > 0 and price > budget:
-                price = budget * random.uniform(0.7, 0.95)
+        Args:
+            city: 城市
+            budget: 每晚预算上限，0 表示不限
+            preferences: 偏好标签（设施、星级）
             
-            # 随机选择设施
-            num_facilities = random.randint(3, 6)
-            facilities = random.sample(facilities_pool, num_facilities)
+        Returns:
+            按性价比排序的酒店结果行列表
+        """
+        return self.inventory.search(city, budget, preferences, limit=settings.HOTEL_SEARCH_LIMIT)
+    
+    def _personalize(self, city: str, budget: float, preferences: List[str],
+                     profile: Dict[str, Any], hotels: List[HotelRow]) -> List[HotelRow]:
+        """
+        按用户偏好调整排序：符合历史偏好（设施、星级、预算）的酒店排在前面，不足时用原结果补齐
+        
+        Args:
+            city: 城市
+            budget: 查询中的预算，0 表示未指定
+            preferences: 查询中的偏好
+            profile: 用户偏好参数
+            hotels: 原查询结果
             
-            hotel = Hotel(
-                hotel_id=f"HT{random.randint(10000, 99999)}",
-                name=hotel_name,
-                star_rating=star_rating,
-                address=f"{city}市{random.choice(['中心区', '商务区', '旅游区'])}{random.randint(1, 999)}号",
-                city=city,
-                price_per_night=round(price, 2),
-                available_rooms=random.randint(5, 50),
-                room_type=random.choice(room_types),
-                facilities=facilities,
-                rating=round(random.uniform(4.0, 5.0), 1),
-                reviews_count=random.randint(100, 5000),
-                distance_to_center=round(random.uniform(0.5, 15.0), 1)
-            )
-            hotels.append(hotel)
+        Returns:
+            调整后的酒店列表
+        """
+        extra = [p for p in profile.get("hotel_preferences", []) if p not in preferences]
+        profile_budget = 0 if budget else (profile.get("budget") or 0)
+        if not extra and not profile_budget:
+            return hotels
         
-        # 按性价比排序（评分/价格）
-        hotels.sort(key=lambda x: x.rating / (x.price_per_night / 100), reverse=True)
-        return hotels
+        preferred = self._search_hotels(city, budget or profile_budget, preferences + extra)
+        seen = {hotel.hotel_id for hotel in preferred}
+        merged = preferred + [hotel for hotel in hotels if hotel.hotel_id not in seen]
+        return merged[:settings.HOTEL_SEARCH_LIMIT]
     
-    def _format_hotels_info(self, hotels: List[Hotel]) -> str:
-        """格式化酒店信息"""
-        info_lines = []
-        for i, hotel in enumerate(hotels, 1):
-            info_lines.append(
-                f"{i}. {hotel.name} - {hotel.star_rating.value} - "
-                f"¥{hotel.price_per_night}/晚 - 评分{hotel.rating} - "
-                f"距市中心{hotel.distance_to_center}km - "
-                f"设施: {', '.join(hotel.facilities[:3])}等"
-            )
-        return "\n".join(info_lines)
+    def _format_hotels_info(self, hotels: List[HotelRow], budget: PromptBudget) -> str:
+        """格式化酒店信息（紧凑表格，超出 token 预算的酒店按排序从末尾截断）"""
+        return budget.table(
+            "hotels_info",
+            ("酒店", "星级", "每晚价格", "评分", "距市中心km", "主要设施"),
+            [
+                (hotel.name, hotel.star_rating, hotel.price_per_night, hotel.rating,
+                 hotel.distance_to_center, hotel.facilities[:3])
+                for hotel in hotels
+            ]
+        )
 
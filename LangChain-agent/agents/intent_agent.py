@@ -3,23 +3,51 @@
 职责：识别用户旅行需求类型（机票/酒店/行程等）
 """
 import json
-from typing import Dict, Any
-from langchain.prompts import ChatPromptTemplate
+from datetime import date
+from typing import Dict, Any, Optional
 from langchain_core.language_models import BaseChatModel
 from .base_agent import BaseAgent
+from .intent_classifier import ClassifierStats, extract_slots, get_intent_classifier, has_required_slots
+from config import settings
 from models import ParsedIntent, IntentType
 
 
+def _parse_intent(response: str) -> ParsedIntent:
+    """
+    解析模型返回的意图 JSON
+    
+    Args:
+        response: LLM响应
+        
+    Returns:
+        验证并规范化后的意图
+    """
+    # 清理可能的markdown代码块标记
+    response = response.strip()
+    if response.startswith("```json"):
+        response = response[7:]
+    if response.startswith("```"):
+        response = response[3:]
+    if response.endswith("```"):
+        response = response[:-3]
+    return ParsedIntent(**json.loads(response.strip()))
+
+
+def _is_valid_intent(response: str) -> bool:
+    """响应能否解析为合法意图（只缓存合法的响应）"""
+    try:
+        _parse_intent(response)
+    except Exception:
+        return False
+    return True
+
+
 class IntentParseAgent(BaseAgent):
     """意图解析智能体"""
     
-    def __init__(self, llm: BaseChatModel):
-        super().__init__(llm, "意图解析智能体")
+    cache_ttl = 3600  # 同一天内同一查询的意图解析结果稳定（提示词带当天日期，跨天不会命中旧结果）
     
-    def _create_prompt_template(self) -> ChatPromptTemplate:
-        """创建提示词模板"""
-        return ChatPromptTemplate.from_messages([
-            ("system", """你是一个专业的旅行意图识别助手。你的任务是从用户的自然语言查询中提取关键信息。
+    system_prompt = """你是一个专业的旅行意图识别助手。你的任务是从用户的自然语言查询中提取关键信息。
 
 意图类型：
 - flight: 机票查询
@@ -34,16 +62,21 @@ class IntentParseAgent(BaseAgent):
 - intent_type: 意图类型
 - departure: 出发地
 - destination: 目的地
-- departure_date: 出发日期 (格式: YYYY-MM-DD)
+- departure_date: 出发日期 (格式: YYYY-MM-DD，"明天""下周五"等相对日期按今天的日期换算)
 - return_date: 返程日期 (格式: YYYY-MM-DD)
 - passengers: 乘客数量
 - budget: 预算
 - preferences: 偏好标签列表
 - extra_info: 其他额外信息
 
-请以JSON格式返回结果，不要包含任何其他文字说明。"""),
-            ("user", "用户查询：{query}")
-        ])
+请以JSON格式返回结果，不要包含任何其他文字说明。"""
+    
+    user_prompt = "今天日期：{today}\n用户查询：{query}"
+    
+    def __init__(self, llm: BaseChatModel):
+        super().__init__(llm, "意图解析智能体")
+        self.classifier = get_intent_classifier()
+        self.classifier_stats = ClassifierStats()
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -58,32 +91,34 @@ class IntentParseAgent(BaseAgent):
         query = input_data.get("query", "")
         self.log_info(f"开始解析用户意图: {query}")
         
+        # 本地分类器快速通道
+        prediction = self.classifier.predict(query) if self.classifier else None
+        if prediction and not settings.INTENT_CLASSIFIER_SHADOW:
+            fast_intent = self._classify_locally(query, *prediction)
+            if fast_intent:
+                self.log_info(f"意图解析成功(本地分类器): {fast_intent.intent_type}")
+                return {
+                    "success": True,
+                    "intent": fast_intent.model_dump(),
+                    "message": "意图解析成功",
+                    "source": "classifier"
+                }
+        
         try:
             # 调用LLM解析意图
-            response = await self.invoke_llm(query=query)
-            
-            # 解析JSON响应
-            # 清理可能的markdown代码块标记
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
-            response = response.strip()
-            
-            intent_data = json.loads(response)
+            response = await self.invoke_llm(query=query, today=date.today().isoformat(), validate=_is_valid_intent)
+            parsed_intent = _parse_intent(response)
             
-            # 验证并规范化数据
-            parsed_intent = ParsedIntent(**intent_data)
+            if prediction:
+                self.classifier_stats.record_shadow(prediction[0], prediction[1], parsed_intent.intent_type)
             
             self.log_info(f"意图解析成功: {parsed_intent.intent_type}")
             
             return {
                 "success": True,
                 "intent": parsed_intent.model_dump(),
-                "message": "意图解析成功"
+                "message": "意图解析成功",
+                "source": "llm"
             }
             
         except json.JSONDecodeError as e:
@@ -99,4 +134,23 @@ class IntentParseAgent(BaseAgent):
                 "success": False,
                 "error": f"意图解析失败: {str(e)}"
             }
-
+    
+    def _classify_locally(self, query: str, intent_type: IntentType,
+                          confidence: float) -> Optional[ParsedIntent]:
+        """
+        置信度足够且必备槽位齐全时，直接由本地分类器和规则抽取给出意图
+        
+        Returns:
+            解析后的意图，不满足条件返回 None（回退到LLM）
+        """
+        if confidence < settings.INTENT_CLASSIFIER_THRESHOLD:
+            self.classifier_stats.fallback_low_confidence += 1
+            return None
+        
+        slots = extract_slots(query)
+        if not has_required_slots(intent_type, slots):
+            self.classifier_stats.fallback_missing_slots += 1
+            return None
+        
+        self.classifier_stats.fast_path += 1
+        return ParsedIntent(intent_type=intent_type, **slots)
@@ -0,0 +1,431 @@
+"""
+本地意图分类器
+职责：字符 n-gram 哈希特征 + softmax 线性模型（NumPy），在调用 LLM 之前快速判定意图，
+并用规则抽取常见槽位；基于 search_history 表中的历史查询离线训练
+
+训练：
+    python -m agents.intent_classifier --output data/intent_classifier.npz
+"""
+import argparse
+import asyncio
+import os
+import re
+import zlib
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from loguru import logger
+from config import settings
+from models import IntentType
+
+
+# ==================== 特征提取 ====================
+
+FEATURE_DIM = 1 << 14
+NGRAM_RANGE = (1, 3)
+
+_DIGITS = re.compile(r"\d+")
+
+
+def _normalize(text: str) -> str:
+    """统一大小写并把数字归一，使日期、价格等不同取值共享特征"""
+    return _DIGITS.sub("0", text.strip().lower())
+
+
+def extract_features(text: str, dim: int = FEATURE_DIM,
+                     ngram_range: Tuple[int, int] = NGRAM_RANGE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    提取字符 n-gram 哈希特征（稀疏表示）
+
+    Args:
+        text: 查询文本
+        dim: 哈希空间维度
+        ngram_range: n-gram 长度范围（闭区间）
+
+    Returns:
+        (特征下标, L2 归一化后的特征值)
+    """
+    text = _normalize(text)
+    buckets = []
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        for i in range(len(text) - n + 1):
+            buckets.append(zlib.crc32(text[i:i + n].encode("utf-8")) % dim)
+
+    if not buckets:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    indices, counts = np.unique(np.asarray(buckets, dtype=np.int64), return_counts=True)
+    values = counts.astype(np.float32)
+    values /= np.linalg.norm(values)
+    return indices, values
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+# ==================== 分类模型 ====================
+
+class IntentClassifier:
+    """softmax 线性意图分类器"""
+
+    def __init__(self, labels: Sequence[str], weights: Optional[np.ndarray] = None,
+                 bias: Optional[np.ndarray] = None, dim: int = FEATURE_DIM):
+        """
+        初始化分类器
+
+        Args:
+            labels: 意图类别列表
+            weights: 权重矩阵 (dim, 类别数)
+            bias: 偏置 (类别数,)
+            dim: 哈希空间维度
+        """
+        self.labels = list(labels)
+        self.dim = dim
+        self.weights = weights if weights is not None else np.zeros((dim, len(self.labels)), dtype=np.float32)
+        self.bias = bias if bias is not None else np.zeros(len(self.labels), dtype=np.float32)
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        """返回各类别概率"""
+        indices, values = extract_features(text, self.dim)
+        logits = values @ self.weights[indices] + self.bias
+        return _softmax(logits)
+
+    def predict(self, text: str) -> Tuple[IntentType, float]:
+        """
+        预测意图
+
+        Returns:
+            (意图类型, 置信度)
+        """
+        proba = self.predict_proba(text)
+        best = int(np.argmax(proba))
+        return IntentType(self.labels[best]), float(proba[best])
+
+    def fit(self, queries: Sequence[str], labels: Sequence[str], epochs: int = 15,
+            batch_size: int = 256, learning_rate: float = 5.0, l2: float = 1e-5,
+            seed: int = 42) -> "IntentClassifier":
+        """
+        小批量梯度下降训练
+
+        Args:
+            queries: 查询文本
+            labels: 对应的意图类型
+            epochs: 训练轮数
+            batch_size: 批大小
+            learning_rate: 学习率
+            l2: L2 正则系数
+            seed: 随机种子
+
+        Returns:
+            self
+        """
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        targets = np.array([label_index[label] for label in labels], dtype=np.int64)
+        features = [extract_features(q, self.dim) for q in queries]
+        rng = np.random.default_rng(seed)
+
+        for epoch in range(epochs):
+            order = rng.permutation(len(features))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                x = np.zeros((len(batch), self.dim), dtype=np.float32)
+                for row, i in enumerate(batch):
+                    indices, values = features[i]
+                    x[row, indices] = values
+
+                grad = _softmax(x @ self.weights + self.bias)
+                grad[np.arange(len(batch)), targets[batch]] -= 1.0
+                grad /= len(batch)
+
+                self.weights -= learning_rate * (x.T @ grad + l2 * self.weights)
+                self.bias -= learning_rate * grad.sum(axis=0)
+
+        return self
+
+    def save(self, path: str):
+        """保存模型"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=self.bias,
+                            labels=np.array(self.labels), dim=self.dim)
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        """加载模型"""
+        data = np.load(path)
+        return cls(labels=[str(label) for label in data["labels"]],
+                   weights=data["weights"], bias=data["bias"], dim=int(data["dim"]))
+
+
+# ==================== 槽位抽取 ====================
+
+CITY_NAMES = [
+    "北京", "上海", "广州", "深圳", "杭州", "成都", "重庆", "西安", "南京", "武汉",
+    "天津", "苏州", "长沙", "郑州", "青岛", "厦门", "昆明", "大连", "沈阳", "济南",
+    "哈尔滨", "福州", "合肥", "南昌", "贵阳", "南宁", "海口", "三亚", "拉萨", "乌鲁木齐",
+    "兰州", "西宁", "银川", "呼和浩特", "太原", "石家庄", "长春", "宁波", "无锡", "桂林",
+    "丽江", "大理", "张家界", "黄山", "九寨沟", "香港", "澳门", "台北", "东京", "大阪",
+    "首尔", "曼谷", "新加坡", "巴黎", "伦敦", "纽约",
+]
+
+PREFERENCE_KEYWORDS = [
+    "自然风光", "历史文化", "主题乐园", "博物馆", "购物", "美食", "宗教建筑",
+    "游泳池", "健身房", "停车场", "SPA", "市中心", "直飞",
+    "经济舱", "商务舱", "头等舱", "三星级", "四星级", "五星级",
+]
+
+_CITY_PATTERN = re.compile("|".join(sorted(CITY_NAMES, key=len, reverse=True)))
+_ISO_DATE = re.compile(r"(\d{4})[-/年](\d{1,2})[-/月](\d{1,2})[日号]?")
+_CN_DATE = re.compile(r"(\d{1,2})月(\d{1,2})[日号]")
+_RELATIVE_DAYS = {"今天": 0, "明天": 1, "后天": 2}
+_DAYS = re.compile(r"(\d+|[一二两三四五六七八九十])\s*天")
+_PASSENGERS = re.compile(r"(\d+|[一二两三四五六七八九十])\s*(?:个人|个大人|人|位|张)")
+_BUDGET = re.compile(r"(?:预算|不超过|以内)\D{0,4}(\d+(?:\.\d+)?)|(\d+(?:\.\d+)?)\s*(?:元|块)")
+_ORDER_ID = re.compile(r"ORD\d{8,}")
+_CN_NUMBERS = {"一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+# 快速通道要求的必备槽位；未列出的意图（预订、比价）依赖 LLM 抽取产品信息
+REQUIRED_SLOTS = {
+    IntentType.FLIGHT: ("departure", "destination", "departure_date"),
+    IntentType.HOTEL: ("destination",),
+    IntentType.ATTRACTION: ("destination",),
+    IntentType.ITINERARY: ("destination",),
+    IntentType.CUSTOMER_SERVICE: (),
+}
+
+
+def _to_int(token: str) -> int:
+    return int(token) if token.isdigit() else _CN_NUMBERS[token]
+
+
+def _resolve_date(month: int, day: int, today: date) -> Optional[date]:
+    """补全年份：今年该日期已过则视为明年"""
+    try:
+        value = date(today.year, month, day)
+    except ValueError:
+        return None
+    if value < today:
+        try:
+            value = date(today.year + 1, month, day)
+        except ValueError:
+            return None
+    return value
+
+
+def extract_slots(query: str, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    规则抽取出发地、目的地、日期、人数、预算和偏好
+
+    Args:
+        query: 用户查询
+        today: 参考日期，默认当天
+
+    Returns:
+        可直接构造 ParsedIntent 的字段字典（不含 intent_type）
+    """
+    today = today or date.today()
+    slots: Dict[str, Any] = {"preferences": [], "extra_info": {}}
+
+    # 城市：出现两个城市时按出现顺序视为出发地和目的地
+    cities = []
+    for match in _CITY_PATTERN.finditer(query):
+        if match.group() not in cities:
+            cities.append(match.group())
+    if len(cities) >= 2:
+        slots["departure"], slots["destination"] = cities[0], cities[1]
+    elif len(cities) == 1:
+        slots["destination"] = cities[0]
+
+    # 日期
+    dates = []
+    for match in _ISO_DATE.finditer(query):
+        try:
+            dates.append((match.start(), date(int(match.group(1)), int(match.group(2)), int(match.group(3)))))
+        except ValueError:
+            pass
+    for match in _CN_DATE.finditer(query):
+        if any(start <= match.start() < start + 11 for start, _ in dates):
+            continue
+        value = _resolve_date(int(match.group(1)), int(match.group(2)), today)
+        if value:
+            dates.append((match.start(), value))
+    for word, offset in _RELATIVE_DAYS.items():
+        position = query.find(word)
+        if position >= 0:
+            dates.append((position, today + timedelta(days=offset)))
+    dates.sort()
+    if dates:
+        slots["departure_date"] = dates[0][1]
+    if len(dates) >= 2:
+        slots["return_date"] = dates[1][1]
+
+    # "N天" 推出返程日期
+    days_match = _DAYS.search(query)
+    if days_match and "departure_date" in slots and "return_date" not in slots:
+        slots["return_date"] = slots["departure_date"] + timedelta(days=_to_int(days_match.group(1)) - 1)
+
+    passengers_match = _PASSENGERS.search(query)
+    if passengers_match:
+        slots["passengers"] = _to_int(passengers_match.group(1))
+
+    budget_match = _BUDGET.search(query)
+    if budget_match:
+        slots["budget"] = float(budget_match.group(1) or budget_match.group(2))
+
+    slots["preferences"] = [keyword for keyword in PREFERENCE_KEYWORDS if keyword in query]
+
+    order_match = _ORDER_ID.search(query)
+    if order_match:
+        slots["extra_info"]["order_id"] = order_match.group()
+
+    return slots
+
+
+def has_required_slots(intent_type: IntentType, slots: Dict[str, Any]) -> bool:
+    """判断快速通道是否具备该意图的必备槽位"""
+    required = REQUIRED_SLOTS.get(intent_type)
+    if required is None:
+        return False
+    return all(slots.get(name) for name in required)
+
+
+# ==================== 影子评估 ====================
+
+class ClassifierStats:
+    """分类器快速通道与影子评估统计"""
+
+    BUCKETS = 10
+
+    def __init__(self):
+        self.fast_path = 0
+        self.fallback_low_confidence = 0
+        self.fallback_missing_slots = 0
+        self.shadow_total = 0
+        self.shadow_agree = 0
+        # 按置信度分桶统计与 LLM 一致的比例，用于挑选阈值
+        self.bucket_total = [0] * self.BUCKETS
+        self.bucket_agree = [0] * self.BUCKETS
+
+    def record_shadow(self, predicted: IntentType, confidence: float, actual: IntentType):
+        """记录一次分类器预测与 LLM 结果的对比"""
+        bucket = min(int(confidence * self.BUCKETS), self.BUCKETS - 1)
+        agree = predicted == actual
+        self.shadow_total += 1
+        self.shadow_agree += agree
+        self.bucket_total[bucket] += 1
+        self.bucket_agree[bucket] += agree
+
+    def accuracy_above(self, threshold: float) -> Tuple[float, float]:
+        """
+        估算某阈值下的快速通道表现
+
+        Returns:
+            (覆盖率, 准确率)
+        """
+        first = min(int(threshold * self.BUCKETS), self.BUCKETS - 1)
+        total = sum(self.bucket_total[first:])
+        agree = sum(self.bucket_agree[first:])
+        coverage = total / self.shadow_total if self.shadow_total else 0.0
+        accuracy = agree / total if total else 0.0
+        return coverage, accuracy
+
+    def stats(self) -> Dict[str, Any]:
+        coverage, accuracy = self.accuracy_above(settings.INTENT_CLASSIFIER_THRESHOLD)
+        return {
+            "fast_path": self.fast_path,
+            "fallback_low_confidence": self.fallback_low_confidence,
+            "fallback_missing_slots": self.fallback_missing_slots,
+            "shadow_total": self.shadow_total,
+            "shadow_agreement": round(self.shadow_agree / self.shadow_total, 4) if self.shadow_total else 0.0,
+            "threshold_coverage": round(coverage, 4),
+            "threshold_accuracy": round(accuracy, 4),
+            "buckets": [
+                {
+                    "confidence": f"{i / self.BUCKETS:.1f}-{(i + 1) / self.BUCKETS:.1f}",
+                    "total": self.bucket_total[i],
+                    "agree": self.bucket_agree[i],
+                }
+                for i in range(self.BUCKETS)
+            ],
+        }
+
+
+# ==================== 加载与训练 ====================
+
+_classifier_instance: Optional[IntentClassifier] = None
+_classifier_loaded = False
+
+
+def get_intent_classifier() -> Optional[IntentClassifier]:
+    """获取本地意图分类器（单例模式），模型文件不存在时返回 None"""
+    global _classifier_instance, _classifier_loaded
+    if not _classifier_loaded:
+        _classifier_loaded = True
+        path = settings.INTENT_CLASSIFIER_PATH
+        if path and os.path.exists(path):
+            _classifier_instance = IntentClassifier.load(path)
+            logger.info(f"已加载本地意图分类器: {path}")
+    return _classifier_instance
+
+
+async def load_training_data() -> Tuple[List[str], List[str]]:
+    """
+    从搜索历史表读取 (查询, 意图类型) 训练样本
+
+    只使用 LLM 成功解析出的标签：分类器自己的预测会把它的错误再喂回训练，
+    解析失败时转客服的 customer_service 也不是真实意图。
+    """
+    from sqlalchemy import select
+    from database import async_read_session_maker, SearchHistoryDB
+
+    valid = {intent.value for intent in IntentType}
+    async with async_read_session_maker() as session:
+        rows = await session.execute(
+            select(SearchHistoryDB.query, SearchHistoryDB.intent_type)
+            .where(SearchHistoryDB.intent_type.isnot(None), SearchHistoryDB.intent_source == "llm")
+        )
+        samples = [(query, intent_type) for query, intent_type in rows if intent_type in valid]
+
+    return [query for query, _ in samples], [intent_type for _, intent_type in samples]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基于搜索历史训练本地意图分类器")
+    parser.add_argument("--output", default=settings.INTENT_CLASSIFIER_PATH, help="模型输出路径")
+    parser.add_argument("--epochs", type=int, default=15)
+    parser.add_argument("--holdout", type=float, default=0.1, help="留出评估集比例")
+    args = parser.parse_args()
+
+    queries, labels = asyncio.run(load_training_data())
+    if not queries:
+        print("搜索历史中没有可用的训练样本")
+        return
+
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(queries))
+    split = int(len(order) * (1 - args.holdout))
+    train, test = order[:split], order[split:]
+
+    classifier = IntentClassifier(labels=[intent.value for intent in IntentType])
+    classifier.fit([queries[i] for i in train], [labels[i] for i in train], epochs=args.epochs)
+
+    stats = ClassifierStats()
+    for i in test:
+        predicted, confidence = classifier.predict(queries[i])
+        stats.record_shadow(predicted, confidence, IntentType(labels[i]))
+
+    print(f"训练样本: {len(train)}, 评估样本: {len(test)}")
+    if stats.shadow_total:
+        print(f"评估准确率: {stats.shadow_agree / stats.shadow_total:.4f}")
+        for threshold in (0.5, 0.7, 0.8, 0.9, 0.95):
+            coverage, accuracy = stats.accuracy_above(threshold)
+            print(f"阈值 {threshold:.2f}: 覆盖率 {coverage:.2%}, 准确率 {accuracy:.2%}")
+
+    classifier.save(args.output)
+    print(f"模型已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,41 @@
 """
 行程规划智能体
-职责：整合交通/住宿/景点生成行程
+职责：整合交通/住宿/景点生成行程；流式解析模型输出，逐天产出行程
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List, Optional
 from datetime import date, timedelta
-from langchain.prompts import ChatPromptTemplate
 from langchain_core.language_models import BaseChatModel
 from .base_agent import BaseAgent
-from models import Itinerary, ItineraryDay
+from .prompt_budget import PromptBudget
+from .json_stream import StreamingArrayParser
+from .route_optimizer import plan_routes
+from models import Itinerary, ItineraryDay, AgentExecutionMode
 import random
-import json
+
+
+def _is_complete_plan(response: str) -> bool:
+    """响应是否为完整且每天都合法的行程 JSON（被截断或含非法天数的响应不缓存）"""
+    parser = StreamingArrayParser("days")
+    days = parser.feed(response)
+    return bool(days) and parser.complete and not parser.errors
 
 
 class ItineraryPlanAgent(BaseAgent):
     """行程规划智能体"""
     
-    def __init__(self, llm: BaseChatModel):
-        super().__init__(llm, "行程规划智能体")
+    cache_ttl = 1800
     
-    def _create_prompt_template(self) -> ChatPromptTemplate:
-        """创建提示词模板"""
-        return ChatPromptTemplate.from_messages([
-            ("system", """你是一个专业的旅行行程规划师。根据用户的旅行信息，制定详细的每日行程计划。
-
-请为每一天规划：
-1. 上午安排：2-3个活动或景点
-2. 下午安排：2-3个活动或景点
-3. 晚上安排：1-2个活动
-4. 住宿推荐
-5. 交通建议
-6. 预计花费
+    # 每日路线必须完整给出，长行程需要更大的预算
+    prompt_token_budget = 1200
+    
+    system_prompt = """你是一个专业的旅行行程规划师。根据用户的旅行信息，制定详细的每日行程计划。
 
-注意事项：
-- 合理安排景点顺序，考虑地理位置
-- 预留用餐和休息时间
-- 避免行程过于紧凑
-- 考虑景点开放时间
+每日上午、下午的景点路线已按地理位置和游玩时长排好，请不要调整顺序，只需为每一天补充：
+1. 晚上安排：1-2个活动
+2. 住宿推荐
+3. 交通建议
+4. 预计花费
+没有安排路线的日子，再自行补充上午、下午活动。
 
 请以JSON格式返回每日行程，格式如下：
 {{
@@ -51,8 +51,9 @@ class ItineraryPlanAgent(BaseAgent):
     }}
   ],
   "summary": "行程总结"
-}}"""),
-            ("user", """行程规划参数：
+}}"""
+    
+    user_prompt = """行程规划参数：
 目的地: {destination}
 开始日期: {start_date}
 结束日期: {end_date}
@@ -65,11 +66,13 @@ class ItineraryPlanAgent(BaseAgent):
 可选酒店信息：
 {hotel_info}
 
-推荐景点信息：
-{attraction_info}
+每日景点路线：
+{route_info}
 
-请制定详细的行程计划。""")
-        ])
+请制定详细的行程计划。"""
+    
+    def __init__(self, llm: BaseChatModel):
+        super().__init__(llm, "行程规划智能体")
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -79,133 +82,200 @@ class ItineraryPlanAgent(BaseAgent):
             input_data: 包含行程规划参数和其他智能体的结果
             
         Returns:
-            行程规划结果
+            行程规划结果；延迟执行模式下只返回生成参数（plan_inputs），由 astream_plan() 流式生成
         """
-        destination = input_data.get("destination", "")
-        start_date_str = input_data.get("departure_date", "")
-        return_date_str = input_data.get("return_date", "")
-        budget = input_data.get("budget", 0)
-        
-        # 获取其他智能体的结果
-        flight_data = input_data.get("flight_data", {})
-        hotel_data = input_data.get("hotel_data", {})
-        attraction_data = input_data.get("attraction_data", {})
-        
-        self.log_info(f"规划行程: {destination}, {start_date_str} 至 {return_date_str}")
+        if self.get_execution_mode(input_data) == AgentExecutionMode.DEFERRED:
+            return {
+                "success": True,
+                "data": None,
+                "message": "行程生成中",
+                "plan_inputs": {**input_data, "mode": AgentExecutionMode.FULL.value}
+            }
         
         try:
-            # 计算天数
-            if start_date_str and return_date_str:
-                start_date = date.fromisoformat(start_date_str)
-                end_date = date.fromisoformat(return_date_str)
-                days = (end_date - start_date).days + 1
-            else:
-                days = 3
-                start_date = date.today()
-                end_date = start_date + timedelta(days=days-1)
-            
-            # 格式化其他智能体的数据
-            flight_info = self._format_flight_info(flight_data)
-            hotel_info = self._format_hotel_info(hotel_data)
-            attraction_info = self._format_attraction_info(attraction_data)
+            plan = self._prepare(input_data)
             
             # 调用LLM生成行程
-            response = await self.invoke_llm(
-                destination=destination,
-                start_date=start_date.isoformat(),
-                end_date=end_date.isoformat(),
-                days=days,
-                budget=f"¥{budget}" if budget else "不限",
-                flight_info=flight_info,
-                hotel_info=hotel_info,
-                attraction_info=attraction_info
-            )
-            
-            # 解析响应
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
-            response = response.strip()
+            response = await self.invoke_llm(validate=_is_complete_plan, **plan["prompt"])
             
-            itinerary_data = json.loads(response)
-            
-            # 构建行程对象
-            itinerary_days = []
-            for day_data in itinerary_data.get("days", []):
-                itinerary_day = ItineraryDay(
-                    day=day_data["day"],
-                    travel_date=start_date + timedelta(days=day_data["day"]-1),
-                    morning=day_data.get("morning", []),
-                    afternoon=day_data.get("afternoon", []),
-                    evening=day_data.get("evening", []),
-                    accommodation=day_data.get("accommodation", ""),
-                    transportation=day_data.get("transportation", ""),
-                    estimated_cost=day_data.get("estimated_cost", 0.0)
-                )
-                itinerary_days.append(itinerary_day)
-            
-            total_cost = sum(day.estimated_cost for day in itinerary_days)
-            
-            itinerary = Itinerary(
-                itinerary_id=f"IT{random.randint(10000, 99999)}",
-                title=f"{destination}{days}日游",
-                destination=destination,
-                start_date=start_date,
-                end_date=end_date,
-                days=itinerary_days,
-                total_cost=total_cost,
-                summary=itinerary_data.get("summary", "")
-            )
-            
-            self.log_info(f"行程规划完成: {days}天")
+            # 与流式路径使用同一解析器：个别天数不合法或响应被截断时保留其余天数
+            parser = StreamingArrayParser("days")
+            itinerary_days = [self._build_day(day_data, plan) for day_data in parser.feed(response)]
+            return self._build_result(plan, [day for day in itinerary_days if day], parser)
             
+        except Exception as e:
+            self.log_error("行程规划失败", e)
             return {
-                "success": True,
-                "data": itinerary.model_dump(),
-                "message": f"{days}天行程规划完成"
+                "success": False,
+                "error": f"行程规划失败: {str(e)}"
             }
+    
+    async def astream_plan(self, input_data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式规划行程：边接收 LLM 输出边解析，每天的行程一生成完就输出
+        
+        Args:
+            input_data: 同 process()
             
+        Yields:
+            {"type": "day", "data": 单日行程} 若干个，最后是 {"type": "result", "data": 与 process() 相同的结果}
+        """
+        try:
+            plan = self._prepare(input_data)
+            parser = StreamingArrayParser("days")
+            itinerary_days = []
+            async for chunk in self.astream_llm(validate=_is_complete_plan, **plan["prompt"]):
+                for day_data in parser.feed(chunk):
+                    day = self._build_day(day_data, plan)
+                    if day:
+                        itinerary_days.append(day)
+                        yield {"type": "day", "data": day.model_dump()}
+            result = self._build_result(plan, itinerary_days, parser)
         except Exception as e:
             self.log_error("行程规划失败", e)
-            return {
+            result = {
                 "success": False,
                 "error": f"行程规划失败: {str(e)}"
             }
+        yield {"type": "result", "data": result}
     
-    def _format_flight_info(self, flight_data: Dict[str, Any]) -> str:
-        """格式化航班信息"""
-        if not flight_data or not flight_data.get("flights"):
-            return "暂无航班信息"
+    def _prepare(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """计算日期和景点路线，组装提示词参数"""
+        destination = input_data.get("destination", "")
+        start_date_str = input_data.get("departure_date", "")
+        return_date_str = input_data.get("return_date", "")
+        budget = input_data.get("budget", 0)
         
-        flights = flight_data.get("flights", [])[:3]  # 只取前3个
-        lines = []
-        for f in flights:
-            lines.append(f"{f.get('airline', '')} {f.get('flight_number', '')} - ¥{f.get('price', 0)}")
-        return "\n".join(lines)
-    
-    def _format_hotel_info(self, hotel_data: Dict[str, Any]) -> str:
-        """格式化酒店信息"""
-        if not hotel_data or not hotel_data.get("hotels"):
-            return "暂无酒店信息"
+        # 获取其他智能体的结果
+        flight_data = input_data.get("flight_data", {})
+        hotel_data = input_data.get("hotel_data", {})
+        attraction_data = input_data.get("attraction_data", {})
         
-        hotels = hotel_data.get("hotels", [])[:3]  # 只取前3个
-        lines = []
-        for h in hotels:
-            lines.append(f"{h.get('name', '')} - ¥{h.get('price_per_night', 0)}/晚")
-        return "\n".join(lines)
+        self.log_info(f"规划行程: {destination}, {start_date_str} 至 {return_date_str}")
+        
+        # 计算天数
+        if start_date_str and return_date_str:
+            start_date = date.fromisoformat(str(start_date_str))
+            end_date = date.fromisoformat(str(return_date_str))
+            days = (end_date - start_date).days + 1
+        else:
+            days = 3
+            start_date = date.today()
+            end_date = start_date + timedelta(days=days-1)
+        
+        # 景点顺序由本地路线优化确定，LLM 只负责补充叙述
+        routes = plan_routes(attraction_data.get("attractions", []) if attraction_data else [], days)
+        
+        # 每日路线完整计入预算，航班、酒店候选在剩余预算内各取前几条
+        token_budget = self.new_prompt_budget()
+        route_info = token_budget.add("route_info", self._format_route_info(routes))
+        hotel_info = self._format_hotel_info(hotel_data, token_budget)
+        flight_info = self._format_flight_info(flight_data, token_budget)
+        
+        return {
+            "destination": destination,
+            "start_date": start_date,
+            "end_date": end_date,
+            "days": days,
+            "route_by_day": {route["day"]: route for route in routes if route["stops"]},
+            "prompt": {
+                "destination": destination,
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "days": days,
+                "budget": f"¥{budget}" if budget else "不限",
+                "flight_info": flight_info,
+                "hotel_info": hotel_info,
+                "route_info": route_info
+            }
+        }
+    
+    def _build_day(self, day_data: Dict[str, Any], plan: Dict[str, Any]) -> Optional[ItineraryDay]:
+        """由模型输出的单日数据构建行程（字段不合法时跳过该天）"""
+        try:
+            day = int(day_data["day"])
+            route = plan["route_by_day"].get(day)
+            return ItineraryDay(
+                day=day,
+                travel_date=plan["start_date"] + timedelta(days=day-1),
+                morning=route["morning"] if route else day_data.get("morning", []),
+                afternoon=route["afternoon"] if route else day_data.get("afternoon", []),
+                evening=day_data.get("evening", []),
+                accommodation=day_data.get("accommodation", ""),
+                transportation=day_data.get("transportation", ""),
+                estimated_cost=day_data.get("estimated_cost", 0.0)
+            )
+        except Exception as e:
+            self.log_error(f"跳过无法解析的行程: {str(day_data)[:80]}", e)
+            return None
     
-    def _format_attraction_info(self, attraction_data: Dict[str, Any]) -> str:
-        """格式化景点信息"""
-        if not attraction_data or not attraction_data.get("attractions"):
-            return "暂无景点信息"
+    def _build_result(self, plan: Dict[str, Any], itinerary_days: List[ItineraryDay],
+                      parser: StreamingArrayParser) -> Dict[str, Any]:
+        """汇总已解析的每日行程；响应被截断或部分天数无法解析时保留其余天数"""
+        days = plan["days"]
+        if not itinerary_days:
+            raise ValueError("模型响应中没有可解析的行程")
+        
+        message = f"{days}天行程规划完成"
+        if parser.truncated or len(itinerary_days) < days:
+            self.log_info(f"模型响应不完整，保留已解析的 {len(itinerary_days)}/{days} 天")
+            message = f"{days}天行程规划完成（已生成 {len(itinerary_days)} 天）"
+        
+        total_cost = sum(day.estimated_cost for day in itinerary_days)
+        summary = parser.fields.get("summary")
+        
+        itinerary = Itinerary(
+            itinerary_id=f"IT{random.randint(10000, 99999)}",
+            title=f"{plan['destination']}{days}日游",
+            destination=plan["destination"],
+            start_date=plan["start_date"],
+            end_date=plan["end_date"],
+            days=itinerary_days,
+            total_cost=total_cost,
+            summary=summary if isinstance(summary, str) else ""
+        )
+        
+        self.log_info(f"行程规划完成: {days}天")
         
-        attractions = attraction_data.get("attractions", [])
+        return {
+            "success": True,
+            "data": itinerary.model_dump(),
+            "message": message
+        }
+    
+    def _format_flight_info(self, flight_data: Dict[str, Any], token_budget: PromptBudget) -> str:
+        """格式化航班信息（最多前3个，超出剩余预算时继续截断）"""
+        flights = (flight_data or {}).get("flights", [])[:3]
+        return token_budget.table(
+            "flight_info",
+            ("航司", "航班", "价格"),
+            [(f.get("airline", ""), f.get("flight_number", ""), f.get("price", 0)) for f in flights],
+            empty="暂无航班信息"
+        )
+    
+    def _format_hotel_info(self, hotel_data: Dict[str, Any], token_budget: PromptBudget) -> str:
+        """格式化酒店信息（最多前3个，只用一半剩余预算，给航班留出空间）"""
+        hotels = (hotel_data or {}).get("hotels", [])[:3]
+        return token_budget.table(
+            "hotel_info",
+            ("酒店", "每晚价格"),
+            [(h.get("name", ""), h.get("price_per_night", 0)) for h in hotels],
+            max_tokens=token_budget.remaining // 2,
+            empty="暂无酒店信息"
+        )
+    
+    def _format_route_info(self, routes: List[Dict[str, Any]]) -> str:
+        """格式化每日景点路线"""
         lines = []
-        for a in attractions:
-            lines.append(f"{a.get('name', '')} - {a.get('category', '')} - 门票¥{a.get('ticket_price', 0)}")
-        return "\n".join(lines)
+        for route in routes:
+            if not route["stops"]:
+                lines.append(f"第{route['day']}天: 未安排景点")
+                continue
+            tickets = sum(a.get("ticket_price", 0) for a in route["stops"])
+            lines.append(
+                f"第{route['day']}天: 上午 {' → '.join(route['morning']) or '无'}；"
+                f"下午 {' → '.join(route['afternoon']) or '无'}"
+                f"（路程约{route['distance_km']}公里，门票¥{tickets:g}）"
+            )
+        return "\n".join(lines) if lines else "暂无景点信息"
 
@@ -0,0 +1,197 @@
+"""
+流式 JSON 解析
+职责：边接收 LLM 输出边扫描 JSON，顶层数组中的对象一闭合就解析输出；响应被截断时保留已完整的元素
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional
+from loguru import logger
+
+# 字符串内只需关心引号和转义符，其余字符整段跳过
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+# 缓冲区中已扫描且不再需要的前缀超过该长度时丢弃
+_TRIM_THRESHOLD = 4096
+
+
+class StreamingArrayParser:
+    """
+    顶层对象中指定数组的增量解析器
+
+    输入形如 {"days": [{...}, {...}], "summary": "..."}，前后可以带 ``` 代码块标记或说明文字
+    （第一个 { 之前、根对象闭合之后的内容都忽略）。
+    feed() 返回本次新闭合的数组元素；其他顶层字段解析后放入 fields。
+    单个元素不是合法 JSON 时跳过该元素并计入 errors，不影响其余元素。
+    """
+
+    def __init__(self, array_key: str):
+        """
+        初始化解析器
+
+        Args:
+            array_key: 需要逐个输出元素的顶层数组字段名
+        """
+        self.array_key = array_key
+        self.fields: Dict[str, Any] = {}
+        self.errors = 0
+        self.complete = False  # 根对象是否已闭合
+
+        self._buffer = ""
+        self._offset = 0  # _buffer[0] 在整个输入中的位置
+        self._pos = 0  # 下一个待扫描字符在整个输入中的位置
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self._element_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        输入一段文本
+
+        Args:
+            chunk: LLM 输出片段
+
+        Returns:
+            本次新闭合的数组元素
+        """
+        if self.complete or not chunk:
+            return []
+        self._buffer += chunk
+        elements = self._scan()
+        self._trim()
+        return elements
+
+    @property
+    def truncated(self) -> bool:
+        """输入是否在根对象闭合前结束（未闭合的元素已丢弃）"""
+        return not self.complete
+
+    def _char(self, position: int) -> str:
+        return self._buffer[position - self._offset]
+
+    def _slice(self, start: int, end: int) -> str:
+        return self._buffer[start - self._offset:end - self._offset]
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        """从上次停止的位置继续扫描"""
+        elements = []
+        end = self._offset + len(self._buffer)
+        while self._pos < end and not self.complete:
+            if self._in_string:
+                self._scan_string(end)
+                continue
+
+            char = self._char(self._pos)
+            position = self._pos
+            self._pos += 1
+
+            if not self._stack:
+                # 根对象之前的内容（代码块标记、说明文字）直接跳过
+                if char == "{":
+                    self._stack.append("{")
+                    self._expect_key = True
+                continue
+
+            depth = len(self._stack)
+            if char == '"':
+                self._in_string = True
+                if depth == 1:
+                    if self._expect_key:
+                        self._key_start = position
+                    else:
+                        self._value_start = position
+            elif char in "{[":
+                if depth == 1 and not (char == "[" and self._key == self.array_key):
+                    # 目标数组不整体保留，元素闭合时逐个解析
+                    self._value_start = position
+                elif depth == 2 and char == "{" and self._in_target_array():
+                    self._element_start = position
+                self._stack.append(char)
+            elif char in "}]":
+                self._stack.pop()
+                depth = len(self._stack)
+                if depth == 0:
+                    self._end_scalar(position)
+                    self.complete = True
+                elif depth == 1:
+                    self._end_value(position + 1)
+                elif depth == 2 and char == "}" and self._element_start is not None:
+                    element = self._parse(self._element_start, position + 1)
+                    self._element_start = None
+                    if isinstance(element, dict):
+                        elements.append(element)
+            elif depth == 1:
+                if char == ":":
+                    self._expect_key = False
+                elif char == ",":
+                    self._end_scalar(position)
+                    self._expect_key = True
+                elif not char.isspace() and self._value_start is None and not self._expect_key:
+                    # 数字、true/false/null 等标量，遇到 , 或 } 结束
+                    self._value_start = position
+        return elements
+
+    def _scan_string(self, end: int):
+        """跳过字符串内容直到闭合引号"""
+        while self._pos < end:
+            if self._escape:
+                self._escape = False
+                self._pos += 1
+                continue
+            match = _STRING_SPECIAL.search(self._buffer, self._pos - self._offset)
+            if match is None:
+                self._pos = end
+                return
+            self._pos = match.start() + self._offset + 1
+            if match.group() == "\\":
+                self._escape = True
+                continue
+            self._in_string = False
+            if len(self._stack) == 1:
+                if self._key_start is not None:
+                    self._key = self._parse(self._key_start, self._pos)
+                    self._key_start = None
+                else:
+                    self._end_value(self._pos)
+            return
+
+    def _in_target_array(self) -> bool:
+        return self._stack == ["{", "["] and self._key == self.array_key
+
+    def _end_scalar(self, position: int):
+        """标量值在 , 或 } 处结束"""
+        if self._value_start is not None:
+            self._end_value(position)
+
+    def _end_value(self, end: int):
+        """顶层字段值结束：目标数组的元素已逐个输出，其余字段解析后保存"""
+        start, key = self._value_start, self._key
+        self._value_start = self._key = None
+        if start is None or key is None:
+            return
+        value = self._parse(start, end)
+        if value is not None:
+            self.fields[key] = value
+
+    def _parse(self, start: int, end: int) -> Any:
+        """解析一段完整的 JSON 值，失败时返回 None"""
+        text = self._slice(start, end).strip()
+        try:
+            return json.loads(text)
+        except ValueError:
+            self.errors += 1
+            logger.warning(f"跳过无法解析的 JSON 片段: {text[:80]}")
+            return None
+
+    def _trim(self):
+        """丢弃已扫描完且不再引用的前缀"""
+        starts = [p for p in (self._key_start, self._value_start, self._element_start) if p is not None]
+        keep = min(starts) if starts else self._pos
+        if keep - self._offset > _TRIM_THRESHOLD:
+            self._buffer = self._buffer[keep - self._offset:]
+            self._offset = keep
+
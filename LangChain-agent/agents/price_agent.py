@@ -2,24 +2,23 @@
 价格对比智能体
 职责：跨平台（模拟）价格比对
 """
-from typing import Dict, Any
-from langchain.prompts import ChatPromptTemplate
+from typing import Dict, Any, List
 from langchain_core.language_models import BaseChatModel
 from .base_agent import BaseAgent
-from models import PriceComparison
-import random
+from .prompt_budget import PromptBudget
+from models import PriceComparison, BatchPriceComparison, AgentExecutionMode
+import numpy as np
+
+
+PLATFORMS = ("携程", "飞猪", "去哪儿", "马蜂窝", "同程")
 
 
 class PriceCompareAgent(BaseAgent):
     """价格对比智能体"""
     
-    def __init__(self, llm: BaseChatModel):
-        super().__init__(llm, "价格对比智能体")
+    cache_ttl = 120  # 比价结果时效性强
     
-    def _create_prompt_template(self) -> ChatPromptTemplate:
-        """创建提示词模板"""
-        return ChatPromptTemplate.from_messages([
-            ("system", """你是一个专业的价格分析助手。根据不同平台的价格对比，给出购买建议。
+    system_prompt = """你是一个专业的价格分析助手。根据不同平台的价格对比，给出购买建议。
 
 请分析：
 1. 各平台价格差异
@@ -27,8 +26,9 @@ class PriceCompareAgent(BaseAgent):
 3. 价格差异原因（可能）
 4. 购买建议
 
-给出简洁专业的建议。"""),
-            ("user", """价格对比信息：
+给出简洁专业的建议。"""
+    
+    user_prompt = """价格对比信息：
 产品: {product_name}
 类型: {product_type}
 
@@ -38,23 +38,29 @@ class PriceCompareAgent(BaseAgent):
 最低价: ¥{lowest_price} ({lowest_platform})
 价格差: ¥{price_difference}
 
-请给出购买建议。""")
-        ])
+请给出购买建议。"""
+    
+    def __init__(self, llm: BaseChatModel):
+        super().__init__(llm, "价格对比智能体")
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         对比价格
         
         Args:
-            input_data: 包含产品信息
+            input_data: 包含产品信息；传入 products 列表时批量对比
             
         Returns:
             价格对比结果
         """
+        if input_data.get("products") is not None:
+            return await self._process_batch(input_data)
+        
         product_id = input_data.get("product_id", "")
         product_name = input_data.get("product_name", "")
         product_type = input_data.get("product_type", "")
         base_price = input_data.get("base_price", 1000.0)
+        mode = self.get_execution_mode(input_data)
         
         self.log_info(f"对比价格: {product_name} ({product_type})")
         
@@ -66,24 +72,31 @@ class PriceCompareAgent(BaseAgent):
             prices_info = "\n".join([f"{platform}: ¥{price}" 
                                     for platform, price in comparison.prices.items()])
             
+            advice_inputs = {
+                "product_name": product_name,
+                "product_type": product_type,
+                "prices_info": prices_info,
+                "lowest_price": comparison.lowest_price,
+                "lowest_platform": comparison.lowest_platform,
+                "price_difference": comparison.price_difference
+            }
+            
             # 调用LLM生成建议
-            suggestion = await self.invoke_llm(
-                product_name=product_name,
-                product_type=product_type,
-                prices_info=prices_info,
-                lowest_price=comparison.lowest_price,
-                lowest_platform=comparison.lowest_platform,
-                price_difference=comparison.price_difference
-            )
+            suggestion = ""
+            if mode == AgentExecutionMode.FULL:
+                suggestion = await self.invoke_llm(**advice_inputs)
             
             self.log_info(f"价格对比完成，最低价: ¥{comparison.lowest_price}")
             
-            return {
+            response = {
                 "success": True,
                 "data": comparison.model_dump(),
                 "suggestion": suggestion,
                 "message": "价格对比完成"
             }
+            if mode == AgentExecutionMode.DEFERRED:
+                response["advice_inputs"] = advice_inputs
+            return response
             
         except Exception as e:
             self.log_error("价格对比失败", e)
@@ -92,31 +105,119 @@ class PriceCompareAgent(BaseAgent):
                 "error": f"价格对比失败: {str(e)}"
             }
     
-    def _compare_prices(self, product_id: str, product_name: str, 
-                       product_type: str, base_price: float) -> PriceComparison:
-        """模拟跨平台价格对比"""
-        platforms = ["携程", "飞猪", "去哪儿", "马蜂窝", "同程"]
-        prices = {}
+    async def _process_batch(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """批量对比一组产品的价格，整批只生成一次建议"""
+        products = input_data.get("products") or []
+        product_type = input_data.get("product_type") or (products[0].get("product_type", "") if products else "")
+        mode = self.get_execution_mode(input_data)
+        
+        self.log_info(f"批量对比价格: {len(products)} 个产品 ({product_type})")
+        
+        try:
+            if not products:
+                raise ValueError("产品列表为空")
+            comparison = self.compare_batch(products, product_type)
+            
+            lowest_item = next(item for item in comparison.items
+                               if item.product_id == comparison.lowest_product_id)
+            prices_info = self._format_prices_info(comparison.items, self.new_prompt_budget())
+            
+            advice_inputs = {
+                "product_name": f"{comparison.total_count} 个候选产品",
+                "product_type": product_type,
+                "prices_info": prices_info,
+                "lowest_price": comparison.lowest_price,
+                "lowest_platform": f"{lowest_item.product_name} @ {comparison.lowest_platform}",
+                "price_difference": comparison.max_price_difference
+            }
+            
+            suggestion = ""
+            if mode == AgentExecutionMode.FULL:
+                suggestion = await self.invoke_llm(**advice_inputs)
+            
+            self.log_info(f"批量价格对比完成，最低价: ¥{comparison.lowest_price}")
+            
+            response = {
+                "success": True,
+                "data": comparison.model_dump(),
+                "suggestion": suggestion,
+                "message": f"{comparison.total_count} 个产品价格对比完成"
+            }
+            if mode == AgentExecutionMode.DEFERRED:
+                response["advice_inputs"] = advice_inputs
+            return response
         
-        # 生成各平台价格（基于基础价格浮动）
-        for platform in platforms:
-            price_variation = random.uniform(-0.15, 0.15)  # ±15%浮动
-            price = round(base_price * (1 + price_variation), 2)
-            prices[platform] = price
+        except Exception as e:
+            self.log_error("批量价格对比失败", e)
+            return {
+                "success": False,
+                "error": f"批量价格对比失败: {str(e)}"
+            }
+    
+    def _format_prices_info(self, items: List[PriceComparison], budget: PromptBudget) -> str:
+        """格式化批量比价信息（产品 × 平台紧凑表格，按最低价排序，超出 token 预算的产品从末尾截断）"""
+        return budget.table(
+            "prices_info",
+            ("产品", *PLATFORMS, "最低价", "最低平台", "价差"),
+            [
+                (item.product_name, *(item.prices.get(platform) for platform in PLATFORMS),
+                 item.lowest_price, item.lowest_platform, item.price_difference)
+                for item in sorted(items, key=lambda item: item.lowest_price)
+            ]
+        )
+    
+    def compare_batch(self, products: List[Dict[str, Any]], product_type: str = "") -> BatchPriceComparison:
+        """
+        批量模拟跨平台价格对比
         
-        # 找出最低价
-        lowest_platform = min(prices, key=prices.get)
-        lowest_price = prices[lowest_platform]
-        highest_price = max(prices.values())
-        price_difference = round(highest_price - lowest_price, 2)
+        一次生成 (产品 × 平台) 价格矩阵，按行求最低价、最低价平台和价差
         
-        return PriceComparison(
-            product_id=product_id,
-            product_name=product_name,
+        Args:
+            products: 产品列表，元素包含 product_id、product_name、base_price
+            product_type: 产品类型
+            
+        Returns:
+            批量价格对比结果
+        """
+        base_prices = np.array([float(p.get("base_price", 1000.0)) for p in products])
+        # 各平台价格（基于基础价格 ±15% 浮动）
+        variation = np.random.uniform(-0.15, 0.15, size=(len(products), len(PLATFORMS)))
+        prices = np.round(base_prices[:, None] * (1 + variation), 2)
+        
+        lowest_index = prices.argmin(axis=1)
+        lowest_prices = prices[np.arange(len(products)), lowest_index]
+        differences = np.round(prices.max(axis=1) - lowest_prices, 2)
+        
+        items = [
+            PriceComparison(
+                product_id=product.get("product_id", ""),
+                product_name=product.get("product_name", ""),
+                product_type=product.get("product_type", product_type),
+                prices=dict(zip(PLATFORMS, row.tolist())),
+                lowest_price=float(lowest),
+                lowest_platform=PLATFORMS[index],
+                price_difference=float(difference)
+            )
+            for product, row, index, lowest, difference
+            in zip(products, prices, lowest_index, lowest_prices, differences)
+        ]
+        
+        best = int(lowest_prices.argmin())
+        wins = np.bincount(lowest_index, minlength=len(PLATFORMS))
+        return BatchPriceComparison(
             product_type=product_type,
-            prices=prices,
-            lowest_price=lowest_price,
-            lowest_platform=lowest_platform,
-            price_difference=price_difference
+            platforms=list(PLATFORMS),
+            items=items,
+            total_count=len(items),
+            lowest_price=items[best].lowest_price,
+            lowest_product_id=items[best].product_id,
+            lowest_platform=items[best].lowest_platform,
+            max_price_difference=float(differences.max()),
+            platform_wins=dict(zip(PLATFORMS, wins.tolist()))
         )
-
+    
+    def _compare_prices(self, product_id: str, product_name: str, 
+                       product_type: str, base_price: float) -> PriceComparison:
+        """模拟跨平台价格对比"""
+        product = {"product_id": product_id, "product_name": product_name, "base_price": base_price}
+        return self.compare_batch([product], product_type).items[0]
@@ -0,0 +1,166 @@
+"""
+提示词 token 预算
+职责：估算模板变量的 token 数，列表类数据以紧凑表格编码并按优先级截断到智能体的预算内，记录提示词规模指标
+"""
+import math
+import re
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from metrics import PROMPT_ROWS_DROPPED, PROMPT_TOKENS, PROMPT_VARIABLE_TOKENS
+
+# 中日韩文字和全角标点大致一字一个 token；数字按位切分，也是一位一个 token
+_WIDE_OR_DIGIT = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef0-9]")
+
+# 其余字符（英文、符号、空白）平均约 4 个字符一个 token
+_CHARS_PER_TOKEN = 4
+
+# 测量静态前缀时代替模板变量的占位符
+_VARIABLE_SENTINEL = "\x00"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数（不依赖分词器，偏保守）
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算 token 数
+    """
+    if not text:
+        return 0
+    counted = len(_WIDE_OR_DIGIT.findall(text))
+    return counted + math.ceil((len(text) - counted) / _CHARS_PER_TOKEN)
+
+
+def format_cell(value: Any) -> str:
+    """表格单元格取值：浮点数最多保留两位小数并去掉末尾的 0，列表用顿号连接，分隔符和换行替换掉"""
+    if value is None:
+        return "-"
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, float):
+        # 保留两位小数再去掉末尾的 0；不用 :g，它只有 6 位有效数字，会改动较大的价格
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    if isinstance(value, (list, tuple)):
+        return "、".join(format_cell(item) for item in value)
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def format_row(values: Sequence[Any]) -> str:
+    """表格的一行，列之间用 | 分隔"""
+    return "|".join(format_cell(value) for value in values)
+
+
+class PromptBudget:
+    """
+    单次调用的提示词 token 预算
+
+    预算只约束模板变量中的数据部分（系统指令和模板固定文字不计入）。
+    必须完整给出的变量通过 add() 计入，列表类变量通过 table() 编码，
+    条目按传入顺序视为优先级（检索、个性化排序的结果），超出预算时从末尾截断。
+    """
+
+    def __init__(self, agent: str, max_tokens: int):
+        """
+        初始化预算
+
+        Args:
+            agent: 智能体类名（指标标签）
+            max_tokens: 数据部分的 token 上限
+        """
+        self.agent = agent
+        self.max_tokens = max_tokens
+        self.usage: Dict[str, int] = {}
+
+    @property
+    def remaining(self) -> int:
+        """剩余可用 token 数"""
+        return max(0, self.max_tokens - sum(self.usage.values()))
+
+    def add(self, variable: str, text: str) -> str:
+        """
+        计入一个不截断的变量
+
+        Args:
+            variable: 模板变量名
+            text: 变量文本
+
+        Returns:
+            原文本
+        """
+        self._record(variable, estimate_tokens(text))
+        return text
+
+    def table(self, variable: str, columns: Sequence[str], rows: Sequence[Sequence[Any]],
+              max_tokens: Optional[int] = None, empty: str = "") -> str:
+        """
+        以紧凑表格编码列表变量，只保留预算内的前若干条
+
+        Args:
+            variable: 模板变量名
+            columns: 列名
+            rows: 按优先级排列的记录
+            max_tokens: 该变量的上限，默认使用全部剩余预算
+            empty: 没有记录时的文本
+
+        Returns:
+            表格文本；有条目被截断时末尾注明未列出的条数
+        """
+        if not rows:
+            return self.add(variable, empty)
+
+        limit = self.remaining if max_tokens is None else min(max_tokens, self.remaining)
+        # 紧凑表格：列名只在首行出现一次，每条记录一行，省去逐条重复的字段标签和连接符
+        header = "|".join(columns)
+        lines = [header]
+        used = estimate_tokens(header)
+        for row in rows:
+            line = format_row(row)
+            cost = estimate_tokens(line) + 1
+            # 至少保留一条，避免预算过小时模型拿不到任何候选
+            if used + cost > limit and len(lines) > 1:
+                break
+            lines.append(line)
+            used += cost
+
+        dropped = len(rows) - (len(lines) - 1)
+        if dropped:
+            lines.append(f"（另有{dropped}条未列出）")
+            PROMPT_ROWS_DROPPED.inc(dropped, agent=self.agent, variable=variable)
+        return self.add(variable, "\n".join(lines))
+
+    def _record(self, variable: str, tokens: int):
+        self.usage[variable] = self.usage.get(variable, 0) + tokens
+        PROMPT_VARIABLE_TOKENS.observe(tokens, agent=self.agent, variable=variable)
+
+
+def prompt_tokens(messages: Iterable[Any]) -> int:
+    """估算已格式化提示词（消息列表）的 token 数"""
+    return sum(estimate_tokens(str(message.content)) for message in messages)
+
+
+def static_prefix_tokens(template: Any) -> int:
+    """
+    估算提示词模板中各次调用逐字节相同的前缀 token 数（第一个模板变量之前的全部内容）
+
+    Args:
+        template: ChatPromptTemplate
+
+    Returns:
+        估算 token 数
+    """
+    messages = template.format_messages(**{name: _VARIABLE_SENTINEL for name in template.input_variables})
+    tokens = 0
+    for message in messages:
+        head, found, _ = str(message.content).partition(_VARIABLE_SENTINEL)
+        tokens += estimate_tokens(head)
+        if found:
+            break
+    return tokens
+
+
+def record_prompt(agent: str, messages: List[Any]):
+    """记录一次 LLM 调用的提示词规模"""
+    PROMPT_TOKENS.observe(prompt_tokens(messages), agent=agent)
@@ -0,0 +1,183 @@
+"""
+行程路线优化
+职责：按景点经纬度计算距离矩阵，用最近邻 + 2-opt 求游览顺序，并按建议游玩时长切分到每一天
+"""
+import re
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0
+CITY_SPEED_KMH = 25.0  # 市内交通平均速度，用于估算路上耗时
+DAY_START_HOUR = 9.0  # 每天出发时间
+LUNCH_HOUR = 12.0  # 此前开始的游览归入上午
+DAY_HOURS = 8.0  # 每天可用于游览和路上的小时数
+DEFAULT_VISIT_HOURS = 2.0
+
+_HOURS = re.compile(r"(\d+(?:\.\d+)?)\s*(?:个)?小时")
+_MINUTES = re.compile(r"(\d+)\s*分钟")
+
+
+def parse_visit_hours(text: Optional[str]) -> float:
+    """
+    解析建议游玩时长
+
+    Args:
+        text: 如 "3小时"、"2.5小时"、"90分钟"、"半天"、"全天"
+
+    Returns:
+        小时数，无法解析时取默认值
+    """
+    if not text:
+        return DEFAULT_VISIT_HOURS
+    if "全天" in text or "一天" in text:
+        return DAY_HOURS
+    if "半天" in text:
+        return DAY_HOURS / 2
+    hours = _HOURS.search(text)
+    if hours:
+        return float(hours.group(1))
+    minutes = _MINUTES.search(text)
+    if minutes:
+        return int(minutes.group(1)) / 60
+    return DEFAULT_VISIT_HOURS
+
+
+def haversine_matrix(latitudes: Sequence[float], longitudes: Sequence[float]) -> np.ndarray:
+    """
+    计算两两球面距离矩阵
+
+    Args:
+        latitudes: 纬度列表
+        longitudes: 经度列表
+
+    Returns:
+        n×n 距离矩阵（公里）
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lng = np.radians(np.asarray(longitudes, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbour(dist: np.ndarray, nodes: Sequence[int], start: int) -> List[int]:
+    """从 start 出发，每次走向最近的未访问节点"""
+    nodes = np.asarray(nodes)
+    visited = np.zeros(len(nodes), dtype=bool)
+    current = int(np.flatnonzero(nodes == start)[0])
+    visited[current] = True
+    order = [int(nodes[current])]
+    sub = dist[np.ix_(nodes, nodes)]
+    for _ in range(len(nodes) - 1):
+        row = np.where(visited, np.inf, sub[current])
+        current = int(np.argmin(row))
+        visited[current] = True
+        order.append(int(nodes[current]))
+    return order
+
+
+def two_opt(dist: np.ndarray, order: List[int], fixed_start: bool = True) -> List[int]:
+    """
+    2-opt 局部优化开放路径
+
+    Args:
+        dist: 距离矩阵
+        order: 初始顺序
+        fixed_start: 是否固定起点
+
+    Returns:
+        优化后的顺序
+    """
+    order = list(order)
+    n = len(order)
+    if n < 3:
+        return order
+
+    first = 1 if fixed_start else 0
+    improved = True
+    while improved:
+        improved = False
+        for i in range(first, n - 1):
+            for j in range(i + 1, n):
+                # 反转 order[i..j]：只有端点两条边发生变化
+                before = dist[order[i - 1], order[i]] if i > 0 else 0.0
+                after = dist[order[j], order[j + 1]] if j < n - 1 else 0.0
+                new_before = dist[order[i - 1], order[j]] if i > 0 else 0.0
+                new_after = dist[order[i], order[j + 1]] if j < n - 1 else 0.0
+                if new_before + new_after < before + after - 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+    return order
+
+
+def plan_routes(attractions: Sequence[Dict[str, Any]], days: int) -> List[Dict[str, Any]]:
+    """
+    为景点安排每日游览路线
+
+    先对全部景点求一条较短的游览路径，再按游玩时长和路上耗时顺序切分到各天，
+    每天的路线再做一次 2-opt。超出总时长的景点按原顺序（评分）从末尾舍弃。
+
+    Args:
+        attractions: 景点字典列表（按优先级排序），使用 name、latitude、longitude、visit_duration
+        days: 天数
+
+    Returns:
+        每日路线列表，元素为 {"day", "morning", "afternoon", "stops", "distance_km", "hours"}，
+        stops 为当天按顺序游览的景点字典
+    """
+    if days <= 0:
+        return []
+    routes = [
+        {"day": day, "morning": [], "afternoon": [], "stops": [], "distance_km": 0.0, "hours": 0.0}
+        for day in range(1, days + 1)
+    ]
+    if not attractions:
+        return routes
+
+    # 缺少坐标的景点放在已知坐标的中心，不影响其他景点的相对顺序
+    known = [a for a in attractions if a.get("latitude") is not None and a.get("longitude") is not None]
+    center_lat = float(np.mean([a["latitude"] for a in known])) if known else 0.0
+    center_lng = float(np.mean([a["longitude"] for a in known])) if known else 0.0
+    latitudes = [a["latitude"] if a.get("latitude") is not None else center_lat for a in attractions]
+    longitudes = [a["longitude"] if a.get("longitude") is not None else center_lng for a in attractions]
+
+    dist = haversine_matrix(latitudes, longitudes)
+    visit_hours = [min(parse_visit_hours(a.get("visit_duration")), DAY_HOURS) for a in attractions]
+
+    # 从优先级最高的景点出发求整体路径
+    nodes = list(range(len(attractions)))
+    tour = two_opt(dist, nearest_neighbour(dist, nodes, start=0))
+
+    # 沿路径顺序切分：当天剩余时间放不下下一个景点时换到下一天
+    day_nodes: List[List[int]] = [[] for _ in range(days)]
+    day_index, used = 0, 0.0
+    for node in tour:
+        travel = dist[day_nodes[day_index][-1], node] / CITY_SPEED_KMH if day_nodes[day_index] else 0.0
+        if day_nodes[day_index] and used + travel + visit_hours[node] > DAY_HOURS:
+            day_index += 1
+            used, travel = 0.0, 0.0
+            if day_index >= days:
+                break
+        day_nodes[day_index].append(node)
+        used += travel + visit_hours[node]
+
+    for route, selected in zip(routes, day_nodes):
+        if not selected:
+            continue
+        # 每天从当天第一个景点出发再优化一次
+        order = two_opt(dist, selected)
+        clock = DAY_START_HOUR
+        for position, node in enumerate(order):
+            if position > 0:
+                travel = dist[order[position - 1], node] / CITY_SPEED_KMH
+                clock += travel
+                route["distance_km"] += float(dist[order[position - 1], node])
+            slot = "morning" if clock < LUNCH_HOUR else "afternoon"
+            route[slot].append(attractions[node]["name"])
+            route["stops"].append(attractions[node])
+            clock += visit_hours[node]
+        route["distance_km"] = round(route["distance_km"], 1)
+        route["hours"] = round(clock - DAY_START_HOUR, 1)
+    return routes
@@ -0,0 +1,184 @@
+"""
+热门产品抢订压测
+职责：大量用户同时预订同一航班的最后若干座位，对比不同扣减策略的吞吐量、延迟和超卖率
+
+策略：
+    naive        先读余量再写回（无版本号），每个请求一个事务
+    cas          带版本号的条件扣减，冲突时重试，每个请求一个事务
+    reservation  ReservationManager：同一产品排队合并为一个事务，带版本号扣减
+
+用法：
+    python benchmarks/booking_contention_bench.py --users 500 --seats 50
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from database import Base, InventoryDB, InventoryHoldDB
+from inventory.reservations import ReservationManager
+
+PRODUCT_ID = "FL_HOT"
+
+
+def percentile(values, q: float) -> float:
+    """计算分位数（最近秩法）"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def _hold_row(quantity: int) -> InventoryHoldDB:
+    """构造预占记录"""
+    return InventoryHoldDB(
+        hold_id=f"HLD{uuid.uuid4().hex[:16].upper()}",
+        product_id=PRODUCT_ID,
+        quantity=quantity,
+        status="held",
+        expires_at=datetime.now() + timedelta(minutes=15)
+    )
+
+
+def naive_strategy(session_maker: async_sessionmaker) -> Callable:
+    """先读后写，没有并发控制"""
+    async def hold(quantity: int) -> bool:
+        async with session_maker() as session, session.begin():
+            available = await session.scalar(
+                select(InventoryDB.available).where(InventoryDB.product_id == PRODUCT_ID)
+            )
+            if available < quantity:
+                return False
+            await asyncio.sleep(0)  # 模拟读写之间的业务处理，让出事件循环
+            await session.execute(
+                update(InventoryDB).where(InventoryDB.product_id == PRODUCT_ID)
+                .values(available=available - quantity)
+            )
+            session.add(_hold_row(quantity))
+            return True
+    return hold
+
+
+def cas_strategy(session_maker: async_sessionmaker, retries: int = 50) -> Callable:
+    """每个请求独立做带版本号的条件扣减"""
+    async def hold(quantity: int) -> bool:
+        for _ in range(retries):
+            async with session_maker() as session, session.begin():
+                row = (await session.execute(
+                    select(InventoryDB.available, InventoryDB.version)
+                    .where(InventoryDB.product_id == PRODUCT_ID)
+                )).one()
+                if row.available < quantity:
+                    return False
+                await asyncio.sleep(0)
+                result = await session.execute(
+                    update(InventoryDB)
+                    .where(InventoryDB.product_id == PRODUCT_ID, InventoryDB.version == row.version)
+                    .values(available=row.available - quantity, version=row.version + 1)
+                )
+                if result.rowcount == 1:
+                    session.add(_hold_row(quantity))
+                    return True
+        raise RuntimeError("版本冲突重试次数过多")
+    return hold
+
+
+def reservation_strategy(session_maker: async_sessionmaker) -> Callable:
+    """ReservationManager 合并预占"""
+    manager = ReservationManager(session_maker=session_maker)
+
+    async def hold(quantity: int) -> bool:
+        return await manager.hold(PRODUCT_ID, quantity) is not None
+    return hold
+
+
+STRATEGIES: Dict[str, Callable] = {
+    "naive": naive_strategy,
+    "cas": cas_strategy,
+    "reservation": reservation_strategy,
+}
+
+
+async def run_strategy(name: str, users: int, seats: int) -> Dict[str, float]:
+    """在独立的临时数据库上执行一轮抢订"""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db",
+                                     connect_args={"timeout": 30})
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with session_maker() as session, session.begin():
+            session.add(InventoryDB(product_id=PRODUCT_ID, product_type="flight",
+                                    capacity=seats, available=seats, version=0))
+
+        hold = STRATEGIES[name](session_maker)
+        latencies: List[float] = []
+        outcome = {"granted": 0, "rejected": 0, "errors": 0}
+
+        async def user():
+            started_at = time.perf_counter()
+            try:
+                outcome["granted" if await hold(1) else "rejected"] += 1
+            except Exception:
+                outcome["errors"] += 1
+            latencies.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(users)))
+        elapsed = time.perf_counter() - started_at
+
+        async with session_maker() as session:
+            held = await session.scalar(select(func.count()).select_from(InventoryHoldDB))
+            available = await session.scalar(
+                select(InventoryDB.available).where(InventoryDB.product_id == PRODUCT_ID)
+            )
+        await engine.dispose()
+
+    oversold = max(0, held - seats)
+    return {
+        **outcome,
+        "holds": held,
+        "available": available,
+        "oversell_rate": oversold / seats,
+        "throughput": users / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+    }
+
+
+async def main_async(args):
+    print(f"用户数: {args.users} | 座位数: {args.seats}")
+    print(f"{'策略':<14}{'成功':>6}{'拒绝':>6}{'错误':>6}{'预占记录':>10}{'剩余':>6}"
+          f"{'超卖率':>10}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p99(ms)':>10}")
+    for name in args.strategies.split(","):
+        stats = await run_strategy(name, args.users, args.seats)
+        print(f"{name:<14}{stats['granted']:>6}{stats['rejected']:>6}{stats['errors']:>6}"
+              f"{stats['holds']:>10}{stats['available']:>6}{stats['oversell_rate']:>10.1%}"
+              f"{stats['throughput']:>14.1f}{stats['p50']:>10.2f}{stats['p99']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热门产品抢订压测")
+    parser.add_argument("--users", type=int, default=500, help="同时预订的用户数")
+    parser.add_argument("--seats", type=int, default=50, help="剩余座位数")
+    parser.add_argument("--strategies", default="naive,cas,reservation", help="策略列表，逗号分隔")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
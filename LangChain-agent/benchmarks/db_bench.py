@@ -0,0 +1,147 @@
+"""
+数据库微基准
+职责：对比默认引擎与调优模式（WAL + PRAGMA + 连接池 + 只读连接池）下订单写入、按单号查询以及读写混合的吞吐量和延迟
+
+用法：
+    python benchmarks/db_bench.py --orders 2000 --lookups 5000 --concurrency 32
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from database import Base, OrderDB, build_engine
+
+
+def percentile(values, q: float) -> float:
+    """计算分位数（最近秩法）"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def make_order(index: int) -> OrderDB:
+    """构造测试订单"""
+    return OrderDB(
+        order_id=f"ORD{uuid.uuid4().hex.upper()}",
+        user_id=f"user{index % 100}",
+        product_type="flight",
+        product_id=f"FL{index % 50}",
+        product_name="中国国航 CA1234",
+        quantity=1,
+        total_price=1280.0,
+        status="pending",
+        contact_info={"phone": "13800000000"}
+    )
+
+
+async def run_ops(count: int, concurrency: int, operation: Callable[[int], Awaitable]) -> Dict[str, float]:
+    """以给定并发度执行 count 次操作，统计吞吐量、延迟和错误数"""
+    latencies: List[float] = []
+    errors = {"locked": 0, "other": 0}
+    counter = iter(range(count))
+
+    async def worker():
+        for index in counter:
+            started_at = time.perf_counter()
+            try:
+                await operation(index)
+            except Exception as e:
+                errors["locked" if "locked" in str(e) else "other"] += 1
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    return {
+        "throughput": count / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        **errors,
+    }
+
+
+async def run_mode(mode: str, args) -> Dict[str, Dict[str, float]]:
+    """在独立的临时数据库上执行写入、查询和读写混合三个阶段"""
+    tuned = mode == "tuned"
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite+aiosqlite:///{directory}/bench.db"
+        engine = build_engine(url, tuned=tuned)
+        read_engine = build_engine(url, read_only=True, tuned=True) if tuned else engine
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        read_session_maker = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+        order_ids: List[str] = []
+
+        async def insert(index: int):
+            order = make_order(index)
+            async with session_maker() as session, session.begin():
+                session.add(order)
+            order_ids.append(order.order_id)
+
+        async def lookup(index: int):
+            async with read_session_maker() as session:
+                row = await session.scalar(
+                    select(OrderDB).where(OrderDB.order_id == random.choice(order_ids))
+                )
+                if row is None:
+                    raise LookupError("订单不存在")
+
+        results = {
+            "insert": await run_ops(args.orders, args.concurrency, insert),
+            "lookup": await run_ops(args.lookups, args.concurrency, lookup),
+        }
+
+        # 读写混合：写入与查询同时进行，观察读是否阻塞写
+        half = max(1, args.concurrency // 2)
+        mixed_insert, mixed_lookup = await asyncio.gather(
+            run_ops(args.orders, half, insert),
+            run_ops(args.lookups, half, lookup),
+        )
+        results["mixed-insert"] = mixed_insert
+        results["mixed-lookup"] = mixed_lookup
+
+        if read_engine is not engine:
+            await read_engine.dispose()
+        await engine.dispose()
+    return results
+
+
+async def main_async(args):
+    print(f"订单数: {args.orders} | 查询数: {args.lookups} | 并发: {args.concurrency}")
+    print(f"{'模式':<10}{'阶段':<14}{'吞吐(op/s)':>12}{'p50(ms)':>10}{'p99(ms)':>10}{'locked':>8}{'其他错误':>10}")
+    for mode in args.modes.split(","):
+        for phase, stats in (await run_mode(mode, args)).items():
+            print(f"{mode:<10}{phase:<14}{stats['throughput']:>12.1f}{stats['p50']:>10.2f}"
+                  f"{stats['p99']:>10.2f}{stats['locked']:>8}{stats['other']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库微基准")
+    parser.add_argument("--orders", type=int, default=2000, help="每个写入阶段的订单数")
+    parser.add_argument("--lookups", type=int, default=5000, help="每个查询阶段的查询数")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发度")
+    parser.add_argument("--modes", default="default,tuned", help="引擎模式：default 默认引擎，tuned 调优模式")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
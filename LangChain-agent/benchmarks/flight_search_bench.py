@@ -0,0 +1,67 @@
+"""
+航班库存检索压测
+职责：生成百万级合成班次，统计 FlightInventory.search 的单次查询延迟
+
+用法：
+    python benchmarks/flight_search_bench.py --days 90 --flights-per-day 60 --queries 20000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta, time as dtime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory.flights import FlightInventory, SYNTHETIC_CITIES
+from models import CabinClass
+
+
+def percentile(values, q: float) -> float:
+    """计算分位数（最近秩法）"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="航班库存检索压测")
+    parser.add_argument("--days", type=int, default=90, help="班次覆盖天数")
+    parser.add_argument("--flights-per-day", type=int, default=60, help="每条航线每天的班次数")
+    parser.add_argument("--queries", type=int, default=20000, help="查询次数")
+    parser.add_argument("--limit", type=int, default=10, help="每次返回的航班数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    start_date = date.today()
+    started_at = time.perf_counter()
+    inventory = FlightInventory.synthetic(start_date, args.days, args.flights_per_day, seed=args.seed)
+    print(f"构建库存: {len(inventory)} 个班次, 耗时 {time.perf_counter() - started_at:.2f}s")
+
+    rng = random.Random(args.seed)
+    scenarios = {
+        "仅按航线日期": lambda: {},
+        "舱位+直飞": lambda: {"cabin_class": CabinClass.ECONOMY, "max_stops": 0},
+        "时间段+限价": lambda: {"earliest": dtime(8, 0), "latest": dtime(12, 0), "max_price": 1500},
+    }
+
+    print(f"{'场景':<14}{'查询':>8}{'平均返回':>10}{'p50(us)':>10}{'p99(us)':>10}{'max(us)':>10}")
+    for name, make_filters in scenarios.items():
+        latencies = []
+        returned = 0
+        for _ in range(args.queries):
+            departure, destination = rng.sample(SYNTHETIC_CITIES, 2)
+            departure_date = start_date + timedelta(days=rng.randrange(args.days))
+            filters = make_filters()
+            t0 = time.perf_counter()
+            flights = inventory.search(departure, destination, departure_date,
+                                       passengers=rng.randint(1, 4), limit=args.limit, **filters)
+            latencies.append((time.perf_counter() - t0) * 1e6)
+            returned += len(flights)
+        print(f"{name:<14}{args.queries:>8}{returned / args.queries:>10.1f}"
+              f"{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}{max(latencies):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
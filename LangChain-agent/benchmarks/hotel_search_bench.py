@@ -0,0 +1,61 @@
+"""
+酒店索引检索压测
+职责：为单个城市生成大量合成酒店，统计 CityHotelIndex.search 的单次查询延迟
+
+用法：
+    python benchmarks/hotel_search_bench.py --hotels 50000 --queries 20000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory.hotels import CityHotelIndex
+
+
+def percentile(values, q: float) -> float:
+    """计算分位数（最近秩法）"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="酒店索引检索压测")
+    parser.add_argument("--hotels", type=int, default=50000, help="城市内酒店数量")
+    parser.add_argument("--queries", type=int, default=20000, help="每个场景的查询次数")
+    parser.add_argument("--limit", type=int, default=5, help="每次返回的酒店数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    index = CityHotelIndex.synthetic("北京", args.hotels, seed=args.seed)
+    print(f"构建索引: {len(index)} 家酒店, 耗时 {time.perf_counter() - started_at:.2f}s")
+
+    rng = random.Random(args.seed)
+    scenarios = {
+        "不限": lambda: (0, []),
+        "预算上限": lambda: (rng.choice([300, 500, 800, 1200]), []),
+        "设施偏好": lambda: (0, rng.sample(["游泳池", "健身房", "SPA", "停车场"], 2)),
+        "星级+预算+设施": lambda: (rng.choice([600, 1000, 2000]), [rng.choice(["四星", "五星"]), "游泳池"]),
+    }
+
+    print(f"{'场景':<16}{'查询':>8}{'平均返回':>10}{'p50(us)':>10}{'p99(us)':>10}{'max(us)':>10}")
+    for name, make_query in scenarios.items():
+        latencies = []
+        returned = 0
+        for _ in range(args.queries):
+            budget, preferences = make_query()
+            t0 = time.perf_counter()
+            hotels = index.search(budget, preferences, limit=args.limit)
+            latencies.append((time.perf_counter() - t0) * 1e6)
+            returned += len(hotels)
+        print(f"{name:<16}{args.queries:>8}{returned / args.queries:>10.1f}"
+              f"{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}{max(latencies):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+订单写入压测
+职责：对比逐单提交与批量提交写入器在不同并发度下的订单写入吞吐量和延迟
+
+用法：
+    python benchmarks/order_write_bench.py --concurrency 1,16,64,256 --orders 2000
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from database import Base, OrderDB, GroupCommitWriter
+from models import Order, OrderStatus
+from order_store import OrderStore
+
+
+def percentile(values, q: float) -> float:
+    """计算分位数（最近秩法）"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def make_order(index: int) -> Order:
+    """构造测试订单"""
+    return Order(
+        order_id=f"ORD{uuid.uuid4().hex.upper()}",
+        user_id=f"user{index % 100}",
+        product_type="flight",
+        product_id=f"FL{index % 50}",
+        product_name="中国国航 CA1234",
+        quantity=1,
+        total_price=1280.0,
+        status=OrderStatus.PENDING,
+        contact_info={"phone": "13800000000"}
+    )
+
+
+async def direct_create(session_maker: async_sessionmaker, order: Order):
+    """逐单提交：每个订单一个事务"""
+    async with session_maker() as session, session.begin():
+        session.add(OrderDB(
+            order_id=order.order_id,
+            user_id=order.user_id,
+            product_type=order.product_type,
+            product_id=order.product_id,
+            product_name=order.product_name,
+            quantity=order.quantity,
+            total_price=order.total_price,
+            status=order.status.value,
+            contact_info=order.contact_info
+        ))
+
+
+async def run_level(mode: str, orders: int, concurrency: int) -> Dict[str, float]:
+    """在独立的临时数据库上写入一组订单"""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db",
+                                     connect_args={"timeout": 30})
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        writer = GroupCommitWriter(session_maker=session_maker)
+        store = OrderStore(writer=writer, session_maker=session_maker)
+
+        latencies: List[float] = []
+        failures = 0
+        counter = iter(range(orders))
+
+        async def worker():
+            nonlocal failures
+            for index in counter:
+                order = make_order(index)
+                started_at = time.perf_counter()
+                try:
+                    if mode == "group":
+                        await store.create(order)
+                    else:
+                        await direct_create(session_maker, order)
+                except Exception:
+                    failures += 1
+                latencies.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+        await writer.close()
+
+        async with session_maker() as session:
+            written = await session.scalar(select(func.count()).select_from(OrderDB))
+        stats = writer.stats()
+        await engine.dispose()
+
+    return {
+        "written": written,
+        "failures": failures,
+        "throughput": written / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "avg_batch": stats["avg_batch_size"],
+    }
+
+
+async def main_async(args):
+    levels = [int(level) for level in args.concurrency.split(",")]
+    print(f"{'模式':<8}{'并发':>6}{'写入':>8}{'失败':>6}{'吞吐(单/s)':>14}"
+          f"{'p50(ms)':>10}{'p99(ms)':>10}{'平均批量':>10}")
+    for mode in args.modes.split(","):
+        for concurrency in levels:
+            stats = await run_level(mode, args.orders, concurrency)
+            print(f"{mode:<8}{concurrency:>6}{stats['written']:>8}{stats['failures']:>6}"
+                  f"{stats['throughput']:>14.1f}{stats['p50']:>10.2f}{stats['p99']:>10.2f}"
+                  f"{stats['avg_batch']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单写入压测")
+    parser.add_argument("--concurrency", default="1,16,64,256", help="并发度列表，逗号分隔")
+    parser.add_argument("--orders", type=int, default=2000, help="每个并发度写入的订单数")
+    parser.add_argument("--modes", default="direct,group", help="写入模式：direct 逐单提交，group 批量提交")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
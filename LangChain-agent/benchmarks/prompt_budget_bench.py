@@ -0,0 +1,120 @@
+"""
+提示词规模对比
+职责：对比航班、酒店、景点智能体原先逐条描述的列表格式与紧凑表格 + token 预算后的完整提示词估算 token 数
+
+格式：
+    verbose  原格式：每条记录一行“字段名 + 取值”的描述，全部列出
+    budget   智能体的做法：紧凑表格编码，超出智能体 token 预算的条目从末尾截断
+
+用法：
+    python benchmarks/prompt_budget_bench.py --items 5,20,60
+    python benchmarks/prompt_budget_bench.py --items 60 --budget 300
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from config import settings
+from agents import AttractionRecommendAgent, FlightQueryAgent, HotelQueryAgent
+from agents.prompt_budget import prompt_tokens
+from inventory import get_attraction_catalog
+from inventory.flights import FlightInventory
+from inventory.hotels import CityHotelIndex
+from llm.fake import FakeTravelLLM
+
+
+def verbose_flights(flights: List[Any]) -> str:
+    """原航班格式"""
+    return "\n".join(
+        f"{i}. {f.airline} {f.flight_number} - ¥{f.price} - {f.departure_time.strftime('%H:%M')}-"
+        f"{f.arrival_time.strftime('%H:%M')} - {f.duration} - "
+        f"{'直飞' if f.stops == 0 else f'{f.stops}次经停'} - {f.cabin_class.value} - 余票{f.available_seats}"
+        for i, f in enumerate(flights, 1)
+    )
+
+
+def verbose_hotels(hotels: List[Any]) -> str:
+    """原酒店格式"""
+    return "\n".join(
+        f"{i}. {h.name} - {h.star_rating.value} - ¥{h.price_per_night}/晚 - 评分{h.rating} - "
+        f"距市中心{h.distance_to_center}km - 设施: {', '.join(h.facilities[:3])}等"
+        for i, h in enumerate(hotels, 1)
+    )
+
+
+def verbose_attractions(attractions: List[Any]) -> str:
+    """原景点格式"""
+    return "\n".join(
+        f"{i}. {a.name} - {a.category} - 门票¥{a.ticket_price} - 评分{a.rating} - "
+        f"建议游玩{a.visit_duration} - {a.opening_hours}"
+        for i, a in enumerate(attractions, 1)
+    )
+
+
+def build_cases(items: int, seed: int) -> Dict[str, Dict[str, Any]]:
+    """构造各智能体的检索结果和提示词参数"""
+    llm = FakeTravelLLM(latency_mean=0)
+    today = date.today() + timedelta(days=7)
+    flights = FlightInventory.synthetic(today, 1, max(items, 10), seed=seed).search("北京", "上海", today, limit=items)
+    hotels = CityHotelIndex.synthetic("上海", max(items * 4, 100), seed=seed).search(limit=items)
+    catalog = get_attraction_catalog()
+    city = max(catalog.cities, key=lambda name: len(catalog.recommend(name, limit=1000)))
+    attractions = catalog.recommend(city, limit=items)
+    return {
+        "flight": {
+            "agent": FlightQueryAgent(llm), "rows": flights, "variable": "flights_info",
+            "verbose": verbose_flights, "budget": "_format_flights_info",
+            "params": {"departure": "北京", "destination": "上海", "departure_date": today.isoformat(),
+                       "passengers": 1},
+        },
+        "hotel": {
+            "agent": HotelQueryAgent(llm), "rows": hotels, "variable": "hotels_info",
+            "verbose": verbose_hotels, "budget": "_format_hotels_info",
+            "params": {"city": "上海", "budget": "不限", "preferences": "无特殊要求"},
+        },
+        "attraction": {
+            "agent": AttractionRecommendAgent(llm), "rows": attractions, "variable": "attractions_info",
+            "verbose": verbose_attractions, "budget": "_format_attractions_info",
+            "params": {"destination": city, "days": max(1, items // 2), "preferences": "综合推荐"},
+        },
+    }
+
+
+def measure(case: Dict[str, Any], render: Callable[[], str], header_lines: int) -> Dict[str, int]:
+    """渲染列表变量并统计完整提示词的估算 token 数和实际列出的条数"""
+    info = render()
+    messages = case["agent"].prompt_template.format_messages(**case["params"], **{case["variable"]: info})
+    listed = sum(1 for line in info.splitlines() if line and not line.startswith("（")) - header_lines
+    return {"tokens": prompt_tokens(messages), "listed": listed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示词规模对比")
+    parser.add_argument("--items", default="5,20,60", help="检索结果条数列表，逗号分隔")
+    parser.add_argument("--budget", type=int, default=0, help="覆盖各智能体的 token 预算，0 表示使用配置")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    logger.remove()
+    if args.budget:
+        settings.PROMPT_TOKEN_BUDGET_DEFAULT = args.budget
+        settings.PROMPT_TOKEN_BUDGET_OVERRIDES = {}
+
+    print(f"{'类型':<12}{'条数':>6}{'格式':>10}{'列出条数':>10}{'提示词token':>14}{'节省':>8}")
+    for items in [int(value) for value in args.items.split(",")]:
+        for kind, case in build_cases(items, args.seed).items():
+            agent, rows = case["agent"], case["rows"]
+            verbose = measure(case, lambda: case["verbose"](rows), 0)
+            budgeted = measure(case, lambda: getattr(agent, case["budget"])(rows, agent.new_prompt_budget()), 1)
+            for name, stats in (("verbose", verbose), ("budget", budgeted)):
+                saved = 1 - stats["tokens"] / verbose["tokens"]
+                print(f"{kind:<12}{len(rows):>6}{name:>10}{stats['listed']:>10}{stats['tokens']:>14}{saved:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+检索结果构造压测
+职责：对比检索结果逐行校验构造 Pydantic 模型与直接导出 __slots__ 结果行的单次检索耗时和内存分配
+
+构造方式：
+    validated  每个结果行用 Flight(**fields)/Hotel(**fields) 校验构造，结果容器同样校验后 model_dump()
+    construct  结果行通过 model_construct 转换为模型（不校验）后 model_dump()
+    rows       智能体的做法：结果行直接导出为与 model_dump() 相同的字典
+
+各方式的检索和结果行生成相同，统计的是检索 + 结果组装的总耗时。
+
+用法：
+    python benchmarks/result_rows_bench.py --limits 10,100,500
+"""
+import argparse
+import math
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory.flights import FlightInventory
+from inventory.hotels import CityHotelIndex
+from inventory.rows import ResultRow, to_dicts, to_models
+from models import Flight, FlightSearchResult, Hotel, HotelSearchResult
+
+
+def percentile(values, q: float) -> float:
+    """计算分位数（最近秩法）"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def validated(rows: List[ResultRow], model, container, key: str) -> dict:
+    """逐行校验构造模型"""
+    models = [model(**{name: getattr(row, name) for name in row.__slots__}) for row in rows]
+    return container(**{key: models, "total_count": len(models)}).model_dump()
+
+
+def constructed(rows: List[ResultRow], model, container, key: str) -> dict:
+    """结果行通过 model_construct 构造模型"""
+    return container.model_construct(**{key: to_models(rows), "total_count": len(rows)}).model_dump()
+
+
+def exported(rows: List[ResultRow], model, container, key: str) -> dict:
+    """结果行直接导出为字典"""
+    return {**container(total_count=len(rows)).model_dump(), key: to_dicts(rows)}
+
+
+BUILDERS: Dict[str, Callable] = {"validated": validated, "construct": constructed, "rows": exported}
+
+
+def measure(search: Callable[[], List[ResultRow]], build: Callable[[List[ResultRow]], dict],
+            rounds: int) -> Dict[str, float]:
+    """统计单次检索 + 结果构造的耗时，以及单次的内存分配峰值"""
+    latencies = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        build(search())
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    tracemalloc.start()
+    build(search())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"mean": sum(latencies) / len(latencies), "p99": percentile(latencies, 99), "peak_kb": peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检索结果构造压测")
+    parser.add_argument("--limits", default="10,100,500", help="每次检索返回的条数列表，逗号分隔")
+    parser.add_argument("--rounds", type=int, default=200, help="每种方式的检索次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    limits = [int(value) for value in args.limits.split(",")]
+    today = date.today()
+    flights = FlightInventory.synthetic(today, 1, max(limits), seed=args.seed)
+    hotels = CityHotelIndex.synthetic("上海", max(limits) * 4, seed=args.seed)
+    kinds = {
+        "flight": (lambda limit: lambda: flights.search("北京", "上海", today, limit=limit),
+                   Flight, FlightSearchResult, "flights"),
+        "hotel": (lambda limit: lambda: hotels.search(limit=limit), Hotel, HotelSearchResult, "hotels"),
+    }
+
+    print(f"{'类型':<8}{'条数':>6}{'构造方式':>12}{'平均(ms)':>10}{'p99(ms)':>10}{'峰值内存(KB)':>14}{'加速比':>8}")
+    for kind, (make_search, model, container, key) in kinds.items():
+        for limit in limits:
+            search = make_search(limit)
+            baseline = None
+            for name, builder in BUILDERS.items():
+                stats = measure(search, lambda rows: builder(rows, model, container, key), args.rounds)
+                baseline = baseline or stats["mean"]
+                print(f"{kind:<8}{limit:>6}{name:>12}{stats['mean']:>10.3f}{stats['p99']:>10.3f}"
+                      f"{stats['peak_kb']:>14.1f}{baseline / stats['mean']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+响应编码压测
+职责：构造与 /api/v1/travel/query 结构相同的大结果集，对比 jsonable_encoder + json 与 orjson 单次编码的耗时
+
+编码方式：
+    jsonable_encoder  FastAPI 默认路径：jsonable_encoder 逐层转换后 json.dumps
+    orjson            FastJSONResponse：model_dump() 得到的字典直接由 orjson 编码
+    orjson-typed      结果保持 Pydantic 模型，编码时才导出字段
+
+用法：
+    python benchmarks/serialization_bench.py --items 50,200,1000 --days 30
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from inventory.flights import FlightInventory
+from inventory.hotels import CityHotelIndex
+from inventory.rows import to_models
+from models import (
+    FlightSearchResult, HotelSearchResult, Itinerary, ItineraryDay, IntentType, ParsedIntent
+)
+from responses import dumps
+
+
+def percentile(values, q: float) -> float:
+    """计算分位数（最近秩法）"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def build_results(items: int, days: int, seed: int) -> Dict[str, Any]:
+    """构造机票、酒店和行程结果（Pydantic 模型）"""
+    start_date = date.today() + timedelta(days=7)
+    flights = to_models(FlightInventory.synthetic(start_date, 1, max(items, 10), seed=seed).search(
+        "北京", "上海", start_date, limit=items
+    ))
+    hotels = to_models(CityHotelIndex.synthetic("上海", max(items * 4, 100), seed=seed).search(limit=items))
+    itinerary = Itinerary(
+        itinerary_id="IT0001",
+        title=f"上海{days}日游",
+        destination="上海",
+        start_date=start_date,
+        end_date=start_date + timedelta(days=days - 1),
+        days=[
+            ItineraryDay(
+                day=day + 1,
+                travel_date=start_date + timedelta(days=day),
+                morning=["外滩", "南京路步行街"],
+                afternoon=["豫园", "城隍庙"],
+                evening=["黄浦江夜游"],
+                accommodation=hotels[day % len(hotels)].name if hotels else None,
+                transportation="地铁",
+                estimated_cost=680.0
+            )
+            for day in range(days)
+        ],
+        total_cost=680.0 * days,
+        summary="经典线路"
+    )
+    return {
+        "intent": ParsedIntent(intent_type=IntentType.ITINERARY, departure="北京", destination="上海",
+                               departure_date=start_date, preferences=["美食"]),
+        "flight": FlightSearchResult(flights=flights, total_count=len(flights)),
+        "hotel": HotelSearchResult(hotels=hotels, total_count=len(hotels)),
+        "itinerary": itinerary,
+    }
+
+
+def build_response(results: Dict[str, Any], typed: bool) -> Dict[str, Any]:
+    """按 travel_query 接口的结构组装响应；typed 为 False 时与智能体一样先 model_dump()"""
+    export = (lambda model: model) if typed else (lambda model: model.model_dump())
+    intent = export(results["intent"])
+    return {
+        "success": True,
+        "query": "下周从北京去上海玩几天，帮我规划行程",
+        "intent": intent,
+        "intent_type": IntentType.ITINERARY,
+        "final_answer": "为您规划了上海行程",
+        "recommendations": [],
+        "results": {
+            "flight": {"success": True, "data": export(results["flight"])},
+            "hotel": {"success": True, "data": export(results["hotel"])},
+            "itinerary": {"success": True, "data": export(results["itinerary"])},
+        }
+    }
+
+
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {
+    "jsonable_encoder": lambda content: json.dumps(jsonable_encoder(content), ensure_ascii=False).encode("utf-8"),
+    "orjson": dumps,
+    "orjson-typed": dumps,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应编码压测")
+    parser.add_argument("--items", default="50,200,1000", help="机票、酒店结果条数列表，逗号分隔")
+    parser.add_argument("--days", type=int, default=30, help="行程天数")
+    parser.add_argument("--rounds", type=int, default=200, help="每种编码方式的编码次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    print(f"{'条数':>6}{'编码方式':>18}{'大小(KB)':>10}{'平均(ms)':>10}{'p99(ms)':>10}{'加速比':>8}")
+    for items in [int(value) for value in args.items.split(",")]:
+        results = build_results(items, args.days, args.seed)
+        baseline = None
+        for name, encode in ENCODERS.items():
+            content = build_response(results, typed=name == "orjson-typed")
+            size = len(encode(content))
+            latencies = []
+            for _ in range(args.rounds):
+                t0 = time.perf_counter()
+                encode(content)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            mean = sum(latencies) / len(latencies)
+            baseline = baseline or mean
+            print(f"{items:>6}{name:>18}{size / 1024:>10.1f}{mean:>10.3f}"
+                  f"{percentile(latencies, 99):>10.3f}{baseline / mean:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
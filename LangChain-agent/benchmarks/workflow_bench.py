@@ -0,0 +1,193 @@
+"""
+工作流端到端压测
+职责：使用离线模拟 LLM 和临时数据库驱动 TravelAgentWorkflow.run，按意图和并发度统计吞吐量与延迟分位数
+
+用法：
+    python benchmarks/workflow_bench.py --concurrency 1,8,32 --requests 200
+    python benchmarks/workflow_bench.py --latency lognormal --latency-mean 0.8 --latency-spread 0.5
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from config import settings
+
+
+# 每种意图一组典型查询
+INTENT_QUERIES: Dict[str, List[str]] = {
+    "flight": [
+        "帮我查一下2026-11-20从上海到北京的机票",
+        "明天从广州飞成都的航班有哪些",
+    ],
+    "hotel": [
+        "杭州西湖附近的酒店，预算800元以内",
+        "推荐一下三亚的海景住宿",
+    ],
+    "attraction": [
+        "西安有什么好玩的景点",
+        "成都适合亲子游玩的景点推荐",
+    ],
+    "itinerary": [
+        "帮我规划2026-11-20到2026-11-22从上海去北京的行程",
+        "明天上海出发去厦门，做一个4天的旅游攻略",
+    ],
+    "price_compare": [
+        "北京的酒店哪个平台比价更便宜",
+        "上海到深圳的机票价格对比",
+    ],
+    "booking": [
+        "帮我预订2个人的北京三日游",
+        "我想下单杭州的酒店",
+    ],
+    "customer_service": [
+        "订单ORD20261101001怎么退款",
+        "取消订单需要手续费吗",
+    ],
+}
+
+
+def is_failure(result: Dict) -> bool:
+    """工作流失败，或任一智能体返回 success=False 都计为失败"""
+    if not result.get("success"):
+        return True
+    return any(
+        isinstance(agent_result, dict) and agent_result.get("success") is False
+        for agent_result in (result.get("results") or {}).values()
+    )
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """计算分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_level(workflow, queries: List[str], total: int, concurrency: int) -> Dict[str, float]:
+    """
+    以固定并发度执行一轮压测
+
+    Args:
+        workflow: 工作流实例
+        queries: 轮流使用的查询
+        total: 请求总数
+        concurrency: 并发度
+
+    Returns:
+        本轮统计结果
+    """
+    latencies: List[float] = []
+    failures = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal failures
+        for index in counter:
+            started_at = time.perf_counter()
+            result = await workflow.run(queries[index % len(queries)], user_id="bench")
+            latencies.append(time.perf_counter() - started_at)
+            if is_failure(result):
+                failures += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "requests": total,
+        "failures": failures,
+        "throughput": total / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+    }
+
+
+async def main_async(args, directory: str):
+    # 相关开关需在创建智能体之前设置；数据库地址需在导入 database 模块之前设置
+    settings.DATABASE_URL = f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}"
+    settings.LLM_CACHE_ENABLED = args.enable_cache
+    settings.LLM_COALESCE_ENABLED = args.enable_coalesce
+    settings.LLM_ADMISSION_ENABLED = args.enable_admission
+    if not args.enable_classifier:
+        settings.INTENT_CLASSIFIER_PATH = ""
+
+    from database import close_database, init_database
+    from llm.fake import FakeTravelLLM
+    from registry import AgentRegistry, set_registry
+    from search_history import get_search_history_recorder
+    from workflow import TravelAgentWorkflow
+    
+    await init_database()
+
+    llm = FakeTravelLLM(
+        latency_distribution=args.latency,
+        latency_mean=args.latency_mean,
+        latency_spread=args.latency_spread,
+        seed=args.seed
+    )
+    set_registry(AgentRegistry(llm_factory=lambda profile, params: llm))
+    workflow = TravelAgentWorkflow()
+
+    intents = list(INTENT_QUERIES) if args.intents == "all" else args.intents.split(",")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    print(f"延迟分布: {args.latency} (均值 {args.latency_mean}s, 浮动 {args.latency_spread}) | "
+          f"缓存: {args.enable_cache} | 合并: {args.enable_coalesce} | 准入: {args.enable_admission}")
+    print(f"{'意图':<18}{'并发':>6}{'请求':>8}{'失败':>6}{'吞吐(req/s)':>14}"
+          f"{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+
+    for intent in intents:
+        queries = INTENT_QUERIES[intent]
+        # 预热：首次调用会触发图编译后的惰性初始化
+        await workflow.run(queries[0], user_id="bench")
+        for concurrency in levels:
+            stats = await run_level(workflow, queries, args.requests, concurrency)
+            print(f"{intent:<18}{concurrency:>6}{stats['requests']:>8}{stats['failures']:>6}"
+                  f"{stats['throughput']:>14.1f}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+
+    print(f"LLM调用次数: {llm.calls}")
+    await get_search_history_recorder().close()
+    await close_database()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线压测 TravelAgentWorkflow")
+    parser.add_argument("--concurrency", default="1,8,32", help="并发度列表，逗号分隔")
+    parser.add_argument("--requests", type=int, default=200, help="每个并发度的请求数")
+    parser.add_argument("--intents", default="all", help="意图列表，逗号分隔，默认全部")
+    parser.add_argument("--latency", default="constant", choices=["constant", "uniform", "lognormal"],
+                        help="模拟 LLM 延迟分布")
+    parser.add_argument("--latency-mean", type=float, default=0.0, help="模拟 LLM 平均延迟（秒）")
+    parser.add_argument("--latency-spread", type=float, default=0.0,
+                        help="uniform 为浮动范围（秒），lognormal 为对数标准差")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--enable-cache", action="store_true", help="启用 LLM 响应缓存")
+    parser.add_argument("--enable-coalesce", action="store_true", help="启用相同请求合并")
+    parser.add_argument("--enable-admission", action="store_true", help="启用 LLM 准入控制")
+    parser.add_argument("--enable-classifier", action="store_true", help="启用本地意图分类器")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    # 预订、搜索历史和用户偏好都会访问数据库，使用临时数据库，不在当前目录留下文件
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(main_async(args, directory))
+
+
+if __name__ == "__main__":
+    main()
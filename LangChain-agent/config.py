@@ -2,7 +2,7 @@
 配置管理模块
 """
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, Dict, Optional
 
 
 class Settings(BaseSettings):
@@ -19,12 +19,93 @@ class Settings(BaseSettings):
     
     # 数据库配置
     DATABASE_URL: str = "sqlite+aiosqlite:///./travel_agent.db"
+    DATABASE_TUNED: bool = True  # 调优模式：连接池 + SQLite WAL/PRAGMA + 独立只读连接池
+    DB_POOL_SIZE: int = 5  # 读写连接池大小（SQLite 同一时刻只有一个写事务，不宜过大）
+    DB_MAX_OVERFLOW: int = 5
+    DB_READ_POOL_SIZE: int = 10  # 只读连接池大小
+    DB_READ_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # 等待空闲连接的秒数
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL 下 NORMAL 只在掉电时可能丢失最近的提交，不会损坏数据库
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # 等待写锁的毫秒数
+    SQLITE_CACHE_SIZE_KB: int = 65536  # 每个连接的页缓存（KB）
+    SQLITE_MMAP_SIZE: int = 268435456  # 内存映射读取的字节数
     
     # LLM 配置
     LLM_MODEL: str = "qwen-turbo"
     LLM_TEMPERATURE: float = 0.7
     LLM_MAX_TOKENS: int = 2000
     
+    # LLM 客户端配置档（名称 -> 参数），未指定的参数沿用上方配置
+    LLM_PROFILES: Dict[str, Dict[str, Any]] = {}
+    # 智能体绑定的配置档（智能体名称 -> 配置档名称），未绑定的使用 default
+    AGENT_LLM_PROFILES: Dict[str, str] = {}
+    
+    # LLM 响应缓存配置
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 缓存内存上限
+    LLM_CACHE_DEFAULT_TTL: float = 300.0  # 默认存活秒数
+    LLM_CACHE_TTL_OVERRIDES: Dict[str, float] = {}  # 按智能体类名覆盖TTL，0表示不缓存
+    
+    # LLM 并发请求合并
+    LLM_COALESCE_ENABLED: bool = True
+    
+    # LLM 出站流量控制（按模型）
+    LLM_ADMISSION_ENABLED: bool = True
+    LLM_RATE_LIMIT_QPS: float = 10.0  # 令牌桶速率，0 表示不限速
+    LLM_RATE_LIMIT_BURST: int = 20  # 令牌桶容量
+    LLM_CONCURRENCY_INITIAL: int = 8  # 初始并发窗口
+    LLM_CONCURRENCY_MIN: int = 1
+    LLM_CONCURRENCY_MAX: int = 64
+    LLM_LATENCY_TARGET: float = 8.0  # 目标延迟（秒），超过即收缩并发窗口
+    LLM_LIMIT_BACKOFF: float = 0.7  # 拥塞或限流时的窗口缩减系数
+    LLM_QUEUE_MAX: int = 200  # 等待队列上限，超出直接拒绝
+    LLM_QUEUE_TIMEOUT: float = 15.0  # 排队超时（秒）
+    
+    # 本地意图分类器
+    INTENT_CLASSIFIER_PATH: str = "data/intent_classifier.npz"
+    INTENT_CLASSIFIER_THRESHOLD: float = 0.9  # 置信度不低于该值时跳过LLM
+    INTENT_CLASSIFIER_SHADOW: bool = False  # 影子模式：始终调用LLM，仅记录分类器与LLM的一致率
+    
+    # 航班库存
+    FLIGHT_INVENTORY_PATH: str = "data/flights.csv"  # 不存在时使用模拟数据
+    FLIGHT_SEARCH_LIMIT: int = 10  # 单次查询返回的航班数
+    
+    # 酒店库存
+    HOTEL_INVENTORY_PATH: str = "data/hotels.csv"
+    HOTEL_SYNTHETIC_SIZE: int = 200  # 未收录城市按需生成的合成酒店数量
+    HOTEL_SYNTHETIC_CACHE_SIZE: int = 64  # 最多缓存的合成城市索引数（LRU）
+    HOTEL_SEARCH_LIMIT: int = 5  # 单次查询返回的酒店数
+    
+    # 景点目录
+    ATTRACTION_CATALOG_PATH: str = "data/attractions.json"
+    
+    # 库存预占
+    RESERVATION_HOLD_TTL: int = 900  # 预占保留秒数，超时未确认自动释放
+    RESERVATION_REAPER_INTERVAL: float = 30.0  # 过期预占回收间隔（秒）
+    RESERVATION_CAS_RETRIES: int = 5  # 版本冲突时的重试次数
+    
+    # 批量提交写入
+    GROUP_COMMIT_MAX_BATCH: int = 256  # 每个事务最多合并的写操作数
+    GROUP_COMMIT_MAX_DELAY: float = 0.0  # 凑批等待秒数，0 表示只合并已排队的写操作
+    
+    # 搜索历史
+    SEARCH_HISTORY_ENABLED: bool = True
+    SEARCH_HISTORY_BUFFER_SIZE: int = 10000  # 内存缓冲区容量，写满后丢弃新记录
+    SEARCH_HISTORY_BATCH_SIZE: int = 500  # 攒够该数量立即写入
+    SEARCH_HISTORY_FLUSH_INTERVAL: float = 2.0  # 最长写入间隔（秒）
+    SEARCH_HISTORY_SAMPLE_WATERMARK: float = 0.8  # 缓冲区占用超过该比例后开始采样
+    SEARCH_HISTORY_OVERLOAD_SAMPLE_RATE: float = 0.1  # 过载时的采样保留比例
+    
+    # 用户偏好缓存
+    USER_PREFERENCE_CACHE_TTL: float = 300.0  # 缓存存活秒数
+    USER_PREFERENCE_NEGATIVE_TTL: float = 60.0  # 无偏好记录的用户缓存秒数
+    USER_PREFERENCE_CACHE_MAX_ENTRIES: int = 10000
+    
+    # 提示词 token 预算（只计模板变量中的数据部分，按估算 token 数）
+    PROMPT_TOKEN_BUDGET_DEFAULT: int = 600
+    PROMPT_TOKEN_BUDGET_OVERRIDES: Dict[str, int] = {}  # 按智能体类名覆盖
+    
     # 日志配置
     LOG_LEVEL: str = "INFO"
     
@@ -1,18 +1,93 @@
 """
 数据库配置和初始化
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, String, Integer, Float, DateTime, Text, JSON
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, JSON, event, inspect, text
+from sqlalchemy.engine import Connection
 from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
 from config import settings
+import asyncio
+
+
+# ==================== 引擎配置 ====================
+
+def _is_sqlite_memory(url: str) -> bool:
+    """是否为 SQLite 内存库（每个连接各自独立，不能使用连接池或第二个引擎）"""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def _sqlite_pragmas(read_only: bool = False) -> List[str]:
+    """调优模式下每个 SQLite 连接建立时执行的 PRAGMA"""
+    pragmas = [
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def build_engine(url: str, read_only: bool = False, tuned: Optional[bool] = None) -> AsyncEngine:
+    """
+    创建异步引擎
+
+    SQLite 文件库在调优模式下启用 WAL（读写互不阻塞）、设置连接池大小，
+    并在每个连接建立时执行 PRAGMA；其他数据库只设置连接池大小。
+
+    Args:
+        url: 数据库连接串
+        read_only: 是否为只读引擎（连接设置 query_only，使用只读连接池大小）
+        tuned: 是否启用调优模式，默认取配置
+
+    Returns:
+        异步引擎
+    """
+    tuned = settings.DATABASE_TUNED if tuned is None else tuned
+    is_sqlite = make_url(url).get_backend_name() == "sqlite"
+
+    options: Dict[str, Any] = {"echo": False, "future": True}
+    if tuned and not _is_sqlite_memory(url):
+        # aiosqlite 文件库默认使用 NullPool（每次会话新建连接并重新执行 PRAGMA），改为固定大小的连接池
+        options["poolclass"] = AsyncAdaptedQueuePool
+        options["pool_size"] = settings.DB_READ_POOL_SIZE if read_only else settings.DB_POOL_SIZE
+        options["max_overflow"] = settings.DB_READ_MAX_OVERFLOW if read_only else settings.DB_MAX_OVERFLOW
+        options["pool_timeout"] = settings.DB_POOL_TIMEOUT
+
+    engine = create_async_engine(url, **options)
+
+    if is_sqlite and tuned:
+        pragmas = _sqlite_pragmas(read_only)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
+    return engine
 
-# 创建异步引擎
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    future=True
-)
+
+# 创建异步引擎（读写）
+engine = build_engine(settings.DATABASE_URL)
+
+# 只读引擎：查询接口使用独立连接池，不占用写连接；WAL 模式下读取不阻塞写入
+if settings.DATABASE_TUNED and not _is_sqlite_memory(settings.DATABASE_URL):
+    read_engine = build_engine(settings.DATABASE_URL, read_only=True)
+else:
+    read_engine = engine
 
 # 创建会话工厂
 async_session_maker = async_sessionmaker(
@@ -21,6 +96,13 @@ async_session_maker = async_sessionmaker(
     expire_on_commit=False
 )
 
+# 只读会话工厂
+async_read_session_maker = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
 # 基础模型
 Base = declarative_base()
 
@@ -41,6 +123,35 @@ class OrderDB(Base):
     total_price = Column(Float, nullable=False)
     status = Column(String(20), default="pending")
     contact_info = Column(JSON, default={})
+    hold_id = Column(String(100), nullable=True)
+    hold_expires_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class InventoryDB(Base):
+    """产品库存表（余票/余房），version 用于乐观并发控制"""
+    __tablename__ = "inventory"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_id = Column(String(100), unique=True, nullable=False, index=True)
+    product_type = Column(String(50), nullable=False)
+    capacity = Column(Integer, nullable=False)
+    available = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class InventoryHoldDB(Base):
+    """库存预占表"""
+    __tablename__ = "inventory_holds"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    hold_id = Column(String(100), unique=True, nullable=False, index=True)
+    product_id = Column(String(100), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String(20), default="held", index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
@@ -54,6 +165,7 @@ class SearchHistoryDB(Base):
     session_id = Column(String(100), index=True)
     query = Column(Text, nullable=False)
     intent_type = Column(String(50))
+    intent_source = Column(String(20))  # 意图标签来源：llm / classifier / fallback（解析失败转客服）
     results = Column(JSON, default={})
     created_at = Column(DateTime, default=datetime.now)
 
@@ -73,10 +185,50 @@ class UserPreferenceDB(Base):
 
 # ==================== 数据库初始化 ====================
 
+def _add_missing_columns(conn: Connection):
+    """
+    为已存在的表补上模型中新增的列
+
+    create_all 只创建不存在的表，不会修改已有的表；旧数据库升级后缺少新列，
+    ORM 读写该表时会报 no such column。新增列必须可为空，已有行取 NULL。
+
+    Args:
+        conn: 同步数据库连接
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    quote = conn.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        added = set()
+        for column in table.columns:
+            if column.name in present:
+                continue
+            if not column.nullable:
+                raise RuntimeError(f"无法自动为表 {table.name} 添加非空列 {column.name}，请手动迁移")
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+            added.add(column.name)
+            logger.info(f"数据库升级: 表 {table.name} 添加列 {column.name}")
+        for index in table.indexes:
+            if any(column.name in added for column in index.columns):
+                index.create(conn, checkfirst=True)
+
+
 async def init_database():
-    """初始化数据库"""
+    """初始化数据库（创建缺少的表，并为已有的表补上新增的列）"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+
+
+async def close_database():
+    """关闭数据库连接池"""
+    if read_engine is not engine:
+        await read_engine.dispose()
+    await engine.dispose()
 
 
 async def get_session() -> AsyncSession:
@@ -87,3 +239,138 @@ async def get_session() -> AsyncSession:
         finally:
             await session.close()
 
+
+# ==================== 批量提交写入器 ====================
+
+WriteOperation = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class GroupCommitWriter:
+    """
+    批量提交写入器
+
+    并发提交的写操作排队后由后台任务合并到同一个事务中执行，一次提交（一次 fsync）完成一批写入。
+    空闲时单个写入立即执行；负载越高，每批合并的写入越多。
+    """
+
+    def __init__(self, session_maker: Optional[async_sessionmaker] = None,
+                 max_batch: Optional[int] = None, max_delay: Optional[float] = None):
+        """
+        初始化写入器
+
+        Args:
+            session_maker: 数据库会话工厂，默认使用全局会话工厂
+            max_batch: 每批最多合并的写操作数，默认取配置
+            max_delay: 凑批的最长等待秒数，0 表示不等待，默认取配置
+        """
+        self.session_maker = session_maker or async_session_maker
+        self.max_batch = max_batch or settings.GROUP_COMMIT_MAX_BATCH
+        self.max_delay = max_delay if max_delay is not None else settings.GROUP_COMMIT_MAX_DELAY
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._stats = {"batches": 0, "writes": 0, "failed_batches": 0, "max_batch_size": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        """返回统计信息"""
+        stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize() if self._queue is not None else 0
+        stats["avg_batch_size"] = round(stats["writes"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    async def submit(self, operation: WriteOperation) -> Any:
+        """
+        提交写操作并等待所在批次提交
+
+        Args:
+            operation: 接收会话的异步函数，在共享事务内执行，不应自行提交
+
+        Returns:
+            写操作的返回值
+        """
+        if self._closed:
+            raise RuntimeError("写入器已关闭")
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future))
+        return await future
+
+    async def _run(self):
+        """后台任务：取出当前排队的全部写操作，合并为一个事务"""
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            if self.max_delay > 0 and self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.max_delay)
+            stop = False
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stop:
+                return
+
+    async def _flush(self, batch: List[Tuple[WriteOperation, asyncio.Future]]):
+        """执行一批写操作；整批失败时逐个重试，只让出错的写操作失败"""
+        self._stats["batches"] += 1
+        self._stats["writes"] += len(batch)
+        self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+        try:
+            results = await self._execute(batch)
+        except Exception as e:
+            self._stats["failed_batches"] += 1
+            if len(batch) == 1:
+                self._resolve(batch[0][1], error=e)
+                return
+            logger.warning(f"批量写入失败，逐个重试: {str(e)}")
+            for operation, future in batch:
+                try:
+                    result = (await self._execute([(operation, future)]))[0]
+                except Exception as error:
+                    self._resolve(future, error=error)
+                else:
+                    self._resolve(future, result)
+            return
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result)
+
+    async def _execute(self, batch: List[Tuple[WriteOperation, asyncio.Future]]) -> List[Any]:
+        """在一个事务内依次执行写操作"""
+        async with self.session_maker() as session, session.begin():
+            return [await operation(session) for operation, _ in batch]
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, error: Optional[Exception] = None):
+        """设置等待者结果（等待者已取消时忽略）"""
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def close(self):
+        """停止接收新写操作，等待已排队的写操作全部提交"""
+        self._closed = True
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+
+
+_writer_instance: Optional[GroupCommitWriter] = None
+
+
+def get_group_commit_writer() -> GroupCommitWriter:
+    """获取批量提交写入器实例（单例模式）"""
+    global _writer_instance
+    if _writer_instance is None:
+        _writer_instance = GroupCommitWriter()
+    return _writer_instance
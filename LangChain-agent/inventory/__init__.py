@@ -0,0 +1,26 @@
+"""
+库存数据模块
+"""
+from .rows import ResultRow, FlightRow, HotelRow, to_models, to_dicts
+from .flights import FlightInventory, get_flight_inventory
+from .hotels import HotelInventory, CityHotelIndex, get_hotel_inventory
+from .attractions import AttractionCatalog, get_attraction_catalog, reload_attraction_catalog
+from .reservations import ReservationManager, get_reservation_manager
+
+__all__ = [
+    "ResultRow",
+    "FlightRow",
+    "HotelRow",
+    "to_models",
+    "to_dicts",
+    "FlightInventory",
+    "get_flight_inventory",
+    "HotelInventory",
+    "CityHotelIndex",
+    "get_hotel_inventory",
+    "AttractionCatalog",
+    "get_attraction_catalog",
+    "reload_attraction_catalog",
+    "ReservationManager",
+    "get_reservation_manager",
+]
@@ -0,0 +1,134 @@
+"""
+景点目录
+职责：启动时从数据文件加载一次景点目录，建立城市、类别、标签倒排索引；热更新时整体替换目录引用
+"""
+import json
+import os
+from typing import Dict, FrozenSet, List, Optional, Sequence
+from loguru import logger
+from config import settings
+from models import Attraction
+
+
+class AttractionCatalog:
+    """只读景点目录（构建后不再修改，可被并发请求安全共享）"""
+
+    def __init__(self, attractions: Sequence[Attraction]):
+        """
+        构建目录及倒排索引
+
+        Args:
+            attractions: 景点列表
+        """
+        self.attractions: Dict[str, Attraction] = {a.attraction_id: a for a in attractions}
+
+        city_ids: Dict[str, List[str]] = {}
+        keyword_ids: Dict[str, set] = {}
+        for attraction in self.attractions.values():
+            city_ids.setdefault(attraction.city, []).append(attraction.attraction_id)
+            keyword_ids.setdefault(attraction.category, set()).add(attraction.attraction_id)
+            for tag in attraction.tags:
+                keyword_ids.setdefault(tag, set()).add(attraction.attraction_id)
+
+        # 城市 -> 按评分降序的景点ID
+        self.by_city: Dict[str, List[str]] = {
+            city: sorted(ids, key=lambda i: self.attractions[i].rating, reverse=True)
+            for city, ids in city_ids.items()
+        }
+        # 类别/标签 -> 景点ID集合
+        self.by_keyword: Dict[str, FrozenSet[str]] = {k: frozenset(v) for k, v in keyword_ids.items()}
+        self._preference_ids: Dict[str, FrozenSet[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.attractions)
+
+    @property
+    def cities(self) -> List[str]:
+        return list(self.by_city)
+
+    def _ids_for_preference(self, preference: str) -> FrozenSet[str]:
+        """偏好对应的景点ID集合（偏好为类别或标签的子串即视为匹配，如 "历史" 匹配 "历史文化"）"""
+        ids = self._preference_ids.get(preference)
+        if ids is None:
+            matched = set()
+            for keyword, keyword_ids in self.by_keyword.items():
+                if preference in keyword:
+                    matched |= keyword_ids
+            ids = frozenset(matched)
+            if len(self._preference_ids) >= 1024:
+                self._preference_ids.clear()
+            self._preference_ids[preference] = ids
+        return ids
+
+    def matching_ids(self, preferences: Sequence[str]) -> FrozenSet[str]:
+        """命中任一偏好的景点ID集合"""
+        return frozenset().union(*(self._ids_for_preference(p) for p in preferences))
+
+    def recommend(self, city: str, preferences: Sequence[str] = (), limit: int = 6) -> List[Attraction]:
+        """
+        推荐景点
+
+        Args:
+            city: 城市
+            preferences: 偏好（类别或标签），命中任一即可
+            limit: 返回数量
+
+        Returns:
+            按评分降序的景点列表；没有景点命中偏好时返回该城市评分最高的景点
+        """
+        ranked = self.by_city.get(city, [])
+        if preferences:
+            matched = self.matching_ids(preferences)
+            preferred = [i for i in ranked if i in matched]
+            if preferred:
+                ranked = preferred
+        return [self.attractions[i] for i in ranked[:limit]]
+
+    @classmethod
+    def load(cls, path: str) -> "AttractionCatalog":
+        """
+        从 JSON 文件加载目录
+
+        Args:
+            path: 文件路径，内容为景点对象数组
+
+        Returns:
+            景点目录
+        """
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+        return cls([Attraction(**record) for record in records])
+
+
+# ==================== 全局目录实例 ====================
+
+_catalog_instance: Optional[AttractionCatalog] = None
+
+
+def get_attraction_catalog() -> AttractionCatalog:
+    """获取景点目录（单例模式），首次调用时加载"""
+    global _catalog_instance
+    if _catalog_instance is None:
+        reload_attraction_catalog()
+    return _catalog_instance
+
+
+def reload_attraction_catalog() -> AttractionCatalog:
+    """
+    重新加载景点目录
+
+    新目录完整构建后才替换全局引用，进行中的请求继续使用各自已取得的旧目录
+
+    Returns:
+        新的景点目录
+    """
+    global _catalog_instance
+    path = settings.ATTRACTION_CATALOG_PATH
+    if path and os.path.exists(path):
+        catalog = AttractionCatalog.load(path)
+    else:
+        logger.warning(f"景点数据文件不存在: {path}")
+        catalog = AttractionCatalog([])
+    _catalog_instance = catalog
+    logger.info(f"已加载景点目录: {len(catalog)} 个景点, {len(catalog.cities)} 个城市")
+    return catalog
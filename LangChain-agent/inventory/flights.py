@@ -0,0 +1,387 @@
+"""
+航班库存
+职责：列式存储航班班次，按 (出发城市, 到达城市, 日期) 建立索引，向量化过滤并只为返回的班次构造结果行
+"""
+import argparse
+import csv
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from loguru import logger
+from config import settings
+from models import CabinClass
+from .rows import FlightRow
+
+
+EPOCH = datetime(1970, 1, 1)
+MINUTES_PER_DAY = 24 * 60
+
+CABIN_CLASSES: Tuple[CabinClass, ...] = (CabinClass.ECONOMY, CabinClass.BUSINESS, CabinClass.FIRST)
+_CABIN_CODES = {cabin: code for code, cabin in enumerate(CABIN_CLASSES)}
+
+SORT_KEYS = ("price", "departure_time", "duration")
+
+CSV_FIELDS = [
+    "flight_id", "airline", "flight_number", "departure_city", "arrival_city",
+    "departure_airport", "arrival_airport", "departure_time", "arrival_time",
+    "cabin_class", "price", "available_seats", "stops"
+]
+
+# 合成数据用的航空公司（名称, 代码）与城市
+SYNTHETIC_AIRLINES = [("中国国际航空", "CA"), ("东方航空", "MU"), ("南方航空", "CZ"), ("海南航空", "HU"), ("吉祥航空", "HO")]
+SYNTHETIC_CITIES = [
+    "北京", "上海", "广州", "深圳", "成都", "杭州", "西安", "重庆", "南京", "武汉",
+    "厦门", "青岛", "三亚", "昆明", "长沙", "苏州", "天津", "大连", "桂林", "丽江"
+]
+
+
+def _encode(values: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """将字符串列编码为 (类别列表, int32 编码)"""
+    categories, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return categories.tolist(), codes.astype(np.int32)
+
+
+def _to_minutes(values) -> np.ndarray:
+    """时间列（ISO 字符串或 datetime64）转为距 1970-01-01 的分钟数"""
+    return np.asarray(values, dtype="datetime64[m]").astype(np.int64)
+
+
+def _minute_of_day(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+class FlightInventory:
+    """列式航班库存"""
+
+    def __init__(self, flight_id, airline, flight_number, departure_city, arrival_city,
+                 departure_airport, arrival_airport, departure_time, arrival_time,
+                 cabin_class, price, available_seats, stops):
+        """
+        由各列数据构建库存（行顺序任意，构建时按索引键重排）
+
+        Args:
+            flight_id: 航班ID列
+            airline: 航空公司列
+            flight_number: 航班号列
+            departure_city: 出发城市列
+            arrival_city: 到达城市列
+            departure_airport: 出发机场列
+            arrival_airport: 到达机场列
+            departure_time: 起飞时间列（ISO 字符串或 datetime64）
+            arrival_time: 到达时间列（ISO 字符串或 datetime64）
+            cabin_class: 舱位列（economy/business/first）
+            price: 价格列
+            available_seats: 余票列
+            stops: 经停次数列
+        """
+        self.airlines, airline_codes = _encode(airline)
+        self.cities, city_codes = _encode(np.concatenate([
+            np.asarray(departure_city, dtype=object), np.asarray(arrival_city, dtype=object)
+        ]))
+        self.airports, airport_codes = _encode(np.concatenate([
+            np.asarray(departure_airport, dtype=object), np.asarray(arrival_airport, dtype=object)
+        ]))
+        size = len(airline_codes)
+        dep_city, arr_city = city_codes[:size], city_codes[size:]
+        dep_airport, arr_airport = airport_codes[:size], airport_codes[size:]
+
+        dep_minute = _to_minutes(departure_time)
+        arr_minute = _to_minutes(arrival_time)
+        day = dep_minute // MINUTES_PER_DAY
+        cabin_lookup = {cabin.value: code for cabin, code in _CABIN_CODES.items()}
+        cabin = np.fromiter((cabin_lookup[str(value)] for value in cabin_class), dtype=np.int8, count=size)
+
+        # 按 (出发城市, 到达城市, 日期, 起飞时间) 排序，同一索引键的班次连续存放
+        order = np.lexsort((dep_minute, day, arr_city, dep_city))
+        self.flight_id = np.asarray(flight_id, dtype=object)[order]
+        self.flight_number = np.asarray(flight_number, dtype=object)[order]
+        self.airline = airline_codes[order]
+        self.dep_city = dep_city[order]
+        self.arr_city = arr_city[order]
+        self.dep_airport = dep_airport[order]
+        self.arr_airport = arr_airport[order]
+        self.dep_minute = dep_minute[order]
+        self.arr_minute = arr_minute[order]
+        self.duration = self.arr_minute - self.dep_minute
+        self.cabin = cabin[order]
+        self.price = np.asarray(price, dtype=np.float64)[order]
+        self.available_seats = np.asarray(available_seats, dtype=np.int32)[order]
+        self.stops = np.asarray(stops, dtype=np.int8)[order]
+
+        self._index = self._build_index(day[order])
+        self._row_by_id: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def seats(self, flight_id: str) -> Optional[int]:
+        """
+        查询班次的可售座位数（库存登记用）
+
+        Args:
+            flight_id: 航班ID
+
+        Returns:
+            可售座位数，班次不存在时返回 None
+        """
+        if self._row_by_id is None:
+            self._row_by_id = {value: row for row, value in enumerate(self.flight_id.tolist())}
+        row = self._row_by_id.get(flight_id)
+        return None if row is None else int(self.available_seats[row])
+
+    def _build_index(self, day: np.ndarray) -> Dict[Tuple[str, str, int], Tuple[int, int]]:
+        """索引键 -> 行区间 [start, end)"""
+        if not len(day):
+            return {}
+        changed = (
+            (self.dep_city[1:] != self.dep_city[:-1])
+            | (self.arr_city[1:] != self.arr_city[:-1])
+            | (day[1:] != day[:-1])
+        )
+        starts = np.concatenate([[0], np.flatnonzero(changed) + 1])
+        ends = np.concatenate([starts[1:], [len(day)]])
+        return {
+            (self.cities[self.dep_city[start]], self.cities[self.arr_city[start]], int(day[start])): (int(start), int(end))
+            for start, end in zip(starts, ends)
+        }
+
+    def search(self, departure: str, destination: str, departure_date: date,
+               passengers: int = 1, cabin_class: Optional[CabinClass] = None,
+               earliest: Optional[time] = None, latest: Optional[time] = None,
+               max_stops: Optional[int] = None, max_price: Optional[float] = None,
+               sort_by: str = "price", limit: int = 10) -> List[FlightRow]:
+        """
+        查询航班
+
+        Args:
+            departure: 出发城市
+            destination: 到达城市
+            departure_date: 出发日期
+            passengers: 乘客数，余票不足的班次被过滤
+            cabin_class: 舱位等级
+            earliest: 最早起飞时间
+            latest: 最晚起飞时间
+            max_stops: 最多经停次数
+            max_price: 价格上限
+            sort_by: 排序字段（price/departure_time/duration）
+            limit: 返回数量
+
+        Returns:
+            航班结果行列表（只为返回的行构造）
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"不支持的排序字段: {sort_by}")
+
+        bounds = self._index.get((departure, destination, (departure_date - EPOCH.date()).days))
+        if bounds is None or limit <= 0:
+            return []
+        start, end = bounds
+
+        mask = self.available_seats[start:end] >= passengers
+        if cabin_class is not None:
+            mask &= self.cabin[start:end] == _CABIN_CODES[CabinClass(cabin_class)]
+        if max_stops is not None:
+            mask &= self.stops[start:end] <= max_stops
+        if max_price is not None:
+            mask &= self.price[start:end] <= max_price
+        if earliest is not None or latest is not None:
+            minute_of_day = self.dep_minute[start:end] % MINUTES_PER_DAY
+            if earliest is not None:
+                mask &= minute_of_day >= _minute_of_day(earliest)
+            if latest is not None:
+                mask &= minute_of_day <= _minute_of_day(latest)
+
+        rows = np.flatnonzero(mask) + start
+        if sort_by == "price":
+            keys = self.price[rows]
+        elif sort_by == "duration":
+            keys = self.duration[rows]
+        else:
+            keys = self.dep_minute[rows]
+
+        # 只对前 limit 个做部分排序
+        if len(rows) > limit:
+            selected = np.argpartition(keys, limit - 1)[:limit]
+            rows, keys = rows[selected], keys[selected]
+        rows = rows[np.argsort(keys, kind="stable")]
+
+        return self._materialize(rows)
+
+    def _materialize(self, rows: np.ndarray) -> List[FlightRow]:
+        """按列批量取出返回的行并构造结果行（每列一次 tolist()，避免逐个读取 numpy 标量）"""
+        durations = self.duration[rows].tolist()
+        cities, airports = self.cities, self.airports
+        return [
+            FlightRow(
+                flight_id=flight_id,
+                airline=self.airlines[airline],
+                flight_number=flight_number,
+                departure_city=cities[dep_city],
+                arrival_city=cities[arr_city],
+                departure_airport=airports[dep_airport],
+                arrival_airport=airports[arr_airport],
+                departure_time=departure_time,
+                arrival_time=arrival_time,
+                duration=f"{duration // 60}小时{duration % 60}分钟",
+                cabin_class=CABIN_CLASSES[cabin],
+                price=price,
+                available_seats=available_seats,
+                stops=stops
+            )
+            for (flight_id, airline, flight_number, dep_city, arr_city, dep_airport, arr_airport,
+                 departure_time, arrival_time, duration, cabin, price, available_seats, stops)
+            in zip(
+                self.flight_id[rows].tolist(),
+                self.airline[rows].tolist(),
+                self.flight_number[rows].tolist(),
+                self.dep_city[rows].tolist(),
+                self.arr_city[rows].tolist(),
+                self.dep_airport[rows].tolist(),
+                self.arr_airport[rows].tolist(),
+                self.dep_minute[rows].astype("datetime64[m]").tolist(),
+                self.arr_minute[rows].astype("datetime64[m]").tolist(),
+                durations,
+                self.cabin[rows].tolist(),
+                self.price[rows].tolist(),
+                self.available_seats[rows].tolist(),
+                self.stops[rows].tolist()
+            )
+        ]
+
+    # ==================== 批量导入导出 ====================
+
+    @classmethod
+    def load_csv(cls, path: str) -> "FlightInventory":
+        """
+        从 CSV 文件批量加载，列名见 CSV_FIELDS
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            航班库存
+        """
+        columns: Dict[str, list] = {field: [] for field in CSV_FIELDS}
+        with open(path, newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                for field in CSV_FIELDS:
+                    columns[field].append(record[field])
+        return cls(**columns)
+
+    def save_csv(self, path: str):
+        """导出为 CSV 文件"""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            dep_times = self.dep_minute.astype("datetime64[m]").astype(str)
+            arr_times = self.arr_minute.astype("datetime64[m]").astype(str)
+            for row in range(len(self)):
+                writer.writerow([
+                    self.flight_id[row],
+                    self.airlines[self.airline[row]],
+                    self.flight_number[row],
+                    self.cities[self.dep_city[row]],
+                    self.cities[self.arr_city[row]],
+                    self.airports[self.dep_airport[row]],
+                    self.airports[self.arr_airport[row]],
+                    dep_times[row],
+                    arr_times[row],
+                    CABIN_CLASSES[self.cabin[row]].value,
+                    f"{self.price[row]:.2f}",
+                    int(self.available_seats[row]),
+                    int(self.stops[row])
+                ])
+
+    @classmethod
+    def synthetic(cls, start_date: date, days: int, flights_per_day: int,
+                  cities: Sequence[str] = SYNTHETIC_CITIES, seed: int = 0) -> "FlightInventory":
+        """
+        生成合成班次数据（所有城市两两互通）
+
+        Args:
+            start_date: 起始日期
+            days: 天数
+            flights_per_day: 每条航线每天的班次数
+            cities: 城市列表
+            seed: 随机种子
+
+        Returns:
+            航班库存
+        """
+        rng = np.random.default_rng(seed)
+        cities = np.asarray(cities, dtype=object)
+        pairs = np.array([(i, j) for i in range(len(cities)) for j in range(len(cities)) if i != j])
+        per_route = days * flights_per_day
+        size = len(pairs) * per_route
+
+        dep_index = np.repeat(pairs[:, 0], per_route)
+        arr_index = np.repeat(pairs[:, 1], per_route)
+        day_offset = np.tile(np.repeat(np.arange(days), flights_per_day), len(pairs))
+        start_minute = (start_date - EPOCH.date()).days * MINUTES_PER_DAY
+        dep_minute = start_minute + day_offset * MINUTES_PER_DAY + rng.integers(6 * 60, 22 * 60, size)
+        arr_minute = dep_minute + rng.integers(90, 8 * 60, size)
+
+        airline_index = rng.integers(0, len(SYNTHETIC_AIRLINES), size)
+        airline_names = np.array([name for name, _ in SYNTHETIC_AIRLINES], dtype=object)
+        airline_codes = np.array([code for _, code in SYNTHETIC_AIRLINES], dtype=object)
+        numbers = rng.integers(1000, 9999, size).astype(str).astype(object)
+
+        cabin = rng.choice(3, size, p=[0.7, 0.2, 0.1])
+        price = rng.integers(500, 2000, size) * np.array([1.0, 2.5, 4.0])[cabin]
+        cabin_values = np.array([cabin.value for cabin in CABIN_CLASSES], dtype=object)
+
+        return cls(
+            flight_id=np.char.add("FL", np.arange(size).astype(str)).astype(object),
+            airline=airline_names[airline_index],
+            flight_number=airline_codes[airline_index] + numbers,
+            departure_city=cities[dep_index],
+            arrival_city=cities[arr_index],
+            departure_airport=cities[dep_index] + "国际机场",
+            arrival_airport=cities[arr_index] + "国际机场",
+            departure_time=dep_minute.astype("datetime64[m]"),
+            arrival_time=arr_minute.astype("datetime64[m]"),
+            cabin_class=cabin_values[cabin],
+            price=np.round(price, 2),
+            available_seats=rng.integers(0, 200, size),
+            stops=(rng.random(size) < 0.3).astype(np.int8)
+        )
+
+
+# ==================== 全局库存实例 ====================
+
+_flight_inventory_instance: Optional[FlightInventory] = None
+_flight_inventory_loaded = False
+
+
+def get_flight_inventory() -> Optional[FlightInventory]:
+    """获取航班库存（单例模式），数据文件不存在时返回 None"""
+    global _flight_inventory_instance, _flight_inventory_loaded
+    if not _flight_inventory_loaded:
+        _flight_inventory_loaded = True
+        path = settings.FLIGHT_INVENTORY_PATH
+        if path and os.path.exists(path):
+            _flight_inventory_instance = FlightInventory.load_csv(path)
+            logger.info(f"已加载航班库存: {path}, {len(_flight_inventory_instance)} 个班次")
+    return _flight_inventory_instance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成航班库存文件")
+    parser.add_argument("--output", default=settings.FLIGHT_INVENTORY_PATH, help="输出 CSV 路径")
+    parser.add_argument("--start-date", default=date.today().isoformat(), help="起始日期 (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=30, help="天数")
+    parser.add_argument("--flights-per-day", type=int, default=12, help="每条航线每天的班次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    inventory = FlightInventory.synthetic(
+        date.fromisoformat(args.start_date), args.days, args.flights_per_day, seed=args.seed
+    )
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    inventory.save_csv(args.output)
+    print(f"已生成 {len(inventory)} 个班次: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+"""
+酒店库存
+职责：按城市建立酒店索引——价格有序存储、星级分桶、设施位图，向量化计算性价比并部分排序取前 k 个
+"""
+import csv
+import os
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from loguru import logger
+from config import settings
+from models import HotelStarRating
+from .rows import HotelRow
+
+
+STAR_RATINGS: Tuple[HotelStarRating, ...] = (
+    HotelStarRating.THREE_STAR, HotelStarRating.FOUR_STAR, HotelStarRating.FIVE_STAR, HotelStarRating.LUXURY
+)
+_STAR_CODES = {star: code for code, star in enumerate(STAR_RATINGS)}
+
+# 设施 -> 位图中的位
+FACILITIES = ["WiFi", "游泳池", "健身房", "餐厅", "停车场", "会议室", "SPA", "酒吧"]
+_FACILITY_BITS = {name: 1 << bit for bit, name in enumerate(FACILITIES)}
+
+# 偏好关键词 -> 设施
+FACILITY_KEYWORDS = {
+    "WiFi": ("wifi", "无线", "网络"),
+    "游泳池": ("游泳池", "泳池", "游泳"),
+    "健身房": ("健身房", "健身"),
+    "餐厅": ("餐厅", "早餐"),
+    "停车场": ("停车场", "停车"),
+    "会议室": ("会议室", "会议"),
+    "SPA": ("spa", "按摩", "水疗"),
+    "酒吧": ("酒吧",),
+}
+
+# 偏好关键词 -> 星级
+STAR_KEYWORDS = {
+    HotelStarRating.THREE_STAR: ("三星", "3星", "经济型"),
+    HotelStarRating.FOUR_STAR: ("四星", "4星"),
+    HotelStarRating.FIVE_STAR: ("五星", "5星"),
+    HotelStarRating.LUXURY: ("豪华", "奢华"),
+}
+
+CSV_FIELDS = [
+    "hotel_id", "name", "star_rating", "address", "city", "price_per_night", "available_rooms",
+    "room_type", "facilities", "rating", "reviews_count", "distance_to_center"
+]
+
+# 合成数据参数
+SYNTHETIC_CHAINS = ["希尔顿", "万豪", "香格里拉", "洲际", "喜来登", "凯悦", "如家", "汉庭"]
+SYNTHETIC_ROOM_TYPES = ["标准间", "豪华间", "商务套房", "行政套房", "总统套房"]
+SYNTHETIC_DISTRICTS = ["中心区", "商务区", "旅游区"]
+_STAR_PRICE_RANGES = [(200, 400), (400, 800), (800, 1500), (1500, 3000)]
+
+# 预算/星级圈定的候选数不超过该值时直接对候选做部分排序，否则按性价比顺序分块扫描
+DENSE_CANDIDATE_LIMIT = 2048
+SCAN_CHUNK = 256
+
+
+def parse_preferences(preferences: Sequence[str]) -> Tuple[int, List[HotelStarRating]]:
+    """
+    将偏好标签解析为设施位图和星级列表
+
+    Args:
+        preferences: 偏好标签，如 ["游泳池", "五星"]
+
+    Returns:
+        (必需设施位图, 星级列表)，星级列表为空表示不限
+    """
+    required = 0
+    stars = []
+    for preference in preferences:
+        text = str(preference).lower()
+        for facility, keywords in FACILITY_KEYWORDS.items():
+            if any(keyword in text for keyword in keywords):
+                required |= _FACILITY_BITS[facility]
+        for star, keywords in STAR_KEYWORDS.items():
+            if star not in stars and any(keyword in text for keyword in keywords):
+                stars.append(star)
+    return required, stars
+
+
+def facilities_to_mask(facilities: Sequence[str]) -> int:
+    """设施名称列表转为位图"""
+    mask = 0
+    for facility in facilities:
+        mask |= _FACILITY_BITS.get(facility, 0)
+    return mask
+
+
+class CityHotelIndex:
+    """单个城市的酒店索引，行按价格升序存放"""
+
+    def __init__(self, city: str, hotel_id, name, star_rating, address, price_per_night,
+                 available_rooms, room_type, facility_mask, rating, reviews_count, distance_to_center):
+        """
+        构建城市索引（行顺序任意，构建时按价格重排）
+
+        Args:
+            city: 城市名称
+            hotel_id: 酒店ID列
+            name: 酒店名称列
+            star_rating: 星级列（HotelStarRating 取值）
+            address: 地址列
+            price_per_night: 每晚价格列
+            available_rooms: 可用房间数列
+            room_type: 房型列
+            facility_mask: 设施位图列
+            rating: 评分列
+            reviews_count: 评论数列
+            distance_to_center: 距市中心距离列
+        """
+        self.city = city
+        price = np.asarray(price_per_night, dtype=np.float64)
+        order = np.argsort(price, kind="stable")
+
+        self.price = price[order]
+        self.hotel_id = np.asarray(hotel_id, dtype=object)[order]
+        self.name = np.asarray(name, dtype=object)[order]
+        self.address = np.asarray(address, dtype=object)[order]
+        self.room_type = np.asarray(room_type, dtype=object)[order]
+        star_lookup = {star.value: code for star, code in _STAR_CODES.items()}
+        self.star = np.fromiter((star_lookup[str(value)] for value in star_rating),
+                                dtype=np.int8, count=len(price))[order]
+        self.available_rooms = np.asarray(available_rooms, dtype=np.int32)[order]
+        self.facility_mask = np.asarray(facility_mask, dtype=np.uint16)[order]
+        self.rating = np.asarray(rating, dtype=np.float64)[order]
+        self.reviews_count = np.asarray(reviews_count, dtype=np.int32)[order]
+        self.distance = np.asarray(distance_to_center, dtype=np.float64)[order]
+
+        # 性价比与评分/价格相关，构建时一次算好
+        self.value_score = self.rating / (self.price / 100)
+
+        # 星级分桶：每个桶内的行号同样按价格升序
+        self.star_buckets = {code: np.flatnonzero(self.star == code) for code in range(len(STAR_RATINGS))}
+
+        # 按性价比降序的行号（全部及各星级），用于候选集较大时的提前终止扫描
+        self.by_value = np.argsort(-self.value_score, kind="stable")
+        self.star_by_value = {code: self.by_value[self.star[self.by_value] == code]
+                              for code in range(len(STAR_RATINGS))}
+        self._row_by_id: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def rooms(self, hotel_id: str) -> Optional[int]:
+        """查询酒店的可用房间数，酒店不在本城市时返回 None"""
+        if self._row_by_id is None:
+            self._row_by_id = {value: row for row, value in enumerate(self.hotel_id.tolist())}
+        row = self._row_by_id.get(hotel_id)
+        return None if row is None else int(self.available_rooms[row])
+
+    def _budget_end(self, rows: Optional[np.ndarray], budget: float) -> int:
+        """预算上限在价格有序行集合上对应的前缀长度"""
+        prices = self.price if rows is None else self.price[rows]
+        if budget <= 0:
+            return len(prices)
+        return int(np.searchsorted(prices, budget, side="right"))
+
+    def search(self, budget: float = 0, preferences: Sequence[str] = (), rooms: int = 1,
+               limit: int = 5) -> List[HotelRow]:
+        """
+        查询酒店
+
+        Args:
+            budget: 每晚预算上限，<=0 表示不限
+            preferences: 偏好标签，匹配设施和星级
+            rooms: 所需房间数
+            limit: 返回数量
+
+        Returns:
+            按性价比降序的酒店结果行列表（只为返回的行构造）
+        """
+        if limit <= 0:
+            return []
+        required, stars = parse_preferences(preferences)
+
+        # 预算过滤是价格有序数组（或星级桶）上的前缀截取
+        if stars:
+            buckets = [self.star_buckets[_STAR_CODES[star]] for star in stars]
+            prefixes = [bucket[:self._budget_end(bucket, budget)] for bucket in buckets]
+            candidate_count = sum(len(prefix) for prefix in prefixes)
+        else:
+            end = self._budget_end(None, budget)
+            candidate_count = end
+
+        if candidate_count <= DENSE_CANDIDATE_LIMIT:
+            rows = np.concatenate(prefixes) if stars else np.arange(end)
+            rows = self._top_candidates(rows, required, rooms, limit)
+        elif stars:
+            # 各星级分别扫描后合并
+            rows = np.concatenate([
+                self._scan_by_value(self.star_by_value[_STAR_CODES[star]], budget, required, rooms, limit)
+                for star in stars
+            ])
+            rows = rows[np.argsort(-self.value_score[rows], kind="stable")][:limit]
+        else:
+            rows = self._scan_by_value(self.by_value, budget, required, rooms, limit)
+        return self._materialize(rows)
+
+    def _top_candidates(self, rows: np.ndarray, required: int, rooms: int, limit: int) -> np.ndarray:
+        """过滤候选行后用 argpartition 取性价比最高的 limit 个"""
+        if required:
+            rows = rows[(self.facility_mask[rows] & required) == required]
+        rows = rows[self.available_rooms[rows] >= rooms]
+        scores = self.value_score[rows]
+        if len(rows) > limit:
+            selected = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[selected], scores[selected]
+        return rows[np.argsort(-scores, kind="stable")]
+
+    def _scan_by_value(self, order: np.ndarray, budget: float, required: int,
+                       rooms: int, limit: int) -> np.ndarray:
+        """沿性价比降序的行号分块扫描，凑够 limit 个即停止（块大小逐次翻倍）"""
+        found = []
+        count = 0
+        start, chunk = 0, SCAN_CHUNK
+        while start < len(order) and count < limit:
+            rows = order[start:start + chunk]
+            matched = self.available_rooms[rows] >= rooms
+            if budget > 0:
+                matched &= self.price[rows] <= budget
+            if required:
+                matched &= (self.facility_mask[rows] & required) == required
+            rows = rows[matched]
+            found.append(rows)
+            count += len(rows)
+            start += chunk
+            chunk *= 2
+        return np.concatenate(found)[:limit] if found else np.arange(0)
+
+    def _materialize(self, rows: np.ndarray) -> List[HotelRow]:
+        """按列批量取出返回的行并构造结果行（每列一次 tolist()，避免逐个读取 numpy 标量）"""
+        return [
+            HotelRow(
+                hotel_id=hotel_id,
+                name=name,
+                star_rating=STAR_RATINGS[star],
+                address=address,
+                city=self.city,
+                price_per_night=price,
+                available_rooms=available_rooms,
+                room_type=room_type,
+                facilities=[facility for facility, bit in _FACILITY_BITS.items() if mask & bit],
+                rating=rating,
+                reviews_count=reviews_count,
+                distance_to_center=distance
+            )
+            for hotel_id, name, star, address, price, available_rooms, room_type, mask, rating, reviews_count, distance
+            in zip(
+                self.hotel_id[rows].tolist(),
+                self.name[rows].tolist(),
+                self.star[rows].tolist(),
+                self.address[rows].tolist(),
+                self.price[rows].tolist(),
+                self.available_rooms[rows].tolist(),
+                self.room_type[rows].tolist(),
+                self.facility_mask[rows].tolist(),
+                self.rating[rows].tolist(),
+                self.reviews_count[rows].tolist(),
+                self.distance[rows].tolist()
+            )
+        ]
+
+    @classmethod
+    def synthetic(cls, city: str, size: int, seed: Optional[int] = None) -> "CityHotelIndex":
+        """
+        生成合成酒店数据
+
+        Args:
+            city: 城市名称
+            size: 酒店数量
+            seed: 随机种子，默认由城市名称派生（同一城市每次生成相同数据）
+
+        Returns:
+            城市索引
+        """
+        rng = np.random.default_rng(zlib.crc32(city.encode("utf-8")) if seed is None else seed)
+        star = rng.integers(0, len(STAR_RATINGS), size)
+        ranges = np.array(_STAR_PRICE_RANGES)
+        price = rng.integers(ranges[star, 0], ranges[star, 1] + 1)
+
+        # 每家酒店随机 3-6 项设施
+        facility_count = rng.integers(3, 7, size)
+        priorities = rng.random((size, len(FACILITIES)))
+        ranks = np.argsort(np.argsort(priorities, axis=1), axis=1)
+        facility_mask = ((ranks < facility_count[:, None]) * (1 << np.arange(len(FACILITIES)))).sum(axis=1)
+
+        chains = np.array(SYNTHETIC_CHAINS, dtype=object)[rng.integers(0, len(SYNTHETIC_CHAINS), size)]
+        districts = np.array(SYNTHETIC_DISTRICTS, dtype=object)[rng.integers(0, len(SYNTHETIC_DISTRICTS), size)]
+        numbers = rng.integers(1, 1000, size).astype(str).astype(object)
+        prefix = f"HT{zlib.crc32(city.encode('utf-8')) % 10000:04d}"
+
+        return cls(
+            city=city,
+            hotel_id=np.char.add(prefix, np.char.zfill(np.arange(size).astype(str), 6)).astype(object),
+            name=city + chains + "酒店",
+            star_rating=np.array([s.value for s in STAR_RATINGS], dtype=object)[star],
+            address=f"{city}市" + districts + numbers + "号",
+            price_per_night=price,
+            available_rooms=rng.integers(0, 51, size),
+            room_type=np.array(SYNTHETIC_ROOM_TYPES, dtype=object)[rng.integers(0, len(SYNTHETIC_ROOM_TYPES), size)],
+            facility_mask=facility_mask,
+            rating=np.round(rng.uniform(4.0, 5.0, size), 1),
+            reviews_count=rng.integers(100, 5001, size),
+            distance_to_center=np.round(rng.uniform(0.5, 15.0, size), 1)
+        )
+
+
+class HotelInventory:
+    """全部城市的酒店索引"""
+
+    def __init__(self, cities: Optional[Dict[str, CityHotelIndex]] = None, synthetic_size: int = 0,
+                 synthetic_cache_size: int = 64):
+        """
+        初始化酒店库存
+
+        Args:
+            cities: 城市名称 -> 城市索引
+            synthetic_size: 未收录城市按需生成的合成酒店数量，0 表示不生成
+            synthetic_cache_size: 最多缓存的合成城市索引数，超出时淘汰最久未使用的
+        """
+        self.cities: Dict[str, CityHotelIndex] = dict(cities or {})
+        self.synthetic_size = synthetic_size
+        self.synthetic_cache_size = synthetic_cache_size
+        # 合成数据由城市名称确定，淘汰后再次访问会重新生成相同的数据；
+        # 与真实城市分开存放，任意用户输入的目的地不会无限占用内存
+        self._synthetic: "OrderedDict[str, CityHotelIndex]" = OrderedDict()
+
+    def get_city(self, city: str) -> Optional[CityHotelIndex]:
+        """获取城市索引，未收录的城市按需生成合成数据"""
+        index = self.cities.get(city)
+        if index is not None or not city or self.synthetic_size <= 0:
+            return index
+        index = self._synthetic.get(city)
+        if index is None:
+            index = CityHotelIndex.synthetic(city, self.synthetic_size)
+            self._synthetic[city] = index
+            while len(self._synthetic) > self.synthetic_cache_size:
+                self._synthetic.popitem(last=False)
+        self._synthetic.move_to_end(city)
+        return index
+
+    def rooms(self, hotel_id: str) -> Optional[int]:
+        """
+        查询酒店的可用房间数（库存登记用）
+
+        Args:
+            hotel_id: 酒店ID
+
+        Returns:
+            可用房间数，酒店不存在时返回 None
+        """
+        for index in [*self.cities.values(), *self._synthetic.values()]:
+            available = index.rooms(hotel_id)
+            if available is not None:
+                return available
+        return None
+
+    def search(self, city: str, budget: float = 0, preferences: Sequence[str] = (),
+               rooms: int = 1, limit: int = 5) -> List[HotelRow]:
+        """
+        查询酒店，参数见 CityHotelIndex.search
+
+        Returns:
+            酒店结果行列表，城市不存在时为空
+        """
+        index = self.get_city(city)
+        if index is None:
+            return []
+        return index.search(budget, preferences, rooms, limit)
+
+    @classmethod
+    def load_csv(cls, path: str, synthetic_size: int = 0, synthetic_cache_size: int = 64) -> "HotelInventory":
+        """
+        从 CSV 文件批量加载，列名见 CSV_FIELDS，设施以 | 分隔
+
+        Args:
+            path: 文件路径
+            synthetic_size: 未收录城市的合成酒店数量
+            synthetic_cache_size: 最多缓存的合成城市索引数
+
+        Returns:
+            酒店库存
+        """
+        grouped: Dict[str, Dict[str, list]] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                columns = grouped.setdefault(record["city"], {field: [] for field in CSV_FIELDS if field != "city"})
+                for field in columns:
+                    columns[field].append(record[field])
+
+        cities = {}
+        for city, columns in grouped.items():
+            facilities = columns.pop("facilities")
+            cities[city] = CityHotelIndex(
+                city=city,
+                facility_mask=[facilities_to_mask(value.split("|") if value else []) for value in facilities],
+                **columns
+            )
+        return cls(cities, synthetic_size, synthetic_cache_size)
+
+
+# ==================== 全局库存实例 ====================
+
+_hotel_inventory_instance: Optional[HotelInventory] = None
+
+
+def get_hotel_inventory() -> HotelInventory:
+    """获取酒店库存（单例模式），数据文件不存在时全部城市使用合成数据"""
+    global _hotel_inventory_instance
+    if _hotel_inventory_instance is None:
+        path = settings.HOTEL_INVENTORY_PATH
+        if path and os.path.exists(path):
+            _hotel_inventory_instance = HotelInventory.load_csv(
+                path, settings.HOTEL_SYNTHETIC_SIZE, settings.HOTEL_SYNTHETIC_CACHE_SIZE
+            )
+            logger.info(f"已加载酒店库存: {path}, {len(_hotel_inventory_instance.cities)} 个城市")
+        else:
+            _hotel_inventory_instance = HotelInventory(
+                synthetic_size=settings.HOTEL_SYNTHETIC_SIZE,
+                synthetic_cache_size=settings.HOTEL_SYNTHETIC_CACHE_SIZE
+            )
+    return _hotel_inventory_instance
@@ -0,0 +1,306 @@
+"""
+库存预占
+职责：余票/余房的短时预占、确认与释放；扣减基于数据库乐观版本号，过期预占由后台任务回收
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from config import settings
+from database import InventoryDB, InventoryHoldDB, async_session_maker
+from models import HoldStatus, InventoryHold
+
+
+class _VersionConflict(Exception):
+    """库存版本号已被其他进程修改"""
+
+
+class _ProductQueue:
+    """单个产品的待处理预占请求"""
+
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # (数量, 结果 Future)
+        self.pending: List[Tuple[int, asyncio.Future]] = []
+
+
+class ReservationManager:
+    """
+    库存预占管理器
+
+    同一产品的并发预占在进程内排队：拿到产品锁的请求把当时排队的全部请求合并成一个事务处理，
+    按到达顺序分配余量，只做一次带版本号的扣减。多进程部署时版本号冲突会重新读取后重试。
+    """
+
+    def __init__(self, session_maker: Optional[async_sessionmaker] = None,
+                 hold_ttl: Optional[int] = None):
+        """
+        初始化预占管理器
+
+        Args:
+            session_maker: 数据库会话工厂，默认使用全局会话工厂
+            hold_ttl: 预占保留秒数，默认取配置
+        """
+        self.session_maker = session_maker or async_session_maker
+        self.hold_ttl = hold_ttl if hold_ttl is not None else settings.RESERVATION_HOLD_TTL
+        self._queues: Dict[str, _ProductQueue] = {}
+        self._stats = {"holds": 0, "rejected": 0, "batches": 0, "conflicts": 0, "expired": 0}
+
+    def stats(self) -> Dict[str, int]:
+        """返回统计信息"""
+        return dict(self._stats)
+
+    async def register_product(self, product_id: str, product_type: str, capacity: int):
+        """
+        登记产品库存（已登记时不覆盖当前余量）
+
+        Args:
+            product_id: 产品ID
+            product_type: 产品类型
+            capacity: 可售数量
+        """
+        statement = insert(InventoryDB).values(
+            product_id=product_id,
+            product_type=product_type,
+            capacity=capacity,
+            available=capacity,
+            version=0
+        ).on_conflict_do_nothing(index_elements=["product_id"])
+        async with self.session_maker() as session:
+            async with session.begin():
+                await session.execute(statement)
+
+    async def available(self, product_id: str) -> Optional[int]:
+        """查询产品当前余量，未登记时返回 None"""
+        async with self.session_maker() as session:
+            return await session.scalar(
+                select(InventoryDB.available).where(InventoryDB.product_id == product_id)
+            )
+
+    async def hold(self, product_id: str, quantity: int = 1) -> Optional[InventoryHold]:
+        """
+        预占库存
+
+        Args:
+            product_id: 产品ID
+            quantity: 数量
+
+        Returns:
+            预占记录；余量不足时返回 None
+
+        Raises:
+            LookupError: 产品未登记库存
+        """
+        if quantity <= 0:
+            raise ValueError(f"预占数量必须为正数: {quantity}")
+
+        queue = self._queues.setdefault(product_id, _ProductQueue())
+        future = asyncio.get_running_loop().create_future()
+        queue.pending.append((quantity, future))
+
+        async with queue.lock:
+            # 排队期间可能已被前一个持锁者合并处理
+            if not future.done():
+                batch, queue.pending = queue.pending, []
+                try:
+                    await self._hold_batch(product_id, batch)
+                except Exception as e:
+                    for _, waiter in batch:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+        if not queue.pending and not queue.lock.locked():
+            self._queues.pop(product_id, None)
+        return await future
+
+    async def _hold_batch(self, product_id: str, batch: List[Tuple[int, asyncio.Future]]):
+        """在一个事务内按到达顺序为一批请求分配库存"""
+        self._stats["batches"] += 1
+        for _ in range(settings.RESERVATION_CAS_RETRIES):
+            holds = []
+            try:
+                async with self.session_maker() as session, session.begin():
+                    row = (await session.execute(
+                        select(InventoryDB.available, InventoryDB.version)
+                        .where(InventoryDB.product_id == product_id)
+                    )).one_or_none()
+                    if row is None:
+                        raise LookupError(f"产品未登记库存: {product_id}")
+
+                    remaining = row.available
+                    granted = []
+                    for quantity, future in batch:
+                        if quantity <= remaining:
+                            remaining -= quantity
+                            granted.append((quantity, future))
+
+                    if granted:
+                        result = await session.execute(
+                            update(InventoryDB)
+                            .where(InventoryDB.product_id == product_id,
+                                   InventoryDB.version == row.version)
+                            .values(available=remaining, version=row.version + 1,
+                                    updated_at=datetime.now())
+                        )
+                        if result.rowcount != 1:
+                            raise _VersionConflict()
+
+                        expires_at = datetime.now() + timedelta(seconds=self.hold_ttl)
+                        for quantity, future in granted:
+                            hold = InventoryHold(
+                                hold_id=f"HLD{uuid.uuid4().hex[:16].upper()}",
+                                product_id=product_id,
+                                quantity=quantity,
+                                expires_at=expires_at
+                            )
+                            session.add(InventoryHoldDB(
+                                hold_id=hold.hold_id,
+                                product_id=product_id,
+                                quantity=quantity,
+                                status=HoldStatus.HELD.value,
+                                expires_at=expires_at
+                            ))
+                            holds.append((future, hold))
+            except _VersionConflict:
+                # 其他进程已修改库存，事务回滚后按新版本重试
+                self._stats["conflicts"] += 1
+                continue
+
+            # 事务提交成功后再通知等待者
+            for future, hold in holds:
+                # 等待者已被取消时预占保留到过期后由回收任务归还
+                if not future.done():
+                    future.set_result(hold)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+            self._stats["holds"] += len(holds)
+            self._stats["rejected"] += len(batch) - len(holds)
+            return
+
+        raise RuntimeError(f"库存版本冲突重试次数过多: {product_id}")
+
+    async def commit(self, hold_id: str) -> bool:
+        """
+        确认预占（订单确认时调用）
+
+        Args:
+            hold_id: 预占ID
+
+        Returns:
+            是否确认成功；预占已过期或已释放时返回 False
+        """
+        async with self.session_maker() as session:
+            async with session.begin():
+                result = await session.execute(
+                    update(InventoryHoldDB)
+                    .where(InventoryHoldDB.hold_id == hold_id,
+                           InventoryHoldDB.status == HoldStatus.HELD.value,
+                           InventoryHoldDB.expires_at > datetime.now())
+                    .values(status=HoldStatus.COMMITTED.value, updated_at=datetime.now())
+                )
+                return result.rowcount == 1
+
+    async def release(self, hold_id: str) -> bool:
+        """
+        释放预占并归还库存（订单取消时调用）
+
+        Args:
+            hold_id: 预占ID
+
+        Returns:
+            是否释放成功；预占不存在或已释放时返回 False
+        """
+        async with self.session_maker() as session:
+            async with session.begin():
+                return await self._release(
+                    session, hold_id, (HoldStatus.HELD, HoldStatus.COMMITTED), HoldStatus.RELEASED
+                )
+
+    async def _release(self, session: AsyncSession, hold_id: str,
+                       from_status: Tuple[HoldStatus, ...], to_status: HoldStatus) -> bool:
+        """在当前事务内变更预占状态并归还库存（状态条件保证同一预占只归还一次）"""
+        hold = (await session.execute(
+            select(InventoryHoldDB.product_id, InventoryHoldDB.quantity)
+            .where(InventoryHoldDB.hold_id == hold_id)
+        )).one_or_none()
+        if hold is None:
+            return False
+
+        result = await session.execute(
+            update(InventoryHoldDB)
+            .where(InventoryHoldDB.hold_id == hold_id,
+                   InventoryHoldDB.status.in_([status.value for status in from_status]))
+            .values(status=to_status.value, updated_at=datetime.now())
+        )
+        if result.rowcount != 1:
+            return False
+
+        await session.execute(
+            update(InventoryDB)
+            .where(InventoryDB.product_id == hold.product_id)
+            .values(available=InventoryDB.available + hold.quantity,
+                    version=InventoryDB.version + 1,
+                    updated_at=datetime.now())
+        )
+        return True
+
+    async def expire_holds(self, limit: int = 500) -> int:
+        """
+        回收已过期的预占
+
+        Args:
+            limit: 单次最多回收的数量
+
+        Returns:
+            回收数量
+        """
+        async with self.session_maker() as session:
+            async with session.begin():
+                hold_ids = (await session.scalars(
+                    select(InventoryHoldDB.hold_id)
+                    .where(InventoryHoldDB.status == HoldStatus.HELD.value,
+                           InventoryHoldDB.expires_at <= datetime.now())
+                    .limit(limit)
+                )).all()
+                expired = 0
+                for hold_id in hold_ids:
+                    if await self._release(session, hold_id, (HoldStatus.HELD,), HoldStatus.EXPIRED):
+                        expired += 1
+        if expired:
+            self._stats["expired"] += expired
+            logger.info(f"回收过期库存预占: {expired} 个")
+        return expired
+
+    async def run_reaper(self, interval: Optional[float] = None):
+        """
+        后台回收任务，取消任务即停止
+
+        Args:
+            interval: 回收间隔（秒），默认取配置
+        """
+        interval = interval or settings.RESERVATION_REAPER_INTERVAL
+        while True:
+            try:
+                await self.expire_holds()
+            except Exception as e:
+                logger.error(f"回收过期库存预占失败: {str(e)}")
+            await asyncio.sleep(interval)
+
+
+# ==================== 全局预占管理器实例 ====================
+
+_reservation_instance: Optional[ReservationManager] = None
+
+
+def get_reservation_manager() -> ReservationManager:
+    """获取库存预占管理器实例（单例模式）"""
+    global _reservation_instance
+    if _reservation_instance is None:
+        _reservation_instance = ReservationManager()
+    return _reservation_instance
@@ -0,0 +1,89 @@
+"""
+检索结果行
+职责：库存检索、过滤、排序和个性化阶段使用的轻量结果行（__slots__，不做校验），组装接口结果时才导出为模型或字典
+"""
+from datetime import datetime
+from typing import Any, ClassVar, Dict, Iterable, List, Type
+from pydantic import BaseModel
+from models import CabinClass, Flight, Hotel, HotelStarRating
+
+
+class ResultRow:
+    """
+    结果行基类
+
+    库存数据由我们自己生成或加载时已校验，检索结果无需逐行校验；
+    字段与对应模型一致，to_model() 通过 model_construct 直接构造模型，
+    to_dict() 直接生成与 model_dump() 相同的字典（智能体结果只需要字典，省去构造和导出模型两步）。
+    """
+    __slots__ = ()
+    model: ClassVar[Type[BaseModel]]
+
+    def to_model(self) -> BaseModel:
+        """转换为接口模型（不校验）"""
+        return self.model.model_construct(**self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出为与 model_dump() 结果相同的字典"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class FlightRow(ResultRow):
+    """航班结果行，字段同 Flight"""
+    __slots__ = tuple(Flight.model_fields)
+    model = Flight
+
+    def __init__(self, flight_id: str, airline: str, flight_number: str,
+                 departure_city: str, arrival_city: str, departure_airport: str, arrival_airport: str,
+                 departure_time: datetime, arrival_time: datetime, duration: str,
+                 cabin_class: CabinClass, price: float, available_seats: int, stops: int = 0):
+        self.flight_id = flight_id
+        self.airline = airline
+        self.flight_number = flight_number
+        self.departure_city = departure_city
+        self.arrival_city = arrival_city
+        self.departure_airport = departure_airport
+        self.arrival_airport = arrival_airport
+        self.departure_time = departure_time
+        self.arrival_time = arrival_time
+        self.duration = duration
+        self.cabin_class = cabin_class
+        self.price = price
+        self.available_seats = available_seats
+        self.stops = stops
+
+
+class HotelRow(ResultRow):
+    """酒店结果行，字段同 Hotel"""
+    __slots__ = tuple(Hotel.model_fields)
+    model = Hotel
+
+    def __init__(self, hotel_id: str, name: str, star_rating: HotelStarRating, address: str,
+                 city: str, price_per_night: float, available_rooms: int, room_type: str,
+                 facilities: List[str], rating: float, reviews_count: int, distance_to_center: float):
+        self.hotel_id = hotel_id
+        self.name = name
+        self.star_rating = star_rating
+        self.address = address
+        self.city = city
+        self.price_per_night = price_per_night
+        self.available_rooms = available_rooms
+        self.room_type = room_type
+        self.facilities = facilities
+        self.rating = rating
+        self.reviews_count = reviews_count
+        self.distance_to_center = distance_to_center
+
+
+def to_models(rows: Iterable[ResultRow]) -> List[BaseModel]:
+    """批量转换为接口模型"""
+    return [row.to_model() for row in rows]
+
+
+def to_dicts(rows: Iterable[ResultRow]) -> List[Dict[str, Any]]:
+    """批量导出为字典"""
+    return [row.to_dict() for row in rows]
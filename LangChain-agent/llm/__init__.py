@@ -0,0 +1,27 @@
+"""
+LLM 调用基础设施模块
+"""
+from .cache import LLMCache, InMemoryLRUCache, get_llm_cache, make_cache_key, llm_signature
+from .single_flight import SingleFlight, get_single_flight
+from .limiter import (
+    LLMOverloadedError,
+    LLMAdmissionController,
+    get_admission_controller,
+    get_admission_controllers
+)
+from .usage import prompt_usage
+
+__all__ = [
+    "LLMCache",
+    "InMemoryLRUCache",
+    "get_llm_cache",
+    "make_cache_key",
+    "llm_signature",
+    "SingleFlight",
+    "get_single_flight",
+    "LLMOverloadedError",
+    "LLMAdmissionController",
+    "get_admission_controller",
+    "get_admission_controllers",
+    "prompt_usage",
+]
@@ -0,0 +1,179 @@
+"""
+LLM 响应缓存
+职责：对格式化后完全相同的提示词复用历史响应，按 LRU + TTL 淘汰
+"""
+import hashlib
+import json
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from config import settings
+
+
+def llm_signature(llm: BaseChatModel) -> Tuple[str, Any, Any]:
+    """
+    提取影响输出的模型参数
+
+    Args:
+        llm: 语言模型
+
+    Returns:
+        (模型名称, temperature, max_tokens)
+    """
+    model_kwargs = getattr(llm, "model_kwargs", None) or {}
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or settings.LLM_MODEL
+    temperature = getattr(llm, "temperature", None)
+    if temperature is None:
+        temperature = model_kwargs.get("temperature")
+    max_tokens = getattr(llm, "max_tokens", None)
+    if max_tokens is None:
+        max_tokens = model_kwargs.get("max_tokens")
+    return model, temperature, max_tokens
+
+
+def make_cache_key(messages: Sequence[BaseMessage], model: str,
+                   temperature: Any, max_tokens: Any) -> str:
+    """
+    生成缓存键
+
+    Args:
+        messages: 格式化后的消息列表
+        model: 模型名称
+        temperature: 采样温度
+        max_tokens: 最大生成长度
+
+    Returns:
+        SHA-256 十六进制摘要
+    """
+    payload = json.dumps(
+        {
+            "messages": [[m.type, m.content] for m in messages],
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache(ABC):
+    """LLM 响应缓存接口"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期返回 None"""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """写入缓存，ttl 为存活秒数"""
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """返回命中率等统计信息"""
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """清空缓存"""
+        pass
+
+
+class InMemoryLRUCache(LLMCache):
+    """进程内 LRU 缓存，按占用字节数限制容量"""
+
+    def __init__(self, max_bytes: int):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 缓存占用内存上限（字节）
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value, size = entry
+        if expires_at <= time.monotonic():
+            self._remove(key, size)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        if ttl <= 0:
+            return
+
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+
+        self._entries[key] = (time.monotonic() + ttl, value, size)
+        self._bytes += size
+
+        # 超出容量时从最久未使用的一端淘汰
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str, size: int):
+        """删除单个条目"""
+        del self._entries[key]
+        self._bytes -= size
+
+
+# ==================== 全局缓存实例 ====================
+
+_llm_cache_instance: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    """获取LLM响应缓存实例（单例模式）"""
+    global _llm_cache_instance
+    if _llm_cache_instance is None:
+        _llm_cache_instance = InMemoryLRUCache(max_bytes=settings.LLM_CACHE_MAX_BYTES)
+    return _llm_cache_instance
@@ -0,0 +1,214 @@
+"""
+离线模拟 LLM
+职责：按各智能体的系统提示词返回确定性的模拟响应，并模拟可配置的调用延迟和服务端前缀缓存用量，用于离线压测和调试
+"""
+import asyncio
+import json
+import math
+import random
+import re
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+from agents.intent_classifier import extract_slots
+from agents.prompt_budget import estimate_tokens
+from models import IntentType
+
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "lognormal")
+
+# 意图关键词，按优先级匹配
+INTENT_KEYWORDS = [
+    (IntentType.PRICE_COMPARE, ("比价", "价格对比", "比较价格", "哪个平台")),
+    (IntentType.BOOKING, ("预订", "预定", "下单", "订购")),
+    (IntentType.ITINERARY, ("行程", "规划", "攻略")),
+    (IntentType.FLIGHT, ("机票", "航班", "飞机")),
+    (IntentType.HOTEL, ("酒店", "住宿", "民宿")),
+    (IntentType.ATTRACTION, ("景点", "好玩", "游玩")),
+]
+
+# 系统提示词特征 -> 建议类响应
+ADVICE_RESPONSES = [
+    ("机票查询助手", "推荐选择上午出发的经济舱航班，价格适中且时间充裕；如行程确定，建议尽早预订。"),
+    ("酒店推荐助手", "推荐选择交通便利、评分较高的四星级酒店，性价比最好；旺季请提前预订。"),
+    ("景点推荐助手", "以上景点兼顾历史文化与自然风光，建议按区域集中游览，热门景点提前预约门票。"),
+    ("价格分析助手", "当前最低价平台优势明显，价格处于合理区间，建议直接在最低价平台购买。"),
+    ("预订助手", "您的订单已创建，请在30分钟内完成支付，出行前请携带有效证件。"),
+    ("客服助手", "您好，已收到您的问题。订单可在出行前24小时免费取消，退款将在3-5个工作日原路返回。"),
+]
+DEFAULT_RESPONSE = "好的，已为您处理。"
+
+_DAYS_PARAM = re.compile(r"天数:\s*(\d+)")
+
+
+class FakeTravelLLM(BaseChatModel):
+    """按智能体提示词返回模拟响应的聊天模型"""
+
+    latency_distribution: str = "constant"
+    """延迟分布：constant / uniform / lognormal"""
+    latency_mean: float = 0.0
+    """平均延迟（秒）"""
+    latency_spread: float = 0.0
+    """uniform 为均值两侧的浮动范围（秒），lognormal 为对数标准差"""
+    stream_chunk_size: int = 8
+    """流式输出时每个分片的字符数"""
+    seed: Optional[int] = 0
+    """延迟采样的随机种子"""
+
+    _rng: random.Random = PrivateAttr(default=None)
+    _calls: int = PrivateAttr(default=0)
+    _seen_prefixes: set = PrivateAttr(default_factory=set)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"未知的延迟分布: {self.latency_distribution}")
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-travel"
+
+    @property
+    def calls(self) -> int:
+        """已处理的调用次数"""
+        return self._calls
+
+    def sample_latency(self) -> float:
+        """按配置的分布采样一次调用延迟"""
+        if self.latency_mean <= 0:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            low = max(0.0, self.latency_mean - self.latency_spread)
+            return self._rng.uniform(low, self.latency_mean + self.latency_spread)
+        if self.latency_distribution == "lognormal":
+            # 取 mu 使分布均值等于 latency_mean
+            sigma = self.latency_spread
+            mu = math.log(self.latency_mean) - sigma * sigma / 2
+            return self._rng.lognormvariate(mu, sigma)
+        return self.latency_mean
+
+    def respond(self, messages: List[BaseMessage]) -> str:
+        """
+        根据系统提示词生成模拟响应
+
+        Args:
+            messages: 对话消息
+
+        Returns:
+            响应文本
+        """
+        system = messages[0].content if messages else ""
+        user = messages[-1].content if messages else ""
+
+        if "意图识别" in system:
+            return json.dumps(self._fake_intent(user), ensure_ascii=False)
+        if "行程规划师" in system:
+            return json.dumps(self._fake_itinerary(user), ensure_ascii=False)
+        for marker, text in ADVICE_RESPONSES:
+            if marker in system:
+                return text
+        return DEFAULT_RESPONSE
+
+    def _fake_intent(self, user: str) -> Dict[str, Any]:
+        """按关键词和规则抽取构造意图 JSON"""
+        query = user.rsplit("用户查询：", 1)[-1]
+        intent_type = IntentType.CUSTOMER_SERVICE
+        for candidate, keywords in INTENT_KEYWORDS:
+            if any(keyword in query for keyword in keywords):
+                intent_type = candidate
+                break
+
+        slots = extract_slots(query)
+        if intent_type == IntentType.FLIGHT:
+            slots.setdefault("departure", "上海")
+            slots.setdefault("destination", "北京")
+            slots.setdefault("departure_date", date.today() + timedelta(days=1))
+        elif intent_type != IntentType.CUSTOMER_SERVICE:
+            slots.setdefault("destination", "北京")
+
+        intent = {"intent_type": intent_type.value}
+        for key, value in slots.items():
+            intent[key] = value.isoformat() if isinstance(value, date) else value
+        return intent
+
+    def _fake_itinerary(self, user: str) -> Dict[str, Any]:
+        """按提示词中的天数构造行程 JSON"""
+        match = _DAYS_PARAM.search(user)
+        days = int(match.group(1)) if match else 3
+        return {
+            "days": [
+                {
+                    "day": day,
+                    "morning": ["早餐后前往景点游览"],
+                    "afternoon": ["继续游览周边景点"],
+                    "evening": ["品尝当地特色美食"],
+                    "accommodation": "市中心酒店",
+                    "transportation": "地铁",
+                    "estimated_cost": 600.0
+                }
+                for day in range(1, days + 1)
+            ],
+            "summary": f"{days}天行程，节奏适中，兼顾经典景点与美食体验。"
+        }
+
+    def usage(self, messages: List[BaseMessage], text: str) -> Dict[str, Any]:
+        """
+        模拟服务端返回的用量：除最后一条用户消息外的前缀出现过时，按已缓存计
+
+        Args:
+            messages: 对话消息
+            text: 响应文本
+
+        Returns:
+            与 DashScope 相同结构的 token_usage
+        """
+        prefix = "".join(str(message.content) for message in messages[:-1])
+        input_tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+        cached_tokens = estimate_tokens(prefix) if prefix in self._seen_prefixes else 0
+        self._seen_prefixes.add(prefix)
+        output_tokens = estimate_tokens(text)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        self._calls += 1
+        text = self.respond(messages)
+        message = AIMessage(content=text, response_metadata={"token_usage": self.usage(messages, text)})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                         **kwargs: Any) -> ChatResult:
+        latency = self.sample_latency()
+        if latency:
+            await asyncio.sleep(latency)
+        return self._generate(messages, stop)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self._calls += 1
+        text = self.respond(messages)
+        size = max(1, self.stream_chunk_size)
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+        # 延迟均摊到各分片上
+        latency = self.sample_latency()
+        for index, chunk in enumerate(chunks):
+            if latency:
+                await asyncio.sleep(latency / len(chunks))
+            else:
+                await asyncio.sleep(0)
+            # 与 DashScope 一致，用量只在最后一个分片中返回
+            metadata = {"token_usage": self.usage(messages, text)} if index == len(chunks) - 1 else {}
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk, response_metadata=metadata))
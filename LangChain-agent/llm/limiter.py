@@ -0,0 +1,238 @@
+"""
+LLM 出站流量控制
+职责：按模型对 LLM 请求做准入控制——令牌桶限速、AIMD 自适应并发窗口、有界等待队列
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+from config import settings
+
+
+class LLMOverloadedError(Exception):
+    """LLM 请求被限流器拒绝（队列已满或排队超时）"""
+    pass
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """判断异常是否为服务端限流（HTTP 429 / Throttling）"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error)
+    return "429" in message or "Throttling" in message or "rate limit" in message.lower()
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数，<=0 表示不限速
+            burst: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """取得一个令牌，不足时按先来后到等待"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 自适应并发窗口 + 有界等待队列"""
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int,
+                 latency_target: float, backoff: float,
+                 max_queue: int, queue_timeout: float):
+        """
+        初始化并发限制器
+
+        Args:
+            initial: 初始并发窗口
+            min_limit: 窗口下限
+            max_limit: 窗口上限
+            latency_target: 目标延迟（秒），超过即视为拥塞
+            backoff: 拥塞或限流时窗口的乘性缩减系数
+            max_queue: 等待队列长度上限，超出直接拒绝
+            queue_timeout: 排队超时（秒）
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        """占用一个并发名额，必要时排队等待"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise LLMOverloadedError("LLM请求队列已满")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # 名额已移交给本请求，需要归还
+                self.release()
+            else:
+                future.cancel()
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed += 1
+                raise LLMOverloadedError("LLM请求排队超时") from e
+            raise
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False):
+        """
+        归还名额并根据本次结果调整窗口
+
+        Args:
+            latency: 本次请求耗时，None 表示不参与窗口调整
+            throttled: 是否被服务端限流
+        """
+        if throttled or (latency is not None and latency > self.latency_target):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif latency is not None:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+
+class LLMAdmissionController:
+    """单个模型的准入控制器"""
+
+    def __init__(self, model: str):
+        """
+        初始化准入控制器
+
+        Args:
+            model: 模型名称
+        """
+        self.model = model
+        self.bucket = TokenBucket(settings.LLM_RATE_LIMIT_QPS, settings.LLM_RATE_LIMIT_BURST)
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial=settings.LLM_CONCURRENCY_INITIAL,
+            min_limit=settings.LLM_CONCURRENCY_MIN,
+            max_limit=settings.LLM_CONCURRENCY_MAX,
+            latency_target=settings.LLM_LATENCY_TARGET,
+            backoff=settings.LLM_LIMIT_BACKOFF,
+            max_queue=settings.LLM_QUEUE_MAX,
+            queue_timeout=settings.LLM_QUEUE_TIMEOUT
+        )
+        self.admitted = 0
+        self.throttled = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """在准入名额内执行一次请求（含流式请求）"""
+        enqueued_at = time.monotonic()
+        await self.limiter.acquire()
+        latency = None
+        throttled = False
+        try:
+            await self.bucket.acquire()
+            waited = time.monotonic() - enqueued_at
+            self.admitted += 1
+            self.queue_wait_total += waited
+            self.queue_wait_max = max(self.queue_wait_max, waited)
+
+            started_at = time.monotonic()
+            try:
+                yield
+                latency = time.monotonic() - started_at
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                if throttled:
+                    self.throttled += 1
+                raise
+        finally:
+            self.limiter.release(latency, throttled)
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        在准入名额内执行一次调用
+
+        Args:
+            fn: 实际执行调用的协程函数
+
+        Returns:
+            调用结果
+        """
+        async with self.slot():
+            return await fn()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回准入统计"""
+        return {
+            "model": self.model,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "queued": self.limiter.queued,
+            "admitted": self.admitted,
+            "shed": self.limiter.shed,
+            "throttled": self.throttled,
+            "queue_wait_avg": round(self.queue_wait_total / self.admitted, 4) if self.admitted else 0.0,
+            "queue_wait_max": round(self.queue_wait_max, 4),
+        }
+
+
+# ==================== 全局准入控制器 ====================
+
+_admission_controllers: Dict[str, LLMAdmissionController] = {}
+
+
+def get_admission_controller(model: str) -> LLMAdmissionController:
+    """获取指定模型的准入控制器（每个模型一个实例）"""
+    controller = _admission_controllers.get(model)
+    if controller is None:
+        controller = LLMAdmissionController(model)
+        _admission_controllers[model] = controller
+    return controller
+
+
+def get_admission_controllers() -> Dict[str, LLMAdmissionController]:
+    """获取所有已创建的准入控制器"""
+    return dict(_admission_controllers)
@@ -0,0 +1,70 @@
+"""
+LLM 请求合并
+职责：相同提示词的并发调用只向模型发出一次请求，其余调用方等待同一结果
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SingleFlight:
+    """按键合并进行中的异步调用"""
+
+    def __init__(self):
+        """初始化合并器"""
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入一次调用
+
+        Args:
+            key: 合并键，相同键的并发调用共享结果
+            fn: 实际执行调用的协程函数
+
+        Returns:
+            调用结果（异常同样会传递给所有等待方）
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            # 以独立任务执行，发起方被取消时不影响其他等待方
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        """调用结束后移除记录"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有等待方都已取消时避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回合并统计"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._inflight),
+        }
+
+
+# ==================== 全局合并器实例 ====================
+
+_single_flight_instance: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """获取LLM请求合并器实例（单例模式）"""
+    global _single_flight_instance
+    if _single_flight_instance is None:
+        _single_flight_instance = SingleFlight()
+    return _single_flight_instance
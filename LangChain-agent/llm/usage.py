@@ -0,0 +1,32 @@
+"""
+模型用量解析
+职责：从模型响应中读取服务端返回的输入 token 数和命中前缀缓存的 token 数
+"""
+from typing import Any, Dict, Optional, Tuple
+
+
+def _token_usage(message: Any) -> Dict[str, Any]:
+    """取响应元数据中的用量字段（DashScope 为 token_usage，OpenAI 兼容接口为 token_usage 或 usage）"""
+    metadata = getattr(message, "response_metadata", None) or {}
+    return metadata.get("token_usage") or metadata.get("usage") or {}
+
+
+def prompt_usage(message: Any) -> Optional[Tuple[int, int]]:
+    """
+    读取一次调用的输入用量
+
+    DashScope 返回 input_tokens，OpenAI 兼容接口返回 prompt_tokens；
+    两者命中前缀缓存的部分都在 prompt_tokens_details.cached_tokens 中，未返回时视为 0。
+
+    Args:
+        message: 模型返回的消息（流式调用为携带用量的最后一个分片）
+
+    Returns:
+        (输入 token 数, 命中缓存的 token 数)，响应中没有用量信息时返回 None
+    """
+    usage = _token_usage(message)
+    prompt_tokens = usage.get("input_tokens", usage.get("prompt_tokens"))
+    if prompt_tokens is None:
+        return None
+    details = usage.get("prompt_tokens_details") or {}
+    return int(prompt_tokens), int(details.get("cached_tokens") or 0)
@@ -1,16 +1,27 @@
 """
 FastAPI 主应用
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Match
 from contextlib import asynccontextmanager
 from loguru import logger
+from typing import Any, Dict, Iterable, List, Tuple
+import asyncio
 import sys
 
 from config import settings
-from database import init_database
-from models import TravelRequest, FinalResponse
+from database import init_database, close_database, get_group_commit_writer
+from models import TravelRequest, FinalResponse, UserPreference
 from workflow import get_workflow
+from registry import get_registry
+from llm import get_llm_cache, get_single_flight, get_admission_controllers
+from inventory import get_attraction_catalog, reload_attraction_catalog, get_reservation_manager
+from metrics import Gauge, Metric, HTTP_IN_FLIGHT, get_metrics_registry
+from search_history import get_search_history_recorder
+from preference_cache import get_preference_cache
+from responses import FastJSONResponse, dumps
 
 # 配置日志
 logger.remove()
@@ -35,14 +46,32 @@ async def lifespan(app: FastAPI):
     logger.info("启动应用...")
     logger.info("初始化数据库...")
     await init_database()
+    logger.info("初始化智能体注册表...")
+    get_registry().warmup()
+    logger.info("加载景点目录...")
+    get_attraction_catalog()
     logger.info("初始化工作流...")
     get_workflow()
+    logger.info("启动搜索历史写入任务...")
+    get_search_history_recorder().start()
+    logger.info("启动库存预占回收任务...")
+    reaper = asyncio.create_task(get_reservation_manager().run_reaper())
     logger.info("应用启动完成！")
     
     yield
     
     # 关闭时执行
     logger.info("关闭应用...")
+    reaper.cancel()
+    try:
+        await reaper
+    except asyncio.CancelledError:
+        pass
+    logger.info("写入剩余的搜索历史...")
+    await get_search_history_recorder().close()
+    logger.info("提交剩余的数据库写入...")
+    await get_group_commit_writer().close()
+    await close_database()
 
 
 # 创建FastAPI应用
@@ -50,7 +79,8 @@ app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="基于LangChain、LangGraph和通义千问的多智能体旅行平台",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # 配置CORS
@@ -63,6 +93,83 @@ app.add_middleware(
 )
 
 
+
+def _route_template(request: Request) -> str:
+    """
+    请求匹配到的路由模板（如 /api/v1/users/{user_id}/preferences）
+
+    中间件在路由之前执行，这里按路由表自行匹配；用模板而不是原始路径作为指标标签，
+    避免每个用户 ID、每个不存在的路径各产生一个永不回收的时间序列。
+
+    Args:
+        request: 请求
+
+    Returns:
+        路由模板，没有匹配的路由时返回 "unmatched"
+    """
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+@app.middleware("http")
+async def track_in_flight(request: Request, call_next):
+    """统计正在处理的请求数（流式响应只统计到响应头发出为止）"""
+    with HTTP_IN_FLIGHT.track_inprogress(path=_route_template(request)):
+        return await call_next(request)
+
+
+# ==================== 运行指标 ====================
+
+def _stats_gauges(prefix: str, description: str,
+                  rows: Iterable[Tuple[Dict[str, str], Dict[str, Any]]]) -> List[Metric]:
+    """
+    将组件统计字典转换为仪表指标（每个数值字段一个指标）
+
+    Args:
+        prefix: 指标名前缀
+        description: 指标说明
+        rows: (标签, 统计字典) 列表
+
+    Returns:
+        指标列表
+    """
+    gauges: Dict[str, Gauge] = {}
+    for labels, stats in rows:
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{prefix}_{key}"
+            if name not in gauges:
+                gauges[name] = Gauge(name, f"{description}: {key}", tuple(labels))
+            gauges[name].set(value, **labels)
+    return list(gauges.values())
+
+
+def collect_component_metrics() -> List[Metric]:
+    """导出LLM缓存、请求合并、准入控制、本地意图分类器、库存预占、批量写入、搜索历史和用户偏好缓存的统计快照"""
+    metrics = []
+    metrics += _stats_gauges("travel_llm_cache", "LLM响应缓存", [({}, get_llm_cache().stats())])
+    metrics += _stats_gauges("travel_llm_single_flight", "LLM请求合并", [({}, get_single_flight().stats())])
+    metrics += _stats_gauges("travel_llm_admission", "LLM准入控制", [
+        ({"model": model}, controller.stats())
+        for model, controller in get_admission_controllers().items()
+    ])
+    intent_agent = get_registry().get_agent("intent")
+    metrics += _stats_gauges("travel_intent_classifier", "本地意图分类器",
+                             [({}, intent_agent.classifier_stats.stats())])
+    metrics += _stats_gauges("travel_reservation", "库存预占", [({}, get_reservation_manager().stats())])
+    metrics += _stats_gauges("travel_group_commit", "批量提交写入", [({}, get_group_commit_writer().stats())])
+    metrics += _stats_gauges("travel_search_history", "搜索历史记录", [({}, get_search_history_recorder().stats())])
+    metrics += _stats_gauges("travel_user_preference_cache", "用户偏好缓存", [({}, get_preference_cache().stats())])
+    return metrics
+
+
+get_metrics_registry().register_collector(collect_component_metrics)
+
+
 # ==================== API 端点 ====================
 
 @app.get("/")
@@ -86,6 +193,15 @@ async def health_check():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 文本格式的运行指标"""
+    return PlainTextResponse(
+        get_metrics_registry().render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.post("/api/v1/travel/query")
 async def travel_query(request: TravelRequest):
     """
@@ -128,29 +244,57 @@ async def travel_query(request: TravelRequest):
         }
         
         logger.info("查询处理完成")
-        return response
+        return FastJSONResponse(response)
         
     except Exception as e:
         logger.error(f"查询处理失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def format_sse(event: str, data) -> str:
+    """编码一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
+@app.post("/api/v1/travel/query/stream")
+async def travel_query_stream(request: TravelRequest):
+    """
+    旅行查询接口（SSE 流式输出）
+    
+    事件类型：
+    - node: 某个工作流节点完成（意图解析、机票查询、酒店查询等）
+    - itinerary_day: 行程规划中某一天的行程已生成（结构同 ItineraryDay）
+    - token: LLM 建议的增量文本
+    - done: 完整结果，结构与 /api/v1/travel/query 的 results 一致
+    - error: 执行失败
+    """
+    logger.info(f"收到流式查询请求: {request.query}")
+    
+    workflow = get_workflow()
+    
+    async def event_stream():
+        async for event in workflow.astream(
+            query=request.query,
+            user_id=request.user_id or "guest",
+            session_id=request.session_id
+        ):
+            yield format_sse(event["event"], event["data"])
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/api/v1/travel/flight")
 async def query_flight(request: dict):
     """机票查询接口"""
     try:
-        from agents import FlightQueryAgent
-        from langchain_community.chat_models import ChatTongyi
-        
-        llm = ChatTongyi(
-            model_name=settings.LLM_MODEL,
-            dashscope_api_key=settings.DASHSCOPE_API_KEY
-        )
-        
-        agent = FlightQueryAgent(llm)
+        agent = get_registry().get_agent("flight")
         result = await agent.process(request)
         
-        return result
+        return FastJSONResponse(result)
         
     except Exception as e:
         logger.error(f"机票查询失败: {str(e)}")
@@ -161,18 +305,10 @@ async def query_flight(request: dict):
 async def query_hotel(request: dict):
     """酒店查询接口"""
     try:
-        from agents import HotelQueryAgent
-        from langchain_community.chat_models import ChatTongyi
-        
-        llm = ChatTongyi(
-            model_name=settings.LLM_MODEL,
-            dashscope_api_key=settings.DASHSCOPE_API_KEY
-        )
-        
-        agent = HotelQueryAgent(llm)
+        agent = get_registry().get_agent("hotel")
         result = await agent.process(request)
         
-        return result
+        return FastJSONResponse(result)
         
     except Exception as e:
         logger.error(f"酒店查询失败: {str(e)}")
@@ -183,40 +319,38 @@ async def query_hotel(request: dict):
 async def recommend_attraction(request: dict):
     """景点推荐接口"""
     try:
-        from agents import AttractionRecommendAgent
-        from langchain_community.chat_models import ChatTongyi
-        
-        llm = ChatTongyi(
-            model_name=settings.LLM_MODEL,
-            dashscope_api_key=settings.DASHSCOPE_API_KEY
-        )
-        
-        agent = AttractionRecommendAgent(llm)
+        agent = get_registry().get_agent("attraction")
         result = await agent.process(request)
         
-        return result
+        return FastJSONResponse(result)
         
     except Exception as e:
         logger.error(f"景点推荐失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/v1/travel/price/batch")
+async def compare_price_batch(request: dict):
+    """批量价格对比接口（products 为产品列表，整批只生成一次建议）"""
+    try:
+        agent = get_registry().get_agent("price")
+        result = await agent.process({**request, "products": request.get("products") or []})
+        
+        return FastJSONResponse(result)
+        
+    except Exception as e:
+        logger.error(f"批量价格对比失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/v1/travel/booking")
 async def handle_booking(request: dict):
     """预订处理接口"""
     try:
-        from agents import BookingAgent
-        from langchain_community.chat_models import ChatTongyi
-        
-        llm = ChatTongyi(
-            model_name=settings.LLM_MODEL,
-            dashscope_api_key=settings.DASHSCOPE_API_KEY
-        )
-        
-        agent = BookingAgent(llm)
+        agent = get_registry().get_agent("booking")
         result = await agent.process(request)
         
-        return result
+        return FastJSONResponse(result)
         
     except Exception as e:
         logger.error(f"预订处理失败: {str(e)}")
@@ -227,24 +361,56 @@ async def handle_booking(request: dict):
 async def customer_service(request: dict):
     """客服咨询接口"""
     try:
-        from agents import CustomerServiceAgent
-        from langchain_community.chat_models import ChatTongyi
-        
-        llm = ChatTongyi(
-            model_name=settings.LLM_MODEL,
-            dashscope_api_key=settings.DASHSCOPE_API_KEY
-        )
-        
-        agent = CustomerServiceAgent(llm)
+        agent = get_registry().get_agent("customer_service")
         result = await agent.process(request)
         
-        return result
+        return FastJSONResponse(result)
         
     except Exception as e:
         logger.error(f"客服咨询失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/v1/users/{user_id}/preferences")
+async def get_user_preferences(user_id: str):
+    """查询用户偏好"""
+    preference = await get_preference_cache().get(user_id)
+    return FastJSONResponse({
+        "success": True,
+        "data": preference
+    })
+
+
+@app.put("/api/v1/users/{user_id}/preferences")
+async def update_user_preferences(user_id: str, request: dict):
+    """更新用户偏好（写入后使缓存失效）"""
+    try:
+        preference = UserPreference(**{**request, "user_id": user_id})
+        await get_preference_cache().save(preference)
+        return FastJSONResponse({
+            "success": True,
+            "data": preference
+        })
+    except Exception as e:
+        logger.error(f"用户偏好更新失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/v1/admin/attractions/reload")
+async def reload_attractions():
+    """重新加载景点目录（在线程中构建，完成后整体替换）"""
+    try:
+        catalog = await asyncio.to_thread(reload_attraction_catalog)
+        return {
+            "success": True,
+            "attractions": len(catalog),
+            "cities": len(catalog.cities)
+        }
+    except Exception as e:
+        logger.error(f"景点目录加载失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,287 @@
+"""
+运行指标
+职责：进程内的计数器、仪表和直方图，以 Prometheus 文本格式导出
+"""
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# 当前请求的意图类型，供 LLM 调用指标打标签
+current_intent: ContextVar[str] = ContextVar("current_intent", default="unknown")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """格式化标签集合"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    """格式化样本值"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """指标基类"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        """
+        初始化指标
+
+        Args:
+            name: 指标名称
+            description: 指标说明
+            label_names: 标签名列表
+        """
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        """按标签名顺序取标签值"""
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> List[Sample]:
+        """返回全部样本"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """渲染为 Prometheus 文本行"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.metric_type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        super().__init__(name, description, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, dict(zip(self.label_names, key)), value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    """可增可减的仪表"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        super().__init__(name, description, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        """进入时加一，退出时减一"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, dict(zip(self.label_names, key)), value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    """固定分桶直方图"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> (各桶计数, 总和, 总数)
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = [[0] * len(self.buckets), 0.0, 0]
+            self._values[key] = entry
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            entry[0][index] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[Dict[str, str]]:
+        """
+        计时上下文，退出时记录耗时
+
+        Yields:
+            标签字典，可在上下文内修改（如根据结果设置 status）
+        """
+        labels = dict(labels)
+        started_at = time.perf_counter()
+        try:
+            yield labels
+        except BaseException:
+            # 取消（客户端断开、排队超时）和提前关闭的流式生成器也记为失败
+            labels["status"] = "error"
+            raise
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        for key, (counts, total, count) in self._values.items():
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_bucket", {**labels, "le": "+Inf"}, count))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], List[Metric]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        """注册指标，同名指标只保留第一个"""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, label_names))
+
+    def gauge(self, name: str, description: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, description, label_names))
+
+    def histogram(self, name: str, description: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, label_names, buckets))
+
+    def register_collector(self, collector: Callable[[], List[Metric]]):
+        """
+        注册采集函数，导出时调用以生成快照指标
+
+        Args:
+            collector: 返回指标列表的函数
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """渲染全部指标为 Prometheus 文本格式"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for metric in collector():
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ==================== 全局指标 ====================
+
+_registry_instance: Optional[MetricsRegistry] = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取指标注册表实例（单例模式）"""
+    global _registry_instance
+    if _registry_instance is None:
+        _registry_instance = MetricsRegistry()
+    return _registry_instance
+
+
+NODE_DURATION = get_metrics_registry().histogram(
+    "travel_workflow_node_duration_seconds",
+    "工作流节点耗时",
+    ("node", "intent", "status")
+)
+LLM_CALL_DURATION = get_metrics_registry().histogram(
+    "travel_llm_call_duration_seconds",
+    "智能体 LLM 调用耗时（含缓存命中与请求合并）",
+    ("agent", "intent", "status")
+)
+WORKFLOW_IN_FLIGHT = get_metrics_registry().gauge(
+    "travel_workflow_requests_in_flight",
+    "正在执行的工作流数量",
+    ("mode",)
+)
+HTTP_IN_FLIGHT = get_metrics_registry().gauge(
+    "travel_http_requests_in_flight",
+    "正在处理的 HTTP 请求数量",
+    ("path",)
+)
+PROMPT_TOKENS = get_metrics_registry().histogram(
+    "travel_llm_prompt_tokens",
+    "智能体单次 LLM 调用的提示词估算 token 数",
+    ("agent",),
+    buckets=(100, 200, 400, 800, 1600, 3200, 6400, 12800)
+)
+PROMPT_VARIABLE_TOKENS = get_metrics_registry().histogram(
+    "travel_prompt_variable_tokens",
+    "提示词模板变量的估算 token 数（预算控制后）",
+    ("agent", "variable"),
+    buckets=(25, 50, 100, 200, 400, 800, 1600, 3200)
+)
+PROMPT_ROWS_DROPPED = get_metrics_registry().counter(
+    "travel_prompt_rows_dropped_total",
+    "超出 token 预算而未写入提示词的列表条目数",
+    ("agent", "variable")
+)
+PROMPT_PREFIX_TOKENS = get_metrics_registry().gauge(
+    "travel_prompt_static_prefix_tokens",
+    "智能体提示词中各次调用逐字节相同的前缀估算 token 数（可命中服务端前缀缓存的部分）",
+    ("agent",)
+)
+LLM_USAGE_PROMPT_TOKENS = get_metrics_registry().counter(
+    "travel_llm_usage_prompt_tokens_total",
+    "模型服务返回的输入 token 数",
+    ("agent",)
+)
+LLM_USAGE_CACHED_TOKENS = get_metrics_registry().counter(
+    "travel_llm_usage_cached_tokens_total",
+    "模型服务返回的命中前缀缓存的输入 token 数",
+    ("agent",)
+)
@@ -43,6 +43,21 @@ class OrderStatus(str, Enum):
     COMPLETED = "completed"
 
 
+class HoldStatus(str, Enum):
+    """库存预占状态"""
+    HELD = "held"  # 已预占，等待确认
+    COMMITTED = "committed"  # 已确认
+    RELEASED = "released"  # 已释放（取消）
+    EXPIRED = "expired"  # 超时释放
+
+
+class AgentExecutionMode(str, Enum):
+    """智能体执行模式"""
+    FULL = "full"  # 完整执行，包含LLM建议
+    DEFERRED = "deferred"  # 只返回结构化结果和建议的提示词参数，由调用方流式生成建议
+    DATA_ONLY = "data_only"  # 只返回结构化结果，不生成建议（结果交由下游规划器使用）
+
+
 # ==================== 请求模型 ====================
 
 class TravelRequest(BaseModel):
@@ -134,6 +149,8 @@ class Attraction(BaseModel):
     rating: float = Field(..., description="评分")
     visit_duration: str = Field(..., description="建议游玩时长")
     tags: List[str] = Field(default_factory=list, description="标签")
+    latitude: Optional[float] = Field(None, description="纬度")
+    longitude: Optional[float] = Field(None, description="经度")
 
 
 class AttractionRecommendation(BaseModel):
@@ -182,6 +199,19 @@ class PriceComparison(BaseModel):
     price_difference: float = Field(0.0, description="价格差")
 
 
+class BatchPriceComparison(BaseModel):
+    """批量价格对比"""
+    product_type: str = Field(..., description="产品类型")
+    platforms: List[str] = Field(default_factory=list, description="对比平台")
+    items: List[PriceComparison] = Field(default_factory=list, description="各产品价格对比")
+    total_count: int = Field(0, description="产品数量")
+    lowest_price: float = Field(..., description="全部产品中的最低价格")
+    lowest_product_id: str = Field(..., description="最低价产品ID")
+    lowest_platform: str = Field(..., description="最低价平台")
+    max_price_difference: float = Field(0.0, description="单个产品的最大平台价格差")
+    platform_wins: Dict[str, int] = Field(default_factory=dict, description="各平台提供最低价的产品数")
+
+
 # ==================== 订单相关 ====================
 
 class Order(BaseModel):
@@ -196,6 +226,28 @@ class Order(BaseModel):
     status: OrderStatus = Field(OrderStatus.PENDING, description="订单状态")
     created_at: datetime = Field(default_factory=datetime.now, description="创建时间")
     contact_info: Dict[str, str] = Field(default_factory=dict, description="联系信息")
+    hold_id: Optional[str] = Field(None, description="库存预占ID")
+    hold_expires_at: Optional[datetime] = Field(None, description="预占过期时间")
+
+
+class InventoryHold(BaseModel):
+    """库存预占"""
+    hold_id: str = Field(..., description="预占ID")
+    product_id: str = Field(..., description="产品ID")
+    quantity: int = Field(1, description="数量")
+    status: HoldStatus = Field(HoldStatus.HELD, description="预占状态")
+    expires_at: datetime = Field(..., description="过期时间")
+
+
+# ==================== 用户偏好 ====================
+
+class UserPreference(BaseModel):
+    """用户偏好"""
+    user_id: str = Field(..., description="用户ID")
+    preferences: Dict[str, List[str]] = Field(default_factory=dict,
+                                              description="按产品类型的偏好标签，如 hotel、attraction")
+    favorite_destinations: List[str] = Field(default_factory=list, description="常去目的地")
+    budget_range: Dict[str, float] = Field(default_factory=dict, description="预算区间（min、max）")
 
 
 # ==================== 智能体响应 ====================
@@ -0,0 +1,118 @@
+"""
+订单存储
+职责：订单的持久化读写；写入经批量提交写入器合并事务
+"""
+from datetime import datetime
+from typing import Optional, Sequence
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from database import OrderDB, GroupCommitWriter, async_read_session_maker, get_group_commit_writer
+from models import Order, OrderStatus
+
+
+def _to_order(row: OrderDB) -> Order:
+    """数据库行转换为订单模型"""
+    return Order(
+        order_id=row.order_id,
+        user_id=row.user_id,
+        product_type=row.product_type,
+        product_id=row.product_id,
+        product_name=row.product_name,
+        quantity=row.quantity,
+        total_price=row.total_price,
+        status=OrderStatus(row.status),
+        created_at=row.created_at,
+        contact_info=row.contact_info or {},
+        hold_id=row.hold_id,
+        hold_expires_at=row.hold_expires_at
+    )
+
+
+class OrderStore:
+    """订单存储"""
+
+    def __init__(self, writer: Optional[GroupCommitWriter] = None,
+                 session_maker: Optional[async_sessionmaker] = None):
+        """
+        初始化订单存储
+
+        Args:
+            writer: 批量提交写入器，默认使用全局写入器
+            session_maker: 读取使用的会话工厂，默认使用全局只读会话工厂
+        """
+        self.writer = writer or get_group_commit_writer()
+        self.session_maker = session_maker or async_read_session_maker
+
+    async def create(self, order: Order):
+        """
+        保存新订单（所在批次提交后返回）
+
+        Args:
+            order: 订单
+        """
+        async def insert(session: AsyncSession):
+            session.add(OrderDB(
+                order_id=order.order_id,
+                user_id=order.user_id,
+                product_type=order.product_type,
+                product_id=order.product_id,
+                product_name=order.product_name,
+                quantity=order.quantity,
+                total_price=order.total_price,
+                status=order.status.value,
+                contact_info=order.contact_info,
+                hold_id=order.hold_id,
+                hold_expires_at=order.hold_expires_at,
+                created_at=order.created_at
+            ))
+
+        await self.writer.submit(insert)
+
+    async def get(self, order_id: str) -> Optional[Order]:
+        """
+        查询订单
+
+        Args:
+            order_id: 订单ID
+
+        Returns:
+            订单，不存在时返回 None
+        """
+        async with self.session_maker() as session:
+            row = await session.scalar(select(OrderDB).where(OrderDB.order_id == order_id))
+            return _to_order(row) if row is not None else None
+
+    async def update_status(self, order_id: str, status: OrderStatus,
+                            expected: Sequence[OrderStatus] = ()) -> bool:
+        """
+        更新订单状态
+
+        Args:
+            order_id: 订单ID
+            status: 新状态
+            expected: 允许的当前状态，为空时不限制
+
+        Returns:
+            是否更新成功；订单不存在或当前状态不符时返回 False
+        """
+        async def change(session: AsyncSession) -> bool:
+            statement = update(OrderDB).where(OrderDB.order_id == order_id)
+            if expected:
+                statement = statement.where(OrderDB.status.in_([s.value for s in expected]))
+            result = await session.execute(statement.values(status=status.value, updated_at=datetime.now()))
+            return result.rowcount == 1
+
+        return await self.writer.submit(change)
+
+
+# ==================== 全局订单存储实例 ====================
+
+_order_store_instance: Optional[OrderStore] = None
+
+
+def get_order_store() -> OrderStore:
+    """获取订单存储实例（单例模式）"""
+    global _order_store_instance
+    if _order_store_instance is None:
+        _order_store_instance = OrderStore()
+    return _order_store_instance
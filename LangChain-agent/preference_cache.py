@@ -0,0 +1,179 @@
+"""
+用户偏好缓存
+职责：按 user_id 读穿缓存 user_preferences 表，写入偏好时失效对应缓存
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from config import settings
+from database import UserPreferenceDB, async_read_session_maker, async_session_maker
+from llm import SingleFlight
+from models import UserPreference
+
+
+class UserPreferenceCache:
+    """
+    用户偏好读穿缓存
+
+    命中时只做一次字典查找；未命中时同一用户的并发读取合并为一次数据库查询。
+    没有偏好记录的用户也会缓存（较短的存活时间），避免新用户每次请求都查库。
+    """
+
+    def __init__(self, session_maker: Optional[async_sessionmaker] = None,
+                 ttl: Optional[float] = None, negative_ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        """
+        初始化缓存
+
+        Args:
+            session_maker: 数据库会话工厂，默认读取使用全局只读会话工厂、写入使用全局会话工厂
+            ttl: 缓存存活秒数，默认取配置
+            negative_ttl: 无偏好记录时的缓存秒数，默认取配置
+            max_entries: 最多缓存的用户数，默认取配置
+        """
+        self.session_maker = session_maker or async_session_maker
+        self.read_session_maker = session_maker or async_read_session_maker
+        self.ttl = ttl if ttl is not None else settings.USER_PREFERENCE_CACHE_TTL
+        self.negative_ttl = negative_ttl if negative_ttl is not None else settings.USER_PREFERENCE_NEGATIVE_TTL
+        self.max_entries = max_entries or settings.USER_PREFERENCE_CACHE_MAX_ENTRIES
+        # user_id -> (过期时间, 偏好)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[UserPreference]]]" = OrderedDict()
+        # 正在从数据库加载的用户 -> 加载期间是否被失效；失效前发出的查询不写回缓存，
+        # 同一用户的加载已合并为一次，条目数不超过并发加载数，加载结束即删除
+        self._loading: Dict[str, bool] = {}
+        self._single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    async def get(self, user_id: str) -> Optional[UserPreference]:
+        """
+        读取用户偏好
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            用户偏好，没有记录或读取失败时返回 None
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        try:
+            return await self._single_flight.do(user_id, lambda: self._load(user_id))
+        except Exception as e:
+            # 偏好只用于个性化排序，读取失败不影响请求
+            self.errors += 1
+            logger.warning(f"读取用户偏好失败: {user_id}, {str(e)}")
+            return None
+
+    async def _load(self, user_id: str) -> Optional[UserPreference]:
+        """从数据库加载并写入缓存"""
+        self._loading[user_id] = False
+        try:
+            async with self.read_session_maker() as session:
+                row = await session.scalar(select(UserPreferenceDB).where(UserPreferenceDB.user_id == user_id))
+        finally:
+            invalidated = self._loading.pop(user_id)
+        preference = None
+        if row is not None:
+            preference = UserPreference(
+                user_id=row.user_id,
+                preferences=row.preferences or {},
+                favorite_destinations=row.favorite_destinations or [],
+                budget_range=row.budget_range or {}
+            )
+        if not invalidated:
+            self._put(user_id, preference)
+        return preference
+
+    def _put(self, user_id: str, preference: Optional[UserPreference]):
+        """写入缓存，超出容量时淘汰最久未使用的用户"""
+        ttl = self.ttl if preference is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[user_id] = (time.monotonic() + ttl, preference)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        """使指定用户的缓存失效"""
+        self._entries.pop(user_id, None)
+        if user_id in self._loading:
+            self._loading[user_id] = True
+
+    async def save(self, preference: UserPreference):
+        """
+        写入用户偏好并使缓存失效
+
+        Args:
+            preference: 用户偏好
+        """
+        values = {
+            "preferences": preference.preferences,
+            "favorite_destinations": preference.favorite_destinations,
+            "budget_range": preference.budget_range,
+        }
+        statement = insert(UserPreferenceDB).values(user_id=preference.user_id, **values)
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={**values, "updated_at": datetime.now()}
+        )
+        async with self.session_maker() as session:
+            async with session.begin():
+                await session.execute(statement)
+        self.invalidate(preference.user_id)
+
+
+def profile_for_intent(preference: Optional[UserPreference]) -> Dict[str, Any]:
+    """
+    将用户偏好转换为传给查询类智能体的个性化参数
+
+    Args:
+        preference: 用户偏好
+
+    Returns:
+        {"hotel_preferences", "attraction_preferences", "budget", "favorite_destinations"}，无偏好时为空字典
+    """
+    if preference is None:
+        return {}
+    return {
+        "hotel_preferences": list(preference.preferences.get("hotel", [])),
+        "attraction_preferences": list(preference.preferences.get("attraction", [])),
+        "budget": preference.budget_range.get("max"),
+        "favorite_destinations": list(preference.favorite_destinations),
+    }
+
+
+# ==================== 全局缓存实例 ====================
+
+_preference_cache_instance: Optional[UserPreferenceCache] = None
+
+
+def get_preference_cache() -> UserPreferenceCache:
+    """获取用户偏好缓存实例（单例模式）"""
+    global _preference_cache_instance
+    if _preference_cache_instance is None:
+        _preference_cache_instance = UserPreferenceCache()
+    return _preference_cache_instance
@@ -0,0 +1,153 @@
+"""
+智能体注册表
+应用启动时构建一次，为各路由和工作流提供共享的 LLM 客户端与智能体实例
+"""
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+from langchain_core.language_models import BaseChatModel
+from langchain_community.chat_models import ChatTongyi
+from config import settings
+from agents import (
+    IntentParseAgent,
+    FlightQueryAgent,
+    HotelQueryAgent,
+    AttractionRecommendAgent,
+    ItineraryPlanAgent,
+    PriceCompareAgent,
+    BookingAgent,
+    CustomerServiceAgent
+)
+from agents.base_agent import BaseAgent
+from loguru import logger
+
+
+DEFAULT_PROFILE = "default"
+
+# 智能体名称 -> 智能体类
+AGENT_CLASSES: Dict[str, Type[BaseAgent]] = {
+    "intent": IntentParseAgent,
+    "flight": FlightQueryAgent,
+    "hotel": HotelQueryAgent,
+    "attraction": AttractionRecommendAgent,
+    "itinerary": ItineraryPlanAgent,
+    "price": PriceCompareAgent,
+    "booking": BookingAgent,
+    "customer_service": CustomerServiceAgent,
+}
+
+
+def create_tongyi_llm(profile: str, params: Dict[str, Any]) -> BaseChatModel:
+    """
+    根据配置档创建通义千问客户端
+
+    Args:
+        profile: 配置档名称
+        params: 配置档参数
+
+    Returns:
+        语言模型实例
+    """
+    # ChatTongyi 不识别 temperature/max_tokens 字段，需通过 model_kwargs 透传
+    return ChatTongyi(
+        model_name=params["model"],
+        model_kwargs={
+            "temperature": params["temperature"],
+            "max_tokens": params["max_tokens"],
+        },
+        dashscope_api_key=params.get("api_key") or settings.DASHSCOPE_API_KEY
+    )
+
+
+class AgentRegistry:
+    """智能体注册表"""
+
+    def __init__(self, profiles: Optional[Dict[str, Dict[str, Any]]] = None,
+                 agent_profiles: Optional[Dict[str, str]] = None,
+                 llm_factory: Callable[[str, Dict[str, Any]], BaseChatModel] = create_tongyi_llm):
+        """
+        初始化注册表
+
+        Args:
+            profiles: LLM 配置档（名称 -> 参数），未指定的参数取全局 LLM 配置
+            agent_profiles: 智能体使用的配置档（智能体名称 -> 配置档名称）
+            llm_factory: LLM 客户端工厂，便于替换为其他模型实现
+        """
+        defaults = {
+            "model": settings.LLM_MODEL,
+            "temperature": settings.LLM_TEMPERATURE,
+            "max_tokens": settings.LLM_MAX_TOKENS,
+        }
+        profiles = profiles if profiles is not None else settings.LLM_PROFILES
+        self.profiles: Dict[str, Dict[str, Any]] = {DEFAULT_PROFILE: defaults}
+        for name, params in profiles.items():
+            self.profiles[name] = {**defaults, **params}
+
+        self.agent_profiles = agent_profiles if agent_profiles is not None else settings.AGENT_LLM_PROFILES
+        self.llm_factory = llm_factory
+        self._llms: Dict[str, BaseChatModel] = {}
+        self._agents: Dict[Tuple[str, str], BaseAgent] = {}
+
+    def get_llm(self, profile: str = DEFAULT_PROFILE) -> BaseChatModel:
+        """
+        获取共享的 LLM 客户端
+
+        Args:
+            profile: 配置档名称
+
+        Returns:
+            语言模型实例
+        """
+        llm = self._llms.get(profile)
+        if llm is None:
+            if profile not in self.profiles:
+                raise KeyError(f"未知的LLM配置档: {profile}")
+            llm = self.llm_factory(profile, self.profiles[profile])
+            self._llms[profile] = llm
+        return llm
+
+    def get_agent(self, name: str, profile: Optional[str] = None) -> BaseAgent:
+        """
+        获取共享的智能体实例
+
+        Args:
+            name: 智能体名称，见 AGENT_CLASSES
+            profile: 配置档名称，默认使用 AGENT_LLM_PROFILES 中的绑定
+
+        Returns:
+            智能体实例
+        """
+        if name not in AGENT_CLASSES:
+            raise KeyError(f"未知的智能体: {name}")
+
+        profile = profile or self.agent_profiles.get(name, DEFAULT_PROFILE)
+        agent = self._agents.get((name, profile))
+        if agent is None:
+            agent = AGENT_CLASSES[name](self.get_llm(profile))
+            self._agents[(name, profile)] = agent
+        return agent
+
+    def warmup(self):
+        """预先创建所有配置档的客户端和已绑定的智能体"""
+        for profile in self.profiles:
+            self.get_llm(profile)
+        for name in AGENT_CLASSES:
+            self.get_agent(name)
+        logger.info(f"注册表预热完成: {len(self._llms)} 个LLM客户端, {len(self._agents)} 个智能体")
+
+
+# ==================== 全局注册表实例 ====================
+
+_registry_instance: Optional[AgentRegistry] = None
+
+
+def get_registry() -> AgentRegistry:
+    """获取注册表实例（单例模式）"""
+    global _registry_instance
+    if _registry_instance is None:
+        _registry_instance = AgentRegistry()
+    return _registry_instance
+
+
+def set_registry(registry: AgentRegistry):
+    """替换全局注册表实例（用于离线测试或切换模型实现）"""
+    global _registry_instance
+    _registry_instance = registry
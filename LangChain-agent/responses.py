@@ -0,0 +1,47 @@
+"""
+JSON 响应编码
+职责：基于 orjson 一次完成响应编码，不经过 jsonable_encoder 的逐层转换
+"""
+from decimal import Decimal
+from typing import Any
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+# 非字符串键（如整数天数）转为字符串，numpy 数值直接编码
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    """orjson 不支持的类型：Pydantic 模型按字段导出，其余转为基础类型"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    编码为 UTF-8 JSON（datetime、date、Enum、numpy 数值和 Pydantic 模型可直接传入）
+
+    Args:
+        content: 待编码对象
+
+    Returns:
+        JSON 字节串
+    """
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    orjson 编码的 JSON 响应
+
+    接口直接返回该响应时 FastAPI 不再调用 jsonable_encoder，内容只编码一次。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,161 @@
+"""
+搜索历史记录
+职责：请求路径只把记录放入有界内存缓冲区，后台任务按数量或时间批量写入 search_history 表
+"""
+import asyncio
+import json
+import random
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from config import settings
+from database import SearchHistoryDB, async_session_maker
+
+
+def _jsonable(value: Any) -> Any:
+    """转换为可写入 JSON 列的结构（日期等转为字符串）"""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class SearchHistoryRecorder:
+    """
+    搜索历史后写记录器
+
+    record() 不做任何 IO：缓冲区超过高水位后按比例采样，写满后直接丢弃，从不阻塞请求。
+    """
+
+    def __init__(self, session_maker: Optional[async_sessionmaker] = None,
+                 max_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None):
+        """
+        初始化记录器
+
+        Args:
+            session_maker: 数据库会话工厂，默认使用全局会话工厂
+            max_size: 缓冲区容量，默认取配置
+            batch_size: 达到该数量立即写入，也是单条 INSERT 的最大行数，默认取配置
+            flush_interval: 最长写入间隔（秒），默认取配置
+        """
+        self.session_maker = session_maker or async_session_maker
+        self.max_size = max_size or settings.SEARCH_HISTORY_BUFFER_SIZE
+        self.batch_size = batch_size or settings.SEARCH_HISTORY_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.SEARCH_HISTORY_FLUSH_INTERVAL
+        self.high_watermark = int(self.max_size * settings.SEARCH_HISTORY_SAMPLE_WATERMARK)
+        self.sample_rate = settings.SEARCH_HISTORY_OVERLOAD_SAMPLE_RATE
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stats = {"recorded": 0, "sampled_out": 0, "dropped": 0, "written": 0, "flushes": 0, "failed": 0}
+
+    def stats(self) -> Dict[str, int]:
+        """返回统计信息"""
+        return {**self._stats, "buffered": len(self._buffer)}
+
+    def record(self, user_id: str, session_id: str, query: str,
+               intent_type: str, results: Dict[str, Any], intent_source: Optional[str] = None) -> bool:
+        """
+        记录一次搜索（不等待写入）
+
+        Args:
+            user_id: 用户ID
+            session_id: 会话ID
+            query: 用户查询
+            intent_type: 意图类型
+            results: 结果摘要
+            intent_source: 意图标签来源（llm / classifier / fallback）
+
+        Returns:
+            是否进入缓冲区；过载采样或缓冲区已满时返回 False
+        """
+        size = len(self._buffer)
+        if size >= self.max_size:
+            self._stats["dropped"] += 1
+            return False
+        if size >= self.high_watermark and random.random() >= self.sample_rate:
+            self._stats["sampled_out"] += 1
+            return False
+
+        self._buffer.append({
+            "user_id": user_id,
+            "session_id": session_id,
+            "query": query,
+            "intent_type": intent_type,
+            "intent_source": intent_source,
+            "results": results,
+            "created_at": datetime.now()
+        })
+        self._stats["recorded"] += 1
+        if self._wakeup is not None and len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """
+        写入缓冲区中的全部记录（每批一条多行 INSERT）
+
+        Returns:
+            写入条数
+        """
+        written = 0
+        while self._buffer:
+            count = min(self.batch_size, len(self._buffer))
+            rows = [self._buffer.popleft() for _ in range(count)]
+            try:
+                for row in rows:
+                    row["results"] = _jsonable(row["results"])
+                async with self.session_maker() as session, session.begin():
+                    await session.execute(insert(SearchHistoryDB).values(rows))
+            except Exception as e:
+                # 历史记录允许丢失，失败的批次不重试，避免在数据库故障时堆积
+                self._stats["failed"] += len(rows)
+                logger.error(f"搜索历史写入失败，丢弃 {len(rows)} 条: {str(e)}")
+                continue
+            written += len(rows)
+            self._stats["flushes"] += 1
+        self._stats["written"] += written
+        return written
+
+    async def _run(self):
+        """后台任务：攒够一批或到达写入间隔时写入"""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        """启动后台写入任务"""
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """停止后台任务并写入剩余记录"""
+        if self._task is not None:
+            # 不取消任务，避免中断进行中的写入
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+
+
+# ==================== 全局记录器实例 ====================
+
+_recorder_instance: Optional[SearchHistoryRecorder] = None
+
+
+def get_search_history_recorder() -> SearchHistoryRecorder:
+    """获取搜索历史记录器实例（单例模式）"""
+    global _recorder_instance
+    if _recorder_instance is None:
+        _recorder_instance = SearchHistoryRecorder()
+    return _recorder_instance
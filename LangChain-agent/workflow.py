@@ -2,22 +2,17 @@
 LangGraph 工作流编排
 多智能体协作流程
 """
-from typing import TypedDict, Annotated, Sequence
+from typing import TypedDict, Annotated, Sequence, AsyncIterator, Awaitable, Callable, List, Union
 from langgraph.graph import StateGraph, END
-from langchain_community.chat_models import ChatTongyi
+from registry import AgentRegistry, get_registry
+from models import IntentType, AgentExecutionMode
+from metrics import NODE_DURATION, WORKFLOW_IN_FLIGHT, current_intent
+from search_history import SearchHistoryRecorder, get_search_history_recorder
+from preference_cache import UserPreferenceCache, get_preference_cache, profile_for_intent
 from config import settings
-from agents import (
-    IntentParseAgent,
-    FlightQueryAgent,
-    HotelQueryAgent,
-    AttractionRecommendAgent,
-    ItineraryPlanAgent,
-    PriceCompareAgent,
-    BookingAgent,
-    CustomerServiceAgent
-)
-from models import IntentType
 from loguru import logger
+import asyncio
+from datetime import date, timedelta
 
 
 # ==================== 状态定义 ====================
@@ -28,10 +23,13 @@ class AgentState(TypedDict):
     query: str  # 用户查询
     user_id: str  # 用户ID
     session_id: str  # 会话ID
+    execution_mode: str  # 智能体执行模式
     
     # 意图解析结果
     intent: dict  # 解析的意图
     intent_type: str  # 意图类型
+    intent_source: str  # 意图来源：llm / classifier / fallback
+    user_profile: dict  # 用户偏好转换的个性化参数（不返回给调用方）
     
     # 各智能体的结果
     flight_result: dict  # 机票查询结果
@@ -48,48 +46,118 @@ class AgentState(TypedDict):
     error: str  # 错误信息
 
 
+# 流式输出时各意图的建议来源：意图类型 -> (状态键, 智能体属性, 建议所在字段路径)
+STREAM_ADVICE_TARGETS = {
+    IntentType.FLIGHT: ("flight_result", "flight_agent", ("suggestion",)),
+    IntentType.HOTEL: ("hotel_result", "hotel_agent", ("suggestion",)),
+    IntentType.ATTRACTION: ("attraction_result", "attraction_agent", ("data", "recommendation_reason")),
+    IntentType.PRICE_COMPARE: ("price_result", "price_agent", ("suggestion",)),
+    IntentType.CUSTOMER_SERVICE: ("service_result", "service_agent", ("answer",)),
+}
+
+# 延迟执行模式下结果中携带的生成参数，不对外输出
+DEFERRED_INPUT_KEYS = ("advice_inputs", "plan_inputs")
+
+# 节点名称 -> 节点完成时推送的状态键
+NODE_RESULT_KEYS = {
+    "parse_intent": "intent",
+    "query_flight": "flight_result",
+    "query_hotel": "hotel_result",
+    "recommend_attraction": "attraction_result",
+    "plan_itinerary": "itinerary_result",
+    "compare_price": "price_result",
+    "handle_booking": "booking_result",
+    "customer_service": "service_result",
+}
+
+
+def _intent_label(intent_type) -> str:
+    """意图类型转为指标标签值"""
+    if not intent_type:
+        return "unknown"
+    return getattr(intent_type, "value", intent_type)
+
+
 # ==================== 节点函数 ====================
 
 class TravelAgentWorkflow:
     """旅行智能体工作流"""
     
-    def __init__(self):
-        """初始化工作流"""
-        # 初始化LLM
-        self.llm = ChatTongyi(
-            model_name=settings.LLM_MODEL,
-            temperature=settings.LLM_TEMPERATURE,
-            max_tokens=settings.LLM_MAX_TOKENS,
-            dashscope_api_key=settings.DASHSCOPE_API_KEY
-        )
+    def __init__(self, registry: AgentRegistry = None, history: SearchHistoryRecorder = None,
+                 preferences: UserPreferenceCache = None):
+        """
+        初始化工作流
         
-        # 初始化智能体
-        self.intent_agent = IntentParseAgent(self.llm)
-        self.flight_agent = FlightQueryAgent(self.llm)
-        self.hotel_agent = HotelQueryAgent(self.llm)
-        self.attraction_agent = AttractionRecommendAgent(self.llm)
-        self.itinerary_agent = ItineraryPlanAgent(self.llm)
-        self.price_agent = PriceCompareAgent(self.llm)
-        self.booking_agent = BookingAgent(self.llm)
-        self.service_agent = CustomerServiceAgent(self.llm)
+        Args:
+            registry: 智能体注册表，默认使用全局注册表
+            history: 搜索历史记录器，默认按配置使用全局记录器
+            preferences: 用户偏好缓存，默认使用全局缓存
+        """
+        registry = registry or get_registry()
+        if history is None and settings.SEARCH_HISTORY_ENABLED:
+            history = get_search_history_recorder()
+        self.history = history
+        self.preferences = preferences or get_preference_cache()
+        
+        # 共享LLM客户端
+        self.llm = registry.get_llm()
+        
+        # 共享智能体实例
+        self.intent_agent = registry.get_agent("intent")
+        self.flight_agent = registry.get_agent("flight")
+        self.hotel_agent = registry.get_agent("hotel")
+        self.attraction_agent = registry.get_agent("attraction")
+        self.itinerary_agent = registry.get_agent("itinerary")
+        self.price_agent = registry.get_agent("price")
+        self.booking_agent = registry.get_agent("booking")
+        self.service_agent = registry.get_agent("customer_service")
         
         # 构建工作流图
         self.graph = self._build_graph()
     
+    def _timed(self, node: str, fn: Callable[[AgentState], Awaitable[dict]]) -> Callable[[AgentState], Awaitable[dict]]:
+        """
+        为节点函数加上耗时统计，并在节点内设置当前意图供 LLM 调用指标使用
+        
+        Args:
+            node: 节点名称
+            fn: 节点函数
+            
+        Returns:
+            包装后的节点函数
+        """
+        async def timed_node(state: AgentState) -> dict:
+            intent = _intent_label(state.get("intent_type"))
+            token = current_intent.set(intent)
+            try:
+                with NODE_DURATION.time(node=node, intent=intent, status="success") as labels:
+                    result = await fn(state)
+                    if node == "parse_intent":
+                        labels["intent"] = _intent_label(result.get("intent_type"))
+                    # 智能体返回 success=False 视为节点失败
+                    if any(isinstance(value, dict) and value.get("success") is False
+                           for value in result.values()) or result.get("error"):
+                        labels["status"] = "failure"
+                    return result
+            finally:
+                current_intent.reset(token)
+        
+        return timed_node
+    
     def _build_graph(self) -> StateGraph:
         """构建工作流图"""
         workflow = StateGraph(AgentState)
         
         # 添加节点
-        workflow.add_node("parse_intent", self.parse_intent_node)
-        workflow.add_node("query_flight", self.query_flight_node)
-        workflow.add_node("query_hotel", self.query_hotel_node)
-        workflow.add_node("recommend_attraction", self.recommend_attraction_node)
-        workflow.add_node("plan_itinerary", self.plan_itinerary_node)
-        workflow.add_node("compare_price", self.compare_price_node)
-        workflow.add_node("handle_booking", self.handle_booking_node)
-        workflow.add_node("customer_service", self.customer_service_node)
-        workflow.add_node("generate_answer", self.generate_answer_node)
+        workflow.add_node("parse_intent", self._timed("parse_intent", self.parse_intent_node))
+        workflow.add_node("query_flight", self._timed("query_flight", self.query_flight_node))
+        workflow.add_node("query_hotel", self._timed("query_hotel", self.query_hotel_node))
+        workflow.add_node("recommend_attraction", self._timed("recommend_attraction", self.recommend_attraction_node))
+        workflow.add_node("plan_itinerary", self._timed("plan_itinerary", self.plan_itinerary_node))
+        workflow.add_node("compare_price", self._timed("compare_price", self.compare_price_node))
+        workflow.add_node("handle_booking", self._timed("handle_booking", self.handle_booking_node))
+        workflow.add_node("customer_service", self._timed("customer_service", self.customer_service_node))
+        workflow.add_node("generate_answer", self._timed("generate_answer", self.generate_answer_node))
         
         # 设置入口点
         workflow.set_entry_point("parse_intent")
@@ -102,7 +170,7 @@ class TravelAgentWorkflow:
                 "flight": "query_flight",
                 "hotel": "query_hotel",
                 "attraction": "recommend_attraction",
-                "itinerary": "query_flight",  # 行程规划需要先查询交通和酒店
+                # 行程规划：机票、酒店、景点三路并行，见 route_by_intent
                 "price_compare": "compare_price",
                 "booking": "handle_booking",
                 "customer_service": "customer_service",
@@ -115,7 +183,7 @@ class TravelAgentWorkflow:
             "query_flight",
             self.route_after_flight,
             {
-                "itinerary": "query_hotel",  # 继续查询酒店
+                "itinerary": END,  # 由汇合边进入行程规划
                 "price_compare": "compare_price",
                 "end": "generate_answer"
             }
@@ -126,7 +194,7 @@ class TravelAgentWorkflow:
             "query_hotel",
             self.route_after_hotel,
             {
-                "itinerary": "recommend_attraction",  # 继续推荐景点
+                "itinerary": END,  # 由汇合边进入行程规划
                 "price_compare": "compare_price",
                 "end": "generate_answer"
             }
@@ -137,11 +205,14 @@ class TravelAgentWorkflow:
             "recommend_attraction",
             self.route_after_attraction,
             {
-                "itinerary": "plan_itinerary",
+                "itinerary": END,  # 由汇合边进入行程规划
                 "end": "generate_answer"
             }
         )
         
+        # 三路查询全部完成后汇合到行程规划
+        workflow.add_edge(["query_flight", "query_hotel", "recommend_attraction"], "plan_itinerary")
+        
         # 其他节点直接到生成答案
         workflow.add_edge("plan_itinerary", "generate_answer")
         workflow.add_edge("compare_price", "generate_answer")
@@ -155,51 +226,80 @@ class TravelAgentWorkflow:
     
     # ==================== 节点处理函数 ====================
     
-    async def parse_intent_node(self, state: AgentState) -> AgentState:
+    # 节点只返回自己更新的状态键，行程规划的三路并行分支才不会互相覆盖
+    
+    async def parse_intent_node(self, state: AgentState) -> dict:
         """意图解析节点"""
         logger.info("执行意图解析节点")
-        result = await self.intent_agent.process({"query": state["query"]})
+        user_id = state.get("user_id")
+        if user_id and user_id != "guest":
+            # 用户偏好与意图解析并行读取，缓存未命中时也不增加串行耗时
+            result, preference = await asyncio.gather(
+                self.intent_agent.process({"query": state["query"]}),
+                self.preferences.get(user_id)
+            )
+        else:
+            result, preference = await self.intent_agent.process({"query": state["query"]}), None
         
         if result["success"]:
-            state["intent"] = result["intent"]
-            state["intent_type"] = result["intent"]["intent_type"]
-        else:
-            state["error"] = result.get("error", "意图解析失败")
-            state["intent_type"] = "customer_service"  # 失败时转到客服
+            return {
+                "intent": result["intent"],
+                "intent_type": result["intent"]["intent_type"],
+                "intent_source": result.get("source", "llm"),
+                # 个性化参数单独保存，只传给查询类智能体，不进入响应和搜索历史
+                "user_profile": profile_for_intent(preference)
+            }
         
-        return state
+        return {
+            "error": result.get("error", "意图解析失败"),
+            "intent_type": "customer_service",  # 失败时转到客服
+            "intent_source": "fallback"
+        }
+    
+    async def _run_search(self, agent, state: AgentState) -> dict:
+        """执行查询类智能体，异常只影响本分支"""
+        intent = state.get("intent", {})
+        mode = state.get("execution_mode")
+        if state.get("intent_type") in (IntentType.ITINERARY, IntentType.PRICE_COMPARE):
+            # 结果只交给行程规划或比价使用，跳过各智能体自己的建议生成
+            mode = AgentExecutionMode.DATA_ONLY.value
+        try:
+            # 个性化参数只作为排序参考，查询中明确给出的条件优先
+            return await agent.process({**intent, "user_profile": state.get("user_profile"), "mode": mode})
+        except Exception as e:
+            logger.error(f"{agent.agent_name}执行异常: {str(e)}")
+            return {
+                "success": False,
+                "error": f"{agent.agent_name}执行异常: {str(e)}"
+            }
     
-    async def query_flight_node(self, state: AgentState) -> AgentState:
+    async def query_flight_node(self, state: AgentState) -> dict:
         """机票查询节点"""
         logger.info("执行机票查询节点")
         intent = state.get("intent", {})
-        result = await self.flight_agent.process(intent)
-        state["flight_result"] = result
-        return state
+        if state.get("intent_type") == IntentType.PRICE_COMPARE and not intent.get("departure_date"):
+            # 比价查询常不带日期，按明天的航班比价，避免航班查询因缺少日期失败
+            tomorrow = (date.today() + timedelta(days=1)).isoformat()
+            state = {**state, "intent": {**intent, "departure_date": tomorrow}}
+        return {"flight_result": await self._run_search(self.flight_agent, state)}
     
-    async def query_hotel_node(self, state: AgentState) -> AgentState:
+    async def query_hotel_node(self, state: AgentState) -> dict:
         """酒店查询节点"""
         logger.info("执行酒店查询节点")
-        intent = state.get("intent", {})
-        result = await self.hotel_agent.process(intent)
-        state["hotel_result"] = result
-        return state
+        return {"hotel_result": await self._run_search(self.hotel_agent, state)}
     
-    async def recommend_attraction_node(self, state: AgentState) -> AgentState:
+    async def recommend_attraction_node(self, state: AgentState) -> dict:
         """景点推荐节点"""
         logger.info("执行景点推荐节点")
-        intent = state.get("intent", {})
-        result = await self.attraction_agent.process(intent)
-        state["attraction_result"] = result
-        return state
+        return {"attraction_result": await self._run_search(self.attraction_agent, state)}
     
-    async def plan_itinerary_node(self, state: AgentState) -> AgentState:
+    async def plan_itinerary_node(self, state: AgentState) -> dict:
         """行程规划节点"""
         logger.info("执行行程规划节点")
         intent = state.get("intent", {})
         
-        # 整合之前的结果
-        input_data = intent.copy()
+        # 整合之前的结果（流式执行时只准备参数，行程在图执行结束后逐天生成）
+        input_data = {**intent, "mode": state.get("execution_mode")}
         if state.get("flight_result"):
             input_data["flight_data"] = state["flight_result"].get("data", {})
         if state.get("hotel_result"):
@@ -208,43 +308,47 @@ class TravelAgentWorkflow:
             input_data["attraction_data"] = state["attraction_result"].get("data", {})
         
         result = await self.itinerary_agent.process(input_data)
-        state["itinerary_result"] = result
-        return state
+        return {"itinerary_result": result}
     
-    async def compare_price_node(self, state: AgentState) -> AgentState:
-        """价格对比节点"""
+    async def compare_price_node(self, state: AgentState) -> dict:
+        """价格对比节点（对结果集中的全部航班或酒店批量比价）"""
         logger.info("执行价格对比节点")
         
         # 从已有结果中获取产品信息
-        product_info = {}
+        products, product_type = [], ""
         if state.get("flight_result") and state["flight_result"].get("data"):
-            flights = state["flight_result"]["data"].get("flights", [])
-            if flights:
-                flight = flights[0]
-                product_info = {
+            product_type = "flight"
+            products = [
+                {
                     "product_id": flight["flight_id"],
                     "product_name": f"{flight['airline']} {flight['flight_number']}",
-                    "product_type": "flight",
                     "base_price": flight["price"]
                 }
+                for flight in state["flight_result"]["data"].get("flights", [])
+            ]
         elif state.get("hotel_result") and state["hotel_result"].get("data"):
-            hotels = state["hotel_result"]["data"].get("hotels", [])
-            if hotels:
-                hotel = hotels[0]
-                product_info = {
+            product_type = "hotel"
+            products = [
+                {
                     "product_id": hotel["hotel_id"],
                     "product_name": hotel["name"],
-                    "product_type": "hotel",
                     "base_price": hotel["price_per_night"]
                 }
-        
-        if product_info:
-            result = await self.price_agent.process(product_info)
-            state["price_result"] = result
-        
-        return state
+                for hotel in state["hotel_result"]["data"].get("hotels", [])
+            ]
+        
+        if products:
+            result = await self.price_agent.process({
+                "products": products,
+                "product_type": product_type,
+                "mode": state.get("execution_mode")
+            })
+            return {"price_result": result}
+        
+        # 节点至少要写入一个状态字段
+        return {"price_result": {}}
     
-    async def handle_booking_node(self, state: AgentState) -> AgentState:
+    async def handle_booking_node(self, state: AgentState) -> dict:
         """预订处理节点"""
         logger.info("执行预订处理节点")
         intent = state.get("intent", {})
@@ -262,24 +366,23 @@ class TravelAgentWorkflow:
         }
         
         result = await self.booking_agent.process(booking_data)
-        state["booking_result"] = result
-        return state
+        return {"booking_result": result}
     
-    async def customer_service_node(self, state: AgentState) -> AgentState:
+    async def customer_service_node(self, state: AgentState) -> dict:
         """客服咨询节点"""
         logger.info("执行客服咨询节点")
         
         service_data = {
             "question": state["query"],
             "user_id": state.get("user_id", "guest"),
-            "order_id": state.get("intent", {}).get("extra_info", {}).get("order_id", "无")
+            "order_id": state.get("intent", {}).get("extra_info", {}).get("order_id", "无"),
+            "mode": state.get("execution_mode")
         }
         
         result = await self.service_agent.process(service_data)
-        state["service_result"] = result
-        return state
+        return {"service_result": result}
     
-    async def generate_answer_node(self, state: AgentState) -> AgentState:
+    async def generate_answer_node(self, state: AgentState) -> dict:
         """生成最终答案节点"""
         logger.info("执行生成答案节点")
         
@@ -316,7 +419,7 @@ class TravelAgentWorkflow:
         
         elif intent_type == IntentType.ITINERARY and state.get("itinerary_result"):
             result = state["itinerary_result"]
-            if result.get("success"):
+            if result.get("success") and result.get("data"):
                 data = result["data"]
                 answer_parts.append(f"已为您规划 {data['title']}。")
                 answer_parts.append(f"\n总费用约：¥{data['total_cost']}")
@@ -327,9 +430,10 @@ class TravelAgentWorkflow:
             result = state["price_result"]
             if result.get("success"):
                 data = result["data"]
-                answer_parts.append(f"已完成价格对比。")
-                answer_parts.append(f"\n最低价：¥{data['lowest_price']} ({data['lowest_platform']})")
-                answer_parts.append(f"\n价格差：¥{data['price_difference']}")
+                lowest = next(item for item in data["items"] if item["product_id"] == data["lowest_product_id"])
+                answer_parts.append(f"已完成 {data['total_count']} 个产品的价格对比。")
+                answer_parts.append(f"\n最低价：¥{data['lowest_price']} ({lowest['product_name']}，{data['lowest_platform']})")
+                answer_parts.append(f"\n最大价格差：¥{data['max_price_difference']}")
                 answer_parts.append(f"\n建议：{result.get('suggestion', '')}")
         
         elif intent_type == IntentType.BOOKING and state.get("booking_result"):
@@ -348,14 +452,14 @@ class TravelAgentWorkflow:
         else:
             answer_parts.append("抱歉，暂时无法处理您的请求，请尝试换个方式描述。")
         
-        state["final_answer"] = "".join(answer_parts)
-        state["recommendations"] = recommendations
-        
-        return state
+        return {
+            "final_answer": "".join(answer_parts),
+            "recommendations": recommendations
+        }
     
     # ==================== 路由函数 ====================
     
-    def route_by_intent(self, state: AgentState) -> str:
+    def route_by_intent(self, state: AgentState) -> Union[str, List[str]]:
         """根据意图类型路由"""
         intent_type = state.get("intent_type", "")
         logger.info(f"根据意图路由: {intent_type}")
@@ -367,8 +471,15 @@ class TravelAgentWorkflow:
         elif intent_type == IntentType.ATTRACTION:
             return "attraction"
         elif intent_type == IntentType.ITINERARY:
-            return "itinerary"
+            # 三路查询互不依赖，并行执行
+            return ["flight", "hotel", "attraction"]
         elif intent_type == IntentType.PRICE_COMPARE:
+            # 先查询候选航班或酒店，查询节点再路由到批量比价
+            intent = state.get("intent", {})
+            if intent.get("departure"):
+                return "flight"
+            if intent.get("destination"):
+                return "hotel"
             return "price_compare"
         elif intent_type == IntentType.BOOKING:
             return "booking"
@@ -404,26 +515,14 @@ class TravelAgentWorkflow:
     
     # ==================== 执行工作流 ====================
     
-    async def run(self, query: str, user_id: str = "guest", 
-                  session_id: str = None) -> dict:
-        """
-        运行工作流
-        
-        Args:
-            query: 用户查询
-            user_id: 用户ID
-            session_id: 会话ID
-            
-        Returns:
-            工作流执行结果
-        """
-        logger.info(f"开始执行工作流，查询: {query}")
-        
-        # 初始化状态
-        initial_state = AgentState(
+    def _initial_state(self, query: str, user_id: str, session_id: str,
+                       execution_mode: AgentExecutionMode = AgentExecutionMode.FULL) -> AgentState:
+        """构建初始状态"""
+        return AgentState(
             query=query,
             user_id=user_id,
             session_id=session_id or f"session_{user_id}",
+            execution_mode=execution_mode.value,
             intent={},
             intent_type="",
             flight_result={},
@@ -437,29 +536,80 @@ class TravelAgentWorkflow:
             recommendations=[],
             error=""
         )
+    
+    def _build_result(self, query: str, final_state: dict) -> dict:
+        """将最终状态整理为对外结果"""
+        return {
+            "success": True,
+            "query": query,
+            "intent": final_state.get("intent"),
+            "final_answer": final_state.get("final_answer"),
+            "recommendations": final_state.get("recommendations", []),
+            "results": {
+                "flight": final_state.get("flight_result"),
+                "hotel": final_state.get("hotel_result"),
+                "attraction": final_state.get("attraction_result"),
+                "itinerary": final_state.get("itinerary_result"),
+                "price": final_state.get("price_result"),
+                "booking": final_state.get("booking_result"),
+                "service": final_state.get("service_result")
+            }
+        }
+    
+    def _record_history(self, state: dict):
+        """记录搜索历史（只放入内存缓冲区，不等待写入）"""
+        if self.history is None:
+            return
+        results = {}
+        for result_key in NODE_RESULT_KEYS.values():
+            result = state.get(result_key)
+            if result_key == "intent" or not result:
+                continue
+            data = result.get("data")
+            results[result_key] = {
+                "success": result.get("success"),
+                "total_count": data.get("total_count") if isinstance(data, dict) else None
+            }
+        self.history.record(
+            user_id=state.get("user_id"),
+            session_id=state.get("session_id"),
+            query=state.get("query"),
+            intent_type=_intent_label(state.get("intent_type")),
+            intent_source=state.get("intent_source"),
+            results={
+                "intent": state.get("intent"),
+                "final_answer": state.get("final_answer"),
+                "results": results
+            }
+        )
+    
+    async def run(self, query: str, user_id: str = "guest", 
+                  session_id: str = None) -> dict:
+        """
+        运行工作流
+        
+        Args:
+            query: 用户查询
+            user_id: 用户ID
+            session_id: 会话ID
+            
+        Returns:
+            工作流执行结果
+        """
+        logger.info(f"开始执行工作流，查询: {query}")
+        
+        # 初始化状态
+        initial_state = self._initial_state(query, user_id, session_id)
         
         try:
             # 执行工作流
-            final_state = await self.graph.ainvoke(initial_state)
+            with WORKFLOW_IN_FLIGHT.track_inprogress(mode="run"):
+                final_state = await self.graph.ainvoke(initial_state)
             
             logger.info("工作流执行完成")
+            self._record_history(final_state)
             
-            return {
-                "success": True,
-                "query": query,
-                "intent": final_state.get("intent"),
-                "final_answer": final_state.get("final_answer"),
-                "recommendations": final_state.get("recommendations", []),
-                "results": {
-                    "flight": final_state.get("flight_result"),
-                    "hotel": final_state.get("hotel_result"),
-                    "attraction": final_state.get("attraction_result"),
-                    "itinerary": final_state.get("itinerary_result"),
-                    "price": final_state.get("price_result"),
-                    "booking": final_state.get("booking_result"),
-                    "service": final_state.get("service_result")
-                }
-            }
+            return self._build_result(query, final_state)
         
         except Exception as e:
             logger.error(f"工作流执行失败: {str(e)}")
@@ -468,6 +618,110 @@ class TravelAgentWorkflow:
                 "error": f"工作流执行失败: {str(e)}",
                 "query": query
             }
+    
+    async def astream(self, query: str, user_id: str = "guest",
+                      session_id: str = None) -> AsyncIterator[dict]:
+        """
+        流式运行工作流
+        
+        每个节点完成后立即推送 node 事件；图执行结束后，行程规划逐天推送
+        itinerary_day 事件，其他意图通过 LLM 流式接口逐段推送建议内容（token 事件）；
+        最后推送与 run() 相同结构的 done 事件。
+        
+        Args:
+            query: 用户查询
+            user_id: 用户ID
+            session_id: 会话ID
+            
+        Yields:
+            {"event": 事件类型, "data": 事件数据}
+        """
+        logger.info(f"开始流式执行工作流，查询: {query}")
+        
+        # 建议生成推迟到图执行之后，以便逐段输出
+        state = dict(self._initial_state(query, user_id, session_id, AgentExecutionMode.DEFERRED))
+        
+        WORKFLOW_IN_FLIGHT.inc(mode="stream")
+        try:
+            async for update in self.graph.astream(state, stream_mode="updates"):
+                for node, values in update.items():
+                    if values:
+                        state.update(values)
+                    result_key = NODE_RESULT_KEYS.get(node)
+                    if result_key:
+                        result = state.get(result_key) or {}
+                        yield {
+                            "event": "node",
+                            "data": {
+                                "node": node,
+                                "result": {k: v for k, v in result.items() if k not in DEFERRED_INPUT_KEYS}
+                            }
+                        }
+            
+            # 行程逐天流式生成：每天的 JSON 一闭合就推送，不等待整个行程
+            plan_inputs = (state.get("itinerary_result") or {}).pop("plan_inputs", None)
+            if plan_inputs is not None:
+                intent = _intent_label(state.get("intent_type"))
+                intent_token = current_intent.set(intent)
+                try:
+                    with NODE_DURATION.time(node="stream_itinerary", intent=intent, status="success"):
+                        async for event in self.itinerary_agent.astream_plan(plan_inputs):
+                            if event["type"] == "day":
+                                yield {"event": "itinerary_day", "data": event["data"]}
+                            else:
+                                state["itinerary_result"] = event["data"]
+                finally:
+                    current_intent.reset(intent_token)
+                state.update(await self.generate_answer_node(state))
+            
+            target = STREAM_ADVICE_TARGETS.get(state.get("intent_type"))
+            if target:
+                state_key, agent_attr, field_path = target
+                result = state.get(state_key) or {}
+                advice_inputs = result.pop("advice_inputs", None)
+                if result.get("success") and advice_inputs:
+                    agent = getattr(self, agent_attr)
+                    intent = _intent_label(state.get("intent_type"))
+                    parts = []
+                    intent_token = current_intent.set(intent)
+                    try:
+                        with NODE_DURATION.time(node="stream_advice", intent=intent, status="success"):
+                            async for token in agent.astream_llm(**advice_inputs):
+                                parts.append(token)
+                                yield {"event": "token", "data": token}
+                    finally:
+                        current_intent.reset(intent_token)
+                    
+                    # 回填完整建议后重新生成最终答案
+                    container = result
+                    for key in field_path[:-1]:
+                        container = container[key]
+                    container[field_path[-1]] = "".join(parts)
+                    state.update(await self.generate_answer_node(state))
+            
+            # 未被消费的建议参数不对外输出
+            for result_key in NODE_RESULT_KEYS.values():
+                if isinstance(state.get(result_key), dict):
+                    for key in DEFERRED_INPUT_KEYS:
+                        state[result_key].pop(key, None)
+            
+            logger.info("流式工作流执行完成")
+            self._record_history(state)
+            
+            yield {"event": "done", "data": self._build_result(query, state)}
+        
+        except Exception as e:
+            logger.error(f"流式工作流执行失败: {str(e)}")
+            yield {
+                "event": "error",
+                "data": {
+                    "success": False,
+                    "error": f"工作流执行失败: {str(e)}",
+                    "query": query
+                }
+            }
+        finally:
+            WORKFLOW_IN_FLIGHT.dec(mode="stream")
 
 
 # ==================== 全局工作流实例 ====================